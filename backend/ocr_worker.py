@@ -0,0 +1,229 @@
+"""PaddleOCR worker process for the UPSC AI Companion API.
+
+This module is imported by OCR pool workers, so it must stay free of
+server imports (MongoDB, Ollama, FastAPI) to keep worker start-up cheap.
+"""
+from typing import List, Tuple, Union, Dict
+import os
+import io
+import time
+import hashlib
+import numpy as np
+import cv2
+
+# Engine settings (PaddleOCR 3.x); part of the OCR cache version so changing them invalidates cached results.
+# Page orientation and unwarping are off because preprocess_image already orients and deskews the page.
+OCR_ENGINE_OPTIONS = {
+    "lang": "en",
+    "use_doc_orientation_classify": False,
+    "use_doc_unwarping": False,
+    "use_textline_orientation": True
+}
+
+# Pre-processing applied before detection, in this order; workers inherit these from the server's environment
+OCR_PREPROCESS_STEPS = [
+    step.strip()
+    for step in os.environ.get('OCR_PREPROCESS_STEPS', 'orient,grayscale,resize,contrast,deskew').split(',')
+    if step.strip()
+]
+OCR_TARGET_LONG_EDGE = int(os.environ.get('OCR_TARGET_LONG_EDGE', '1600'))
+OCR_MAX_SKEW_DEGREES = float(os.environ.get('OCR_MAX_SKEW_DEGREES', '10'))
+
+# Loaded once per worker process by init_worker
+ocr_engine = None
+
+def init_worker():
+    """Load PaddleOCR once when the worker process starts"""
+    global ocr_engine
+    from paddleocr import PaddleOCR
+    ocr_engine = PaddleOCR(**OCR_ENGINE_OPTIONS)
+
+# Decoding at 1/2, 1/4 or 1/8 scale lets libjpeg skip most of the IDCT work for large photos
+REDUCED_DECODE_FLAGS = ((8, cv2.IMREAD_REDUCED_COLOR_8), (4, cv2.IMREAD_REDUCED_COLOR_4), (2, cv2.IMREAD_REDUCED_COLOR_2))
+
+def decode_image(image_data: bytes, long_edge: int = 0, max_long_edge: int = 0) -> np.ndarray:
+    """Decode encoded image bytes straight into a BGR numpy array, as stored (EXIF orientation not applied)
+
+    Given the stored long_edge and a max_long_edge, decode at the smallest power-of-two reduction that
+    still keeps max_long_edge pixels.
+    """
+    flags = cv2.IMREAD_COLOR
+    if long_edge and max_long_edge:
+        for factor, reduced in REDUCED_DECODE_FLAGS:
+            if long_edge // factor >= max_long_edge:
+                flags = reduced
+                break
+    image = cv2.imdecode(np.frombuffer(image_data, dtype=np.uint8), flags | cv2.IMREAD_IGNORE_ORIENTATION)
+    if image is None:
+        raise ValueError("Unsupported or corrupt image data")
+    return image
+
+def read_header(image_data: bytes) -> Tuple[int, int, int]:
+    """(width, height, EXIF orientation) from the image header without decoding pixels; zeros if unreadable"""
+    from PIL import Image
+    try:
+        with Image.open(io.BytesIO(image_data)) as image:
+            # Only camera JPEGs carry orientation in practice; reading EXIF from PNG can scan the whole file
+            orientation = int(image.getexif().get(0x0112, 1)) if image.format == "JPEG" else 1
+            return image.width, image.height, orientation
+    except Exception:
+        return 0, 0, 1
+
+def apply_orientation(image: np.ndarray, orientation: int) -> np.ndarray:
+    """Rotate/flip a decoded image so it is upright according to its EXIF orientation"""
+    if orientation in (2, 4, 5, 7):
+        image = cv2.flip(image, 1)
+    rotations = {3: cv2.ROTATE_180, 4: cv2.ROTATE_180, 5: cv2.ROTATE_90_COUNTERCLOCKWISE,
+                 6: cv2.ROTATE_90_CLOCKWISE, 7: cv2.ROTATE_90_CLOCKWISE, 8: cv2.ROTATE_90_COUNTERCLOCKWISE}
+    if orientation in rotations:
+        image = cv2.rotate(image, rotations[orientation])
+    return image
+
+def resize_long_edge(image: np.ndarray, long_edge: int) -> np.ndarray:
+    """Downscale so the longer side is at most long_edge pixels; never upscales"""
+    height, width = image.shape[:2]
+    scale = long_edge / max(height, width)
+    if scale >= 1:
+        return image
+    return cv2.resize(image, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_AREA)
+
+def to_grayscale(image: np.ndarray) -> np.ndarray:
+    return image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+
+def normalize_contrast(image: np.ndarray) -> np.ndarray:
+    """Local contrast equalization (CLAHE) so faint pencil and uneven lighting read like ink on white"""
+    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+    if image.ndim == 2:
+        return clahe.apply(image)
+    lab = cv2.cvtColor(image, cv2.COLOR_BGR2LAB)
+    lab[:, :, 0] = clahe.apply(lab[:, :, 0])
+    return cv2.cvtColor(lab, cv2.COLOR_LAB2BGR)
+
+def estimate_skew(image: np.ndarray) -> float:
+    """Median angle in degrees of text lines, found by smearing ink horizontally into line blobs"""
+    gray = resize_long_edge(to_grayscale(image), 1000)
+    _, ink = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+    lines = cv2.dilate(ink, cv2.getStructuringElement(cv2.MORPH_RECT, (25, 3)))
+    contours, _ = cv2.findContours(lines, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    min_width = gray.shape[1] * 0.1
+    angles = []
+    for contour in contours:
+        (_, _), (width, height), angle = cv2.minAreaRect(contour)
+        if width < height:
+            width, height = height, width
+            angle -= 90
+        # Fold into [-45, 45) so the angle is the tilt of the long side
+        angle = (angle + 45) % 90 - 45
+        if width >= min_width and width >= 4 * height:
+            angles.append(angle)
+    return float(np.median(angles)) if angles else 0.0
+
+def deskew(image: np.ndarray, max_degrees: float = OCR_MAX_SKEW_DEGREES) -> np.ndarray:
+    """Rotate text lines level; angles under half a degree or beyond max_degrees are left alone"""
+    angle = estimate_skew(image)
+    if abs(angle) < 0.5 or abs(angle) > max_degrees:
+        return image
+    height, width = image.shape[:2]
+    matrix = cv2.getRotationMatrix2D((width / 2, height / 2), angle, 1.0)
+    return cv2.warpAffine(image, matrix, (width, height), flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+
+def preprocess_image(image_data: bytes, steps: List[str] = OCR_PREPROCESS_STEPS) -> Tuple[np.ndarray, Dict[str, float]]:
+    """Decode and run the configured pre-processing steps; returns a BGR image and per-step timings in ms"""
+    timings = {}
+    started = time.perf_counter()
+    
+    def timed(step: str):
+        nonlocal started
+        now = time.perf_counter()
+        timings[step] = round((now - started) * 1000, 1)
+        started = now
+    
+    width, height, orientation = read_header(image_data)
+    image = decode_image(image_data, max(width, height), OCR_TARGET_LONG_EDGE if "resize" in steps else 0)
+    timed("decode")
+    for step in steps:
+        if step == "orient":
+            image = apply_orientation(image, orientation)
+        elif step == "resize":
+            image = resize_long_edge(image, OCR_TARGET_LONG_EDGE)
+        elif step == "grayscale":
+            image = to_grayscale(image)
+        elif step == "contrast":
+            image = normalize_contrast(image)
+        elif step == "deskew":
+            image = deskew(image)
+        else:
+            continue
+        timed(step)
+    if image.ndim == 2:
+        # PaddleOCR's detector expects three channels
+        image = cv2.cvtColor(image, cv2.COLOR_GRAY2BGR)
+    return image, timings
+
+def difference_hash(image: np.ndarray) -> int:
+    """64-bit dHash: whether each pixel of a 9x8 grayscale thumbnail is brighter than its left neighbour"""
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+    thumbnail = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (thumbnail[:, 1:] > thumbnail[:, :-1]).flatten()
+    return int("".join("1" if bit else "0" for bit in bits), 2)
+
+def fingerprint_image(image: Union[bytes, str]) -> Tuple[str, int]:
+    """SHA-256 of the decoded pixels plus a difference hash; accepts encoded bytes or a file path"""
+    if isinstance(image, str):
+        with open(image, "rb") as f:
+            image = f.read()
+    pixels = decode_image(image)
+    digest = hashlib.sha256(repr(pixels.shape).encode("ascii"))
+    digest.update(np.ascontiguousarray(pixels).data)
+    return digest.hexdigest(), difference_hash(pixels)
+
+def parse_ocr_result(result) -> List[str]:
+    """Extract text lines from one PaddleOCR 3.x OCRResult (a dict-like with recognized lines in rec_texts)"""
+    if not result:
+        return []
+    return [str(text) for text in (result.get("rec_texts") or []) if text]
+
+def run_ocr(image_data: bytes) -> Tuple[List[str], Dict[str, float]]:
+    """Run OCR on encoded image bytes; returns the recognized text lines and per-step timings in ms"""
+    if ocr_engine is None:
+        init_worker()
+    image, timings = preprocess_image(image_data)
+    started = time.perf_counter()
+    result = ocr_engine.predict(image)
+    timings["ocr"] = round((time.perf_counter() - started) * 1000, 1)
+    return parse_ocr_result(result[0] if result else None), timings
+
+def run_ocr_file(path: str) -> Tuple[List[str], Dict[str, float]]:
+    """Run OCR on a stored image file, read here so the bytes never cross the process boundary"""
+    with open(path, "rb") as f:
+        return run_ocr(f.read())
+
+def run_ocr_batch(images: List[Union[bytes, str]]) -> Tuple[List[List[str]], List[Dict[str, float]]]:
+    """Run OCR on several pages (encoded bytes or file paths) in one predict call
+
+    Returns the text lines and step timings of each page, in input order; the shared "ocr" time is
+    split evenly across the pages.
+    """
+    if ocr_engine is None:
+        init_worker()
+    arrays, timings = [], []
+    for image in images:
+        if isinstance(image, str):
+            with open(image, "rb") as f:
+                image = f.read()
+        array, page_timings = preprocess_image(image)
+        arrays.append(array)
+        timings.append(page_timings)
+    started = time.perf_counter()
+    results = ocr_engine.predict(arrays)
+    per_page_ms = round((time.perf_counter() - started) * 1000 / len(arrays), 1)
+    for page_timings in timings:
+        page_timings["ocr"] = per_page_ms
+    return [parse_ocr_result(result) for result in results], timings
+
+def warm_up() -> int:
+    """Load the engine and run one pass on a blank page so the first real request is fast"""
+    if ocr_engine is None:
+        init_worker()
+    ocr_engine.predict(np.full((64, 256, 3), 255, dtype=np.uint8))
+    return os.getpid()
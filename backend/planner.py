@@ -0,0 +1,123 @@
+"""Full-horizon study plan scheduler.
+
+The horizon is split into days of fixed capacity. Each day holds a few study
+sessions, and the time left over is reserved for spaced revision: every study
+session is revised again PLAN_REVISION_INTERVALS days later. The last stretch
+before the exam holds only revision.
+
+Sessions are handed out to topics by stride scheduling. Topic t with weight
+w_t owns the virtual times 1/w_t, 2/w_t, ..., and slots are filled in order of
+those times. Every topic therefore gets time in proportion to its weight, and
+topics stay interleaved instead of being studied in blocks. The ordering is a
+single argsort, so a 365-day horizon takes a few milliseconds.
+
+This module has no server imports; topics are plain indices into the caller's
+weight vector.
+"""
+from typing import List, Sequence, Tuple
+import math
+import numpy as np
+
+STUDY = "study"
+REVISION = "revision"
+
+def session_layout(minutes_per_day: int, session_minutes: int, revision_minutes: int,
+                   intervals: Sequence[int]) -> Tuple[int, int, int]:
+    """(study sessions per day, minutes per study session, minutes per revision) for a day's capacity
+
+    Sizes the study sessions so the revisions they cause later still fit into each day. In steady state
+    a day holds the revisions of one earlier day's sessions for every interval.
+    """
+    if minutes_per_day <= 0:
+        return 0, 0, 0
+    per_session = session_minutes + len(intervals) * revision_minutes
+    sessions = minutes_per_day // per_session
+    if sessions == 0:
+        # Too little time for a full session: keep one, with a quarter of the day for its revisions
+        sessions = 1
+        revision_minutes = min(revision_minutes, minutes_per_day // 4 // max(len(intervals), 1))
+    # Round to five minutes so targets read naturally
+    if revision_minutes >= 5:
+        revision_minutes = revision_minutes // 5 * 5
+    study_minutes = (minutes_per_day - sessions * len(intervals) * revision_minutes) // sessions
+    study_minutes = max(5, study_minutes // 5 * 5)
+    return sessions, study_minutes, revision_minutes
+
+def stride_order(weights: np.ndarray, count: int) -> np.ndarray:
+    """Topic index for each of count sessions, proportional to weights and interleaved"""
+    if count <= 0 or len(weights) == 0:
+        return np.zeros(0, dtype=np.int64)
+    shares = weights / weights.sum()
+    per_topic = np.ceil(shares * count).astype(np.int64) + 1
+    topics = np.repeat(np.arange(len(weights)), per_topic)
+    # Position of each entry within its topic's run: 1, 2, ..., per_topic[t]
+    starts = np.repeat(np.cumsum(per_topic) - per_topic, per_topic)
+    ranks = np.arange(len(topics)) - starts + 1
+    virtual_times = ranks / shares[topics]
+    # Ties go to the heavier topic, then to the earlier one
+    order = np.lexsort((topics, -shares[topics], virtual_times))
+    return topics[order[:count]]
+
+def schedule(num_days: int, minutes_per_day: int, weights: Sequence[float],
+             session_minutes: int = 60, revision_minutes: int = 15,
+             intervals: Sequence[int] = (1, 7, 30),
+             final_revision_days: int = 0) -> List[Tuple[int, int, str, int]]:
+    """Plan num_days days as (day, topic, kind, minutes) entries, one per topic and kind per day
+
+    Days before the final_revision_days stretch get study sessions plus the spaced revisions of earlier
+    sessions. The final stretch fills its free capacity with revision sessions, again by weight.
+    """
+    weights = np.asarray(weights, dtype=np.float64)
+    if num_days <= 0 or minutes_per_day <= 0 or len(weights) == 0 or weights.sum() <= 0:
+        return []
+    sessions, study_minutes, revision_minutes = session_layout(minutes_per_day, session_minutes, revision_minutes, intervals)
+    final_revision_days = min(max(final_revision_days, 0), num_days - 1)
+    study_days = num_days - final_revision_days
+
+    # Study sessions: slot i goes to day i // sessions
+    study_topics = stride_order(weights, study_days * sessions)
+    study_days_of = np.arange(len(study_topics)) // sessions
+
+    # Each study session is revised after every interval that still falls inside the horizon
+    revision_days = []
+    revision_topics = []
+    if revision_minutes > 0:
+        for interval in intervals:
+            days = study_days_of + interval
+            inside = days < num_days
+            revision_days.append(days[inside])
+            revision_topics.append(study_topics[inside])
+    revision_days = np.concatenate(revision_days) if revision_days else np.zeros(0, dtype=np.int64)
+    revision_topics = np.concatenate(revision_topics) if revision_topics else np.zeros(0, dtype=np.int64)
+
+    # Final stretch: whatever capacity the spaced revisions leave becomes whole revision sessions
+    final_days = []
+    final_topics = []
+    if final_revision_days:
+        used = np.bincount(revision_days, minlength=num_days)[study_days:] * revision_minutes
+        free_sessions = np.maximum(minutes_per_day - used, 0) // session_minutes
+        final_topics = stride_order(weights, int(free_sessions.sum()))
+        final_days = np.repeat(np.arange(study_days, num_days), free_sessions)
+
+    # Merge sessions of the same topic and kind on the same day into one entry
+    keys = [
+        (study_days_of, study_topics, 0, study_minutes),
+        (revision_days, revision_topics, 1, revision_minutes),
+        (np.asarray(final_days, dtype=np.int64), np.asarray(final_topics, dtype=np.int64), 1, session_minutes),
+    ]
+    num_topics = len(weights)
+    minutes = np.zeros(num_days * num_topics * 2, dtype=np.int64)
+    for days, topics, kind, length in keys:
+        if len(days):
+            np.add.at(minutes, (days * num_topics + topics) * 2 + kind, length)
+
+    entries = []
+    for flat in np.flatnonzero(minutes).tolist():
+        slot, kind = divmod(flat, 2)
+        day, topic = divmod(slot, num_topics)
+        entries.append((day, topic, REVISION if kind else STUDY, int(minutes[flat])))
+    return entries
+
+def final_revision_span(num_days: int, max_days: int) -> int:
+    """Days reserved for revision only at the end of the horizon: a tenth of it, at most max_days"""
+    return min(max_days, math.floor(num_days / 10))
@@ -1,18 +1,20 @@
-from fastapi import FastAPI, APIRouter, HTTPException, UploadFile, File, Form
+from fastapi import FastAPI, APIRouter, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
-from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse, JSONResponse, ORJSONResponse, Response
 from dotenv import load_dotenv
 from motor.motor_asyncio import AsyncIOMotorClient
 from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Any, Union
-from datetime import datetime, timedelta
+from typing import List, Optional, Dict, Any, Union, AsyncIterator, Awaitable, Callable, Iterator
+from datetime import date, datetime, timedelta, timezone
 from enum import Enum
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+from pymongo import IndexModel, ASCENDING, DESCENDING, monitoring, InsertOne, UpdateOne, DeleteMany, ReplaceOne, ReturnDocument
 import os
 import logging
 import uuid
 import json
+import orjson
 import asyncio
 import aiofiles
 from pathlib import Path
@@ -20,39 +22,253 @@ import ollama
 import base64
 import re
 import io
-from PIL import Image
-import tempfile
+import hashlib
+import time
+from collections import OrderedDict
+import importlib.util
+import importlib.metadata
+import contextlib
+import unicodedata
+import math
+import heapq
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from python_multipart.multipart import MultipartParser, parse_options_header
+import ocr_worker
+import numpy as np
+from vector_index import VectorIndex
+import planner
 
-# Import PaddleOCR
 try:
-    from paddleocr import PaddleOCR
-    ocr_engine = PaddleOCR(use_angle_cls=True, lang='en')
-    OCR_AVAILABLE = True
-except Exception as e:
-    print(f"PaddleOCR not available: {e}")
-    ocr_engine = None
-    OCR_AVAILABLE = False
-
-# Fix MongoDB ObjectId serialization issue with Pydantic v2/FastAPI
-from fastapi.encoders import jsonable_encoder
-from fastapi import FastAPI
-
-# Custom JSON encoder for ObjectId
-def custom_jsonable_encoder(obj, by_alias=True, exclude_none=False, **kwargs):
+    import psutil
+except ImportError:
+    psutil = None
+
+try:
+    import pypdfium2 as pdfium
+except ImportError:
+    pdfium = None
+
+# PaddleOCR runs in a separate process pool (see ocr_worker.py); only check it is installed here
+OCR_AVAILABLE = importlib.util.find_spec("paddleocr") is not None
+if not OCR_AVAILABLE:
+    print("PaddleOCR not available: paddleocr is not installed")
+
+# Responses built from MongoDB documents are rendered by orjson in one pass: datetimes natively, ObjectId
+# through the default hook. Endpoints return MongoJSONResponse directly so FastAPI skips jsonable_encoder.
+def orjson_default(obj):
     if isinstance(obj, ObjectId):
         return str(obj)
-    return jsonable_encoder(obj, by_alias=by_alias, exclude_none=exclude_none, **kwargs)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+def dump_json(content: Any) -> bytes:
+    return orjson.dumps(content, default=orjson_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+class MongoJSONResponse(ORJSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dump_json(content)
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+# Development mode enables extra runtime checks such as the unindexed query detector
+DEV_MODE = os.environ.get('APP_ENV', 'production').lower() == 'development'
+
+# MongoDB indexes for every query shape used by the API, applied on startup
+MONGO_INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("phone", ASCENDING)]),
+        IndexModel([("id", ASCENDING)]),
+    ],
+    "profiles": [
+        IndexModel([("user_id", ASCENDING)]),
+        IndexModel([("updated_at", ASCENDING)]),
+    ],
+    "chat_messages": [
+        IndexModel([("user_id", ASCENDING), ("session_id", ASCENDING), ("seq", ASCENDING), ("id", ASCENDING)]),
+    ],
+    "chat_sessions": [
+        IndexModel([("user_id", ASCENDING), ("session_id", ASCENDING)], unique=True),
+    ],
+    "resources": [
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)]),
+        IndexModel([("id", ASCENDING)]),
+        IndexModel([("status", ASCENDING)]),
+    ],
+    "resource_chunks": [
+        IndexModel([("id", ASCENDING)]),
+        IndexModel([("resource_id", ASCENDING), ("seq", ASCENDING)]),
+        IndexModel([("user_id", ASCENDING)]),
+    ],
+    "search_postings": [
+        IndexModel([("user_id", ASCENDING), ("term", ASCENDING), ("tf", DESCENDING), ("dl", ASCENDING)]),
+        IndexModel([("resource_id", ASCENDING)]),
+    ],
+    "search_stats": [
+        IndexModel([("user_id", ASCENDING)], unique=True),
+    ],
+    "study_plans": [
+        IndexModel([("id", ASCENDING)]),
+    ],
+    "plan_items": [
+        IndexModel([("user_id", ASCENDING), ("date", ASCENDING), ("id", ASCENDING)]),
+        IndexModel([("user_id", ASCENDING), ("status", ASCENDING), ("created_at", ASCENDING)]),
+        IndexModel([("id", ASCENDING), ("user_id", ASCENDING)]),
+        IndexModel([("plan_id", ASCENDING), ("date", ASCENDING)]),
+        IndexModel([("date", ASCENDING), ("status", ASCENDING), ("user_id", ASCENDING)]),
+    ],
+    "flashcards": [
+        IndexModel([("user_id", ASCENDING), ("next_review_at", ASCENDING)]),
+        IndexModel([("id", ASCENDING), ("user_id", ASCENDING)]),
+    ],
+    "mcq_sets": [
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)]),
+    ],
+    "mcq_bank": [
+        IndexModel([("pool_key", ASCENDING), ("id", ASCENDING)]),
+    ],
+    "mcq_served": [
+        IndexModel([("user_id", ASCENDING), ("pool_key", ASCENDING)], unique=True),
+    ],
+    "evaluations": [
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)]),
+        IndexModel([("id", ASCENDING), ("user_id", ASCENDING)]),
+        IndexModel([("status", ASCENDING)]),
+        IndexModel(
+            [("user_id", ASCENDING), ("idempotency_key", ASCENDING)],
+            unique=True,
+            partialFilterExpression={"idempotency_key": {"$exists": True}}
+        ),
+    ],
+    "daily_doses": [
+        IndexModel([("user_id", ASCENDING), ("date", ASCENDING)], unique=True),
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+    "analytics_rollups": [
+        IndexModel([("user_id", ASCENDING), ("scope", ASCENDING), ("key", ASCENDING)], unique=True),
+    ],
+    "blobs": [
+        IndexModel([("sha256", ASCENDING)], unique=True),
+    ],
+    "ocr_cache": [
+        IndexModel([("engine", ASCENDING), ("pixel_hash", ASCENDING)], unique=True),
+        IndexModel([("engine", ASCENDING), ("file_hashes", ASCENDING)]),
+        IndexModel([("engine", ASCENDING), ("phash_bands", ASCENDING)]),
+    ],
+    "llm_cache": [
+        IndexModel([("key", ASCENDING)], unique=True),
+        # expires_at holds each entry's own deadline; MongoDB removes it once that passes
+        IndexModel([("expires_at", ASCENDING)], expireAfterSeconds=0),
+    ],
+}
+
+async def ensure_indexes():
+    """Create every index in MONGO_INDEXES; existing indexes are left untouched"""
+    for collection_name, indexes in MONGO_INDEXES.items():
+        try:
+            await db[collection_name].create_indexes(indexes)
+        except Exception as e:
+            logger.warning(f"Failed to create indexes on {collection_name}: {e}")
+
+class UnindexedQueryListener(monitoring.CommandListener):
+    """Dev-mode check that explains each new query shape once and logs it if MongoDB picks a collection scan"""
+    
+    FILTER_FIELDS = {
+        "find": "filter",
+        "count": "query",
+        "distinct": "query",
+        "findAndModify": "query",
+    }
+    
+    def __init__(self):
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.seen_shapes = set()
+    
+    def _extract_queries(self, command_name: str, command: Dict[str, Any]) -> List[tuple]:
+        """Return (filter, sort) pairs for every query embedded in a command"""
+        if command_name in self.FILTER_FIELDS:
+            return [(command.get(self.FILTER_FIELDS[command_name]) or {}, command.get("sort") or {})]
+        if command_name == "update":
+            return [(update.get("q") or {}, {}) for update in command.get("updates", [])]
+        if command_name == "delete":
+            return [(delete.get("q") or {}, {}) for delete in command.get("deletes", [])]
+        if command_name == "aggregate":
+            pipeline = command.get("pipeline") or []
+            if pipeline and "$match" in pipeline[0]:
+                return [(pipeline[0]["$match"], {})]
+        return []
+    
+    def started(self, event):
+        if self.loop is None or event.database_name != db.name:
+            return
+        collection_name = event.command.get(event.command_name)
+        if not isinstance(collection_name, str):
+            return
+        for query_filter, sort in self._extract_queries(event.command_name, event.command):
+            if not query_filter and not sort:
+                continue
+            shape = (collection_name, tuple(sorted(query_filter)), tuple(sort))
+            if shape in self.seen_shapes:
+                continue
+            self.seen_shapes.add(shape)
+            # Listeners run on Motor's worker threads; explain on the event loop instead
+            self.loop.call_soon_threadsafe(
+                asyncio.ensure_future, self.check(collection_name, query_filter, sort, shape)
+            )
+    
+    def succeeded(self, event):
+        pass
+    
+    def failed(self, event):
+        pass
+    
+    async def check(self, collection_name: str, query_filter: Dict[str, Any], sort: Dict[str, Any], shape: tuple):
+        try:
+            explain = await db.command({
+                "explain": {"find": collection_name, "filter": query_filter, "sort": sort},
+                "verbosity": "queryPlanner"
+            })
+        except Exception as e:
+            logger.debug(f"Could not explain query on {collection_name}: {e}")
+            return
+        if "COLLSCAN" in json.dumps(explain.get("queryPlanner", {}).get("winningPlan", {}), default=str):
+            logger.warning(
+                f"Unindexed query on {collection_name}: filter fields {list(shape[1])}, sort {list(shape[2])}. "
+                f"Add an index to MONGO_INDEXES."
+            )
+
+unindexed_query_listener = UnindexedQueryListener()
+
+# Set on startup; multi-document transactions need a replica set or sharded cluster
+mongo_supports_transactions = False
+
+async def detect_transaction_support():
+    global mongo_supports_transactions
+    try:
+        hello = await client.admin.command("hello")
+        mongo_supports_transactions = "setName" in hello or hello.get("msg") == "isdbgrid"
+    except Exception as e:
+        logger.warning(f"Could not detect MongoDB transaction support: {e}")
+        mongo_supports_transactions = False
+
+@contextlib.asynccontextmanager
+async def mongo_transaction():
+    """Yield a session with an open transaction, or None on deployments without transaction support"""
+    if not mongo_supports_transactions:
+        yield None
+        return
+    async with await client.start_session() as session:
+        async with session.start_transaction():
+            yield session
+
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(mongo_url, event_listeners=[unindexed_query_listener] if DEV_MODE else [])
 db = client[os.environ['DB_NAME']]
 
 # Create the main app
-app = FastAPI(title="UPSC AI Companion API")
+app = FastAPI(title="UPSC AI Companion API", default_response_class=MongoJSONResponse)
 api_router = APIRouter(prefix="/api")
 
 # Configure CORS
@@ -90,36 +306,74 @@ class ResourceStatus(str, Enum):
     UPLOADED = "uploaded"
     PARSED = "parsed"
     INDEXED = "indexed"
+    FAILED = "failed"
+
+class EvaluationStatus(str, Enum):
+    QUEUED = "queued"
+    OCR = "ocr"
+    EVALUATING = "evaluating"
+    COMPLETED = "completed"
+    FAILED = "failed"
 
 class PlanItemStatus(str, Enum):
     PENDING = "pending"
     DONE = "done"
     SKIPPED = "skipped"
 
+class PlanItemKind(str, Enum):
+    STUDY = "study"
+    REVISION = "revision"
+
 class ChatMode(str, Enum):
     GENERAL = "general"
     RAG = "rag"
     PLANNER = "planner"
 
-# Helper function to convert MongoDB documents to JSON serializable format
-def serialize_doc(doc):
-    if doc is None:
-        return None
-    if isinstance(doc, list):
-        return [serialize_doc(item) for item in doc]
-    if isinstance(doc, dict):
-        result = {}
-        for key, value in doc.items():
-            if isinstance(value, ObjectId):
-                result[key] = str(value)
-            elif isinstance(value, datetime):
-                result[key] = value.isoformat()
-            elif isinstance(value, (dict, list)):
-                result[key] = serialize_doc(value)
-            else:
-                result[key] = value
-        return result
-    return doc
+# Keyset pagination over (sort key, id); each list picks a sort key that is unique enough to be stable,
+# e.g. plan items by date and chat messages by their per-session sequence number
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+def encode_cursor(doc: Dict[str, Any], sort_key: str) -> str:
+    """Opaque cursor pointing just past a document"""
+    value = doc.get(sort_key)
+    payload = json.dumps({
+        "sort": sort_key,
+        "key": value.isoformat() if isinstance(value, datetime) else value,
+        "datetime": isinstance(value, datetime),
+        "id": doc["id"]
+    })
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str, sort_key: str) -> tuple:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        if payload["sort"] != sort_key:
+            raise ValueError("cursor belongs to a different list")
+        key = datetime.fromisoformat(payload["key"]) if payload["datetime"] else payload["key"]
+        return key, payload["id"]
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+async def paginate(collection, query: Dict[str, Any], after: Optional[str], limit: int,
+                   direction: int = ASCENDING, sort_key: str = "created_at") -> tuple:
+    """Fetch one page ordered by (sort_key, id) and the cursor for the next page, if any"""
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    if after:
+        key, last_id = decode_cursor(after, sort_key)
+        op = "$gt" if direction == ASCENDING else "$lt"
+        query = {
+            **query,
+            "$or": [
+                {sort_key: {op: key}},
+                {sort_key: key, "id": {op: last_id}}
+            ]
+        }
+    
+    # One extra document tells us whether another page exists
+    docs = await collection.find(query, {"_id": 0}).sort([(sort_key, direction), ("id", direction)]).to_list(length=limit + 1)
+    next_cursor = encode_cursor(docs[limit - 1], sort_key) if len(docs) > limit else None
+    return docs[:limit], next_cursor
 
 # Pydantic Models
 class User(BaseModel):
@@ -146,7 +400,8 @@ class Resource(BaseModel):
     folder_id: Optional[str] = None
     kind: ResourceKind
     title: str
-    content: Optional[str] = None  # base64 for images, text for notes
+    content: Optional[str] = None  # text for notes; images and PDFs live in the blob store
+    blob: Optional[Dict[str, Any]] = None  # {"sha256", "size", "content_type"}
     url: Optional[str] = None
     meta: Optional[Dict[str, Any]] = {}
     status: ResourceStatus = ResourceStatus.UPLOADED
@@ -158,6 +413,7 @@ class StudyPlan(BaseModel):
     name: str
     start_date: str
     end_date: Optional[str] = None
+    hours_per_day: Optional[int] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 class PlanItem(BaseModel):
@@ -168,7 +424,9 @@ class PlanItem(BaseModel):
     subject: Subject
     topic: str
     target_minutes: int
+    kind: PlanItemKind = PlanItemKind.STUDY
     actual_minutes: int = 0
+    carried_minutes: int = 0  # minutes this item's last log moved onto later days
     status: PlanItemStatus = PlanItemStatus.PENDING
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -180,6 +438,7 @@ class ChatMessage(BaseModel):
     content: str
     mode: ChatMode = ChatMode.GENERAL
     context: Optional[Dict[str, Any]] = {}
+    seq: int = 0  # position in the session; history is ordered by it
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 class MCQSet(BaseModel):
@@ -200,14 +459,17 @@ class Flashcard(BaseModel):
     interval_days: int = 1
     reps: int = 0
     next_review_at: datetime = Field(default_factory=datetime.utcnow)
+    last_reviewed_at: Optional[datetime] = None
+    lapses: int = 0
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 class AnswerEvaluation(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     user_id: str
     question: str
-    answer_image: str  # base64
+    answer_blobs: List[Dict[str, Any]] = []  # one {"sha256", "size", "content_type"} per page, in order
     ocr_text: Optional[str] = None
+    ocr_pages: List[str] = []
     score: Optional[int] = None
     rubric: Optional[Dict[str, int]] = {}
     suggestions: Optional[str] = None
@@ -242,6 +504,7 @@ class PlanGenerateRequest(BaseModel):
     hours_per_day: int
     subjects: List[Subject]
     weak_areas: Optional[List[str]] = []
+    plan_id: Optional[str] = None  # regenerate this plan's pending items instead of creating a new plan
 
 class StudyLogRequest(BaseModel):
     plan_item_id: str
@@ -258,119 +521,844 @@ class FlashcardGenerateRequest(BaseModel):
     topic: str
     count: int = 10
 
+class FlashcardReview(BaseModel):
+    flashcard_id: str
+    grade: int = Field(ge=0, le=5)  # SM-2 quality: 0-2 forgotten, 3 hard, 4 good, 5 easy
+    reviewed_at: Optional[datetime] = None  # client time of the review; defaults to when the server receives it
+
+class FlashcardReviewRequest(BaseModel):
+    reviews: List[FlashcardReview]
+
 class EvaluationRequest(BaseModel):
     question: str
-    answer_image: str  # base64
+    answer_image: Optional[str] = None  # base64, single-page answers
+    answer_images: List[str] = []  # base64 pages in order
 
-# Initialize Ollama client
-try:
-    ollama_client = ollama.Client()
-    try:
-        ollama_client.show('mistral:7b')
-        OLLAMA_AVAILABLE = True
-    except:
-        logger.info("Pulling Mistral 7B model...")
-        try:
-            ollama_client.pull('mistral:7b')
-            OLLAMA_AVAILABLE = True
-        except Exception as e:
-            logger.warning(f"Failed to pull Mistral model: {e}")
-            OLLAMA_AVAILABLE = False
-except Exception as e:
-    logger.warning(f"Ollama not available: {e}")
-    ollama_client = None
-    OLLAMA_AVAILABLE = False
+# LLM configuration
+OLLAMA_MODEL = os.environ.get('OLLAMA_MODEL', 'mistral:7b')
+LLM_MAX_CONCURRENCY = int(os.environ.get('LLM_MAX_CONCURRENCY', '2'))
+LLM_TIMEOUT_SECONDS = float(os.environ.get('LLM_TIMEOUT_SECONDS', '120'))
+LLM_DEFAULT_OPTIONS = {
+    'temperature': 0.7,
+    'num_predict': 500
+}
+
+# LLM response cache configuration
+LLM_CACHE_ENABLED = os.environ.get('LLM_CACHE_ENABLED', 'true').lower() == 'true'
+LLM_CACHE_MAX_ENTRIES = int(os.environ.get('LLM_CACHE_MAX_ENTRIES', '1024'))
+LLM_CACHE_TTL_SECONDS = int(os.environ.get('LLM_CACHE_TTL_SECONDS', str(7 * 24 * 3600)))
+
+# OCR pool configuration
+OCR_MAX_WORKERS = int(os.environ.get('OCR_MAX_WORKERS', '2'))
+OCR_MAX_PENDING = int(os.environ.get('OCR_MAX_PENDING', '8'))
+OCR_QUEUE_TIMEOUT_SECONDS = float(os.environ.get('OCR_QUEUE_TIMEOUT_SECONDS', '10'))
+
+# OCR cache configuration
+OCR_CACHE_ENABLED = os.environ.get('OCR_CACHE_ENABLED', 'true').lower() == 'true'
+OCR_CACHE_MAX_ENTRIES = int(os.environ.get('OCR_CACHE_MAX_ENTRIES', '1024'))
+# Max dHash Hamming distance for near-duplicate hits; 0 disables, values above 3 are capped at 3
+OCR_CACHE_PHASH_DISTANCE = min(int(os.environ.get('OCR_CACHE_PHASH_DISTANCE', '0')), 3)
+
+# Vector retrieval configuration
+OLLAMA_EMBED_MODEL = os.environ.get('OLLAMA_EMBED_MODEL', 'nomic-embed-text')
+EMBED_BATCH_SIZE = int(os.environ.get('EMBED_BATCH_SIZE', '32'))
+VECTOR_INDEX_DIR = Path(os.environ.get('VECTOR_INDEX_DIR', str(ROOT_DIR / 'data' / 'vector_index')))
+VECTOR_INDEX_NPROBE = int(os.environ.get('VECTOR_INDEX_NPROBE', '64'))
+VECTOR_INDEX_MAX_OPEN = int(os.environ.get('VECTOR_INDEX_MAX_OPEN', '32'))
+RAG_TOP_K = int(os.environ.get('RAG_TOP_K', '5'))
+
+# Lexical search configuration
+BM25_K1 = float(os.environ.get('BM25_K1', '1.2'))
+BM25_B = float(os.environ.get('BM25_B', '0.75'))
+SEARCH_SNIPPET_WORDS = int(os.environ.get('SEARCH_SNIPPET_WORDS', '30'))
+SEARCH_MAX_POSTINGS_PER_TERM = int(os.environ.get('SEARCH_MAX_POSTINGS_PER_TERM', '2000'))  # highest-impact postings read per query term
+
+# Blob storage configuration
+BLOB_DIR = Path(os.environ.get('BLOB_DIR', str(ROOT_DIR / 'data' / 'blobs')))
+BLOB_READ_CHUNK_BYTES = int(os.environ.get('BLOB_READ_CHUNK_BYTES', str(256 * 1024)))
+RESOURCE_UPLOAD_MAX_BYTES = int(os.environ.get('RESOURCE_UPLOAD_MAX_BYTES', str(50 * 1024 * 1024)))
+ANSWER_UPLOAD_MAX_BYTES = int(os.environ.get('ANSWER_UPLOAD_MAX_BYTES', str(15 * 1024 * 1024)))  # per page
+UPLOAD_FIELD_MAX_BYTES = int(os.environ.get('UPLOAD_FIELD_MAX_BYTES', str(64 * 1024)))  # non-file form fields
+ANSWER_MAX_PAGES = int(os.environ.get('ANSWER_MAX_PAGES', '6'))
+
+# MCQ bank configuration
+MCQ_POOL_TARGET = int(os.environ.get('MCQ_POOL_TARGET', '40'))  # questions generated ahead for a new pool
+MCQ_POOL_LOW_WATER = int(os.environ.get('MCQ_POOL_LOW_WATER', '10'))  # refill when a user has fewer unseen
+MCQ_REFILL_BATCH = int(os.environ.get('MCQ_REFILL_BATCH', '20'))
+MCQ_GENERATION_CHUNK = int(os.environ.get('MCQ_GENERATION_CHUNK', '5'))  # questions per LLM call
+MCQ_REFILL_WORKERS = int(os.environ.get('MCQ_REFILL_WORKERS', '1'))
+MCQ_POOL_MAX = int(os.environ.get('MCQ_POOL_MAX', '500'))  # high-water mark: pools stop growing here
+MCQ_MAX_PER_REQUEST = int(os.environ.get('MCQ_MAX_PER_REQUEST', '20'))
+MCQ_PREFILL_ON_STARTUP = os.environ.get('MCQ_PREFILL_ON_STARTUP', 'true').lower() == 'true'
+
+# Daily dose configuration
+DOSE_MCQ_COUNT = int(os.environ.get('DOSE_MCQ_COUNT', '5'))
+DOSE_BUILD_HOUR = int(os.environ.get('DOSE_BUILD_HOUR', '2'))  # server local hour the nightly batch builds the next day's doses
+DOSE_ACTIVE_DAYS = int(os.environ.get('DOSE_ACTIVE_DAYS', '14'))  # users who logged study or set up a profile this recently
+DOSE_BUILD_CONCURRENCY = int(os.environ.get('DOSE_BUILD_CONCURRENCY', '4'))
+DOSE_RETENTION_DAYS = int(os.environ.get('DOSE_RETENTION_DAYS', '30'))
+
+# Flashcard scheduling configuration
+FLASHCARD_MIN_EASE = 1.3
+FLASHCARD_MAX_REVIEWS_PER_REQUEST = int(os.environ.get('FLASHCARD_MAX_REVIEWS_PER_REQUEST', '1000'))
+
+# Answer evaluation job configuration
+EVALUATION_WORKERS = int(os.environ.get('EVALUATION_WORKERS', '2'))
+EVALUATION_EVENTS_POLL_SECONDS = float(os.environ.get('EVALUATION_EVENTS_POLL_SECONDS', '2'))
+
+# Study planner configuration
+PLAN_MAX_DAYS = int(os.environ.get('PLAN_MAX_DAYS', '730'))
+PLAN_SESSION_MINUTES = int(os.environ.get('PLAN_SESSION_MINUTES', '60'))
+PLAN_REVISION_MINUTES = int(os.environ.get('PLAN_REVISION_MINUTES', '15'))
+PLAN_REVISION_INTERVALS = [int(days) for days in os.environ.get('PLAN_REVISION_INTERVALS', '1,7,30').split(',') if days.strip()]
+PLAN_FINAL_REVISION_DAYS = int(os.environ.get('PLAN_FINAL_REVISION_DAYS', '30'))  # at most a tenth of the horizon
+PLAN_WEAK_AREA_BOOST = float(os.environ.get('PLAN_WEAK_AREA_BOOST', '1.5'))
+PLAN_REPLAN_WINDOW_DAYS = int(os.environ.get('PLAN_REPLAN_WINDOW_DAYS', '14'))  # days ahead that absorb a logged shortfall
+PLAN_MIN_CARRY_MINUTES = int(os.environ.get('PLAN_MIN_CARRY_MINUTES', '15'))  # smaller under/over-runs are not rescheduled
+
+# Resource ingestion configuration
+RESOURCE_WORKERS = int(os.environ.get('RESOURCE_WORKERS', '2'))
+RESOURCE_OCR_RETRIES = int(os.environ.get('RESOURCE_OCR_RETRIES', '5'))
+CHUNK_WORDS = int(os.environ.get('CHUNK_WORDS', '200'))
+CHUNK_OVERLAP_WORDS = int(os.environ.get('CHUNK_OVERLAP_WORDS', '40'))
+
+# Model lifecycle configuration
+LLM_KEEP_ALIVE_SECONDS = float(os.environ.get('LLM_KEEP_ALIVE_SECONDS', '-1'))  # -1 keeps the model loaded; the model manager unloads it
+MODEL_IDLE_UNLOAD_SECONDS = float(os.environ.get('MODEL_IDLE_UNLOAD_SECONDS', '900'))
+MODEL_MEMORY_CAP_MB = float(os.environ.get('MODEL_MEMORY_CAP_MB', '0'))  # 0 disables idle unloading
+MODEL_MONITOR_INTERVAL_SECONDS = float(os.environ.get('MODEL_MONITOR_INTERVAL_SECONDS', '60'))
+MODEL_RETRY_MAX_SECONDS = float(os.environ.get('MODEL_RETRY_MAX_SECONDS', '1800'))  # backoff cap for failed loads
+
+# Async Ollama client; creating it does not connect, models are loaded by the model manager after startup
+async_ollama_client = ollama.AsyncClient()
+
+# Caps the number of generations running against Ollama at once; extra callers queue here
+llm_semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+
+class LRUCache:
+    """In-process LRU cache with a per-entry time-to-live"""
+    
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+    
+    def get(self, key: str) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+    
+    def set(self, key: str, value: Any, ttl_seconds: Optional[float] = None):
+        expires_at = time.monotonic() + (ttl_seconds if ttl_seconds is not None else self.ttl_seconds)
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+    
+    def clear(self):
+        self._entries.clear()
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+
+# Memory tier of the LLM response cache; MongoDB `llm_cache` is the persistent tier
+llm_response_cache = LRUCache(LLM_CACHE_MAX_ENTRIES, LLM_CACHE_TTL_SECONDS)
+llm_cache_stats = {"memory_hits": 0, "mongo_hits": 0, "misses": 0, "stores": 0}
+
+LLM_UNAVAILABLE_MESSAGE = "I'm currently using a lightweight mode. The full AI features are being prepared. Here's a helpful response based on your query about UPSC preparation."
+LLM_TIMEOUT_MESSAGE = "The AI model is taking longer than usual to respond. Please try again in a moment."
+LLM_ERROR_MESSAGE = "I'm having trouble processing your request with the full AI model. Here's a helpful response: For UPSC preparation, focus on consistent daily study, current affairs, and regular practice tests."
 
 # Helper Functions
-def get_ollama_response(prompt: str, context: str = "") -> str:
-    """Get response from Ollama Mistral model with fallback"""
-    if not OLLAMA_AVAILABLE or not ollama_client:
-        return "I'm currently using a lightweight mode. The full AI features are being prepared. Here's a helpful response based on your query about UPSC preparation."
+def build_llm_prompt(prompt: str, context: str = "") -> str:
+    """Build the full prompt sent to the LLM"""
+    return f"{context}\n\nUser: {prompt}\n\nAssistant:"
+
+def llm_cache_key(model: str, context: str, prompt: str, options: Dict[str, Any]) -> str:
+    """Content address of an LLM call; whitespace and case differences in the prompt map to the same key"""
+    payload = json.dumps({
+        "model": model,
+        "context": " ".join(context.split()),
+        "prompt": " ".join(prompt.split()).casefold(),
+        "options": options
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+async def get_cached_llm_response(key: str) -> Optional[str]:
+    """Look up a cached LLM response, memory tier first, then MongoDB"""
+    if not LLM_CACHE_ENABLED:
+        return None
+    
+    cached = llm_response_cache.get(key)
+    if cached is not None:
+        llm_cache_stats["memory_hits"] += 1
+        return cached
     
     try:
-        full_prompt = f"{context}\n\nUser: {prompt}\n\nAssistant:"
-        response = ollama_client.generate(
-            model='mistral:7b',
-            prompt=full_prompt,
-            options={
-                'temperature': 0.7,
-                'num_predict': 500
-            }
+        doc = await db.llm_cache.find_one(
+            {"key": key, "expires_at": {"$gt": datetime.utcnow()}},
+            {"_id": 0, "response": 1, "expires_at": 1}
+        )
+    except Exception as e:
+        logger.warning(f"LLM cache lookup failed: {e}")
+        doc = None
+    
+    if doc:
+        llm_cache_stats["mongo_hits"] += 1
+        remaining = (doc["expires_at"] - datetime.utcnow()).total_seconds()
+        llm_response_cache.set(key, doc["response"], ttl_seconds=max(remaining, 0))
+        return doc["response"]
+    
+    llm_cache_stats["misses"] += 1
+    return None
+
+async def store_llm_response(key: str, response: str):
+    """Write a successful LLM response to both cache tiers"""
+    if not LLM_CACHE_ENABLED or not response:
+        return
+    
+    llm_response_cache.set(key, response)
+    llm_cache_stats["stores"] += 1
+    now = datetime.utcnow()
+    try:
+        await db.llm_cache.update_one(
+            {"key": key},
+            {"$set": {
+                "key": key,
+                "model": OLLAMA_MODEL,
+                "response": response,
+                "created_at": now,
+                "expires_at": now + timedelta(seconds=LLM_CACHE_TTL_SECONDS)
+            }},
+            upsert=True
         )
+    except Exception as e:
+        logger.warning(f"LLM cache write failed: {e}")
+
+async def get_ollama_response(
+    prompt: str,
+    context: str = "",
+    timeout: Optional[float] = None,
+    use_cache: bool = True,
+    options: Optional[Dict[str, Any]] = None
+) -> str:
+    """Get response from Ollama Mistral model with fallback, without blocking the event loop"""
+    if not model_manager.is_available("llm"):
+        return LLM_UNAVAILABLE_MESSAGE
+    
+    options = {**LLM_DEFAULT_OPTIONS, **(options or {})}
+    cache_key = llm_cache_key(OLLAMA_MODEL, context, prompt, options) if use_cache else None
+    if cache_key:
+        cached = await get_cached_llm_response(cache_key)
+        if cached is not None:
+            return cached
+    
+    full_prompt = build_llm_prompt(prompt, context)
+    
+    async def _generate():
+        async with llm_semaphore:
+            with model_manager.using("llm"):
+                return await async_ollama_client.generate(
+                    model=OLLAMA_MODEL,
+                    prompt=full_prompt,
+                    options=options,
+                    keep_alive=LLM_KEEP_ALIVE_SECONDS
+                )
+    
+    try:
+        # Timeout covers queueing plus generation; cancellation aborts the HTTP call to Ollama
+        response = await asyncio.wait_for(_generate(), timeout=timeout or LLM_TIMEOUT_SECONDS)
+        if cache_key:
+            await store_llm_response(cache_key, response['response'])
         return response['response']
+    except asyncio.TimeoutError:
+        logger.warning(f"Ollama generation timed out after {timeout or LLM_TIMEOUT_SECONDS}s")
+        return LLM_TIMEOUT_MESSAGE
     except Exception as e:
         logger.error(f"Ollama error: {e}")
-        return "I'm having trouble processing your request with the full AI model. Here's a helpful response: For UPSC preparation, focus on consistent daily study, current affairs, and regular practice tests."
+        return LLM_ERROR_MESSAGE
+
+async def stream_ollama_response(prompt: str, context: str = "", timeout: Optional[float] = None, use_cache: bool = True) -> AsyncIterator[str]:
+    """Yield response tokens from Ollama as they are generated, with the same fallbacks as get_ollama_response"""
+    if not model_manager.is_available("llm"):
+        yield LLM_UNAVAILABLE_MESSAGE
+        return
+    
+    cache_key = llm_cache_key(OLLAMA_MODEL, context, prompt, LLM_DEFAULT_OPTIONS) if use_cache else None
+    if cache_key:
+        cached = await get_cached_llm_response(cache_key)
+        if cached is not None:
+            yield cached
+            return
+    
+    tokens = []
+    timeout = timeout or LLM_TIMEOUT_SECONDS
+    # Count the whole stream as in flight so the idle monitor can't unload the model between tokens
+    async with llm_semaphore:
+        with model_manager.using("llm"):
+            try:
+                stream = await asyncio.wait_for(
+                    async_ollama_client.generate(
+                        model=OLLAMA_MODEL,
+                        prompt=build_llm_prompt(prompt, context),
+                        options=LLM_DEFAULT_OPTIONS,
+                        keep_alive=LLM_KEEP_ALIVE_SECONDS,
+                        stream=True
+                    ),
+                    timeout=timeout
+                )
+                iterator = stream.__aiter__()
+                while True:
+                    # Timeout applies between tokens so a stalled model doesn't hold the slot forever
+                    try:
+                        chunk = await asyncio.wait_for(iterator.__anext__(), timeout=timeout)
+                    except StopAsyncIteration:
+                        break
+                    token = chunk['response']
+                    if token:
+                        tokens.append(token)
+                        yield token
+            except asyncio.TimeoutError:
+                logger.warning(f"Ollama stream stalled for more than {timeout}s")
+                yield LLM_TIMEOUT_MESSAGE
+            except Exception as e:
+                logger.error(f"Ollama streaming error: {e}")
+                yield LLM_ERROR_MESSAGE
+            else:
+                if cache_key:
+                    await store_llm_response(cache_key, "".join(tokens))
+
+# Planner conversations depend on the user's own schedule, so their answers are never shared via the cache
+LLM_UNCACHED_CHAT_MODES = {ChatMode.PLANNER}
+
+def get_chat_system_context(mode: ChatMode) -> str:
+    """System context used for a chat mode"""
+    if mode == ChatMode.RAG:
+        return "You are a UPSC preparation assistant. Use the provided context to answer questions."
+    elif mode == ChatMode.PLANNER:
+        return "You are a study planning assistant for UPSC preparation. Help create and manage study schedules."
+    return "You are a helpful UPSC preparation assistant. Provide accurate, detailed information about UPSC exams, current affairs, and study strategies."
+
+class OCRBusyError(Exception):
+    """Raised when the OCR pool is saturated and cannot accept more work"""
+
+class ModelUnavailableError(Exception):
+    """Raised by background jobs when a model they need failed to load"""
+    
+    def __init__(self, model: str):
+        super().__init__(f"{model} model is not available")
+        self.model = model
 
-def extract_text_from_image(base64_image: str) -> str:
-    """Extract text from image using PaddleOCR"""
-    if not OCR_AVAILABLE or not ocr_engine:
-        return "OCR service is currently being initialized. This is a placeholder text that would normally contain the extracted content from your handwritten answer."
+# Admits at most OCR_MAX_WORKERS running plus OCR_MAX_PENDING queued OCR jobs
+ocr_semaphore = asyncio.Semaphore(OCR_MAX_WORKERS + OCR_MAX_PENDING)
+ocr_executor: Optional[ProcessPoolExecutor] = None
+
+def get_ocr_executor() -> ProcessPoolExecutor:
+    """Get the OCR process pool, starting it on first use"""
+    global ocr_executor
+    if ocr_executor is None:
+        # spawn keeps workers from inheriting the server's Mongo/Ollama clients and event loop
+        ocr_executor = ProcessPoolExecutor(
+            max_workers=OCR_MAX_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=ocr_worker.init_worker
+        )
+    return ocr_executor
+
+def decode_base64_payload(data: str) -> bytes:
+    """Decode base64 content, accepting data URLs such as data:image/jpeg;base64,..."""
+    if data.startswith("data:") and "," in data:
+        data = data.split(",", 1)[1]
+    return base64.b64decode(data)
+
+# Per-step OCR timings (pre-processing steps plus "ocr"), summed across calls
+ocr_step_stats: Dict[str, Dict[str, float]] = {}
+
+def record_ocr_timings(timings: Dict[str, float]):
+    for step, elapsed_ms in timings.items():
+        stats = ocr_step_stats.setdefault(step, {"count": 0, "total_ms": 0.0})
+        stats["count"] += 1
+        stats["total_ms"] += elapsed_ms
+    logger.debug(f"OCR timings (ms): {timings}")
+
+async def run_in_ocr_pool(function: Callable, *args) -> Any:
+    """Run an ocr_worker function in the OCR process pool, holding one of the admitted job slots"""
+    global ocr_executor
+    try:
+        await asyncio.wait_for(ocr_semaphore.acquire(), timeout=OCR_QUEUE_TIMEOUT_SECONDS)
+    except asyncio.TimeoutError:
+        raise OCRBusyError("OCR service is busy. Please retry shortly.")
     
     try:
-        # Decode base64 image
-        image_data = base64.b64decode(base64_image)
-        image = Image.open(io.BytesIO(image_data))
-        
-        # Save temporarily for OCR processing
-        with tempfile.NamedTemporaryFile(suffix='.jpg', delete=False) as temp_file:
-            image.save(temp_file.name)
-            temp_path = temp_file.name
-        
-        # Run OCR
-        result = ocr_engine.ocr(temp_path, cls=True)
-        
-        # Cleanup temp file
-        os.unlink(temp_path)
-        
-        # Extract text from OCR result
-        extracted_text = []
-        if result and result[0]:
-            for line in result[0]:
-                if len(line) > 1 and line[1]:
-                    text = line[1][0] if isinstance(line[1], tuple) else str(line[1])
-                    extracted_text.append(text)
+        loop = asyncio.get_running_loop()
+        with model_manager.using("ocr"):
+            return await loop.run_in_executor(get_ocr_executor(), function, *args)
+    except BrokenProcessPool:
+        # A worker died (e.g. out of memory); start a fresh pool on the next call
+        ocr_executor = None
+        raise
+    finally:
+        ocr_semaphore.release()
+
+async def run_ocr(image: Union[bytes, Path]) -> List[str]:
+    """Run OCR on encoded image bytes or an image file in the OCR process pool and return the text lines"""
+    if isinstance(image, Path):
+        # Workers read stored files themselves, so the image is never pickled through the pool
+        lines, timings = await run_in_ocr_pool(ocr_worker.run_ocr_file, str(image))
+    else:
+        lines, timings = await run_in_ocr_pool(ocr_worker.run_ocr, image)
+    record_ocr_timings(timings)
+    return lines
+
+async def run_ocr_batch(images: List[Union[bytes, Path]]) -> List[List[str]]:
+    """Run OCR on several pages in one predict call on one pool worker; returns text lines per page"""
+    pages, timings = await run_in_ocr_pool(
+        ocr_worker.run_ocr_batch, [str(image) if isinstance(image, Path) else image for image in images]
+    )
+    for page_timings in timings:
+        record_ocr_timings(page_timings)
+    return pages
+
+# OCR Cache
+# ocr_cache maps the SHA-256 of decoded pixels to OCR lines for the current engine version. Each entry
+# also lists the SHA-256 of every file seen with those pixels, so an exact resubmission is found without
+# decoding, and a dHash split into 16-bit bands so near-duplicates within 3 bits share a band.
+def get_ocr_engine_version() -> str:
+    try:
+        version = importlib.metadata.version("paddleocr")
+    except importlib.metadata.PackageNotFoundError:
+        version = "unknown"
+    options = ",".join(f"{key}={value}" for key, value in sorted(ocr_worker.OCR_ENGINE_OPTIONS.items()))
+    preprocess = ",".join(ocr_worker.OCR_PREPROCESS_STEPS)
+    return f"paddleocr-{version}:{options}:{preprocess}@{ocr_worker.OCR_TARGET_LONG_EDGE}"
+
+OCR_ENGINE_VERSION = get_ocr_engine_version()
+ocr_result_cache = LRUCache(OCR_CACHE_MAX_ENTRIES, ttl_seconds=float("inf"))
+ocr_cache_stats = {"memory_hits": 0, "file_hits": 0, "pixel_hits": 0, "near_hits": 0, "misses": 0, "stores": 0}
+
+def phash_bands(phash: int) -> List[str]:
+    return [f"{band}:{(phash >> (16 * band)) & 0xFFFF:04x}" for band in range(4)]
+
+def to_int64(value: int) -> int:
+    # MongoDB stores signed 64-bit integers
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+async def lookup_ocr_cache(image: Union[bytes, Path]) -> tuple:
+    """Return (cached lines or None, fingerprint for store_ocr_cache)"""
+    # Blob files are named by the SHA-256 of their bytes
+    file_hash = image.name if isinstance(image, Path) else hashlib.sha256(image).hexdigest()
+    fingerprint = {"file_hash": file_hash}
+    if not OCR_CACHE_ENABLED:
+        return None, fingerprint
+    
+    cached = ocr_result_cache.get(file_hash)
+    if cached is not None:
+        ocr_cache_stats["memory_hits"] += 1
+        return cached, fingerprint
+    
+    try:
+        doc = await db.ocr_cache.find_one(
+            {"engine": OCR_ENGINE_VERSION, "file_hashes": file_hash}, {"_id": 0, "lines": 1}
+        )
+        if doc:
+            ocr_cache_stats["file_hits"] += 1
+            ocr_result_cache.set(file_hash, doc["lines"])
+            return doc["lines"], fingerprint
         
-        return "\n".join(extracted_text) if extracted_text else "No text found in the image."
+        pixel_hash, phash = await asyncio.to_thread(
+            ocr_worker.fingerprint_image, str(image) if isinstance(image, Path) else image
+        )
+        fingerprint.update({"pixel_hash": pixel_hash, "phash": phash})
+        doc = await db.ocr_cache.find_one_and_update(
+            {"engine": OCR_ENGINE_VERSION, "pixel_hash": pixel_hash},
+            {"$addToSet": {"file_hashes": file_hash}},
+            projection={"_id": 0, "lines": 1}
+        )
+        if doc:
+            ocr_cache_stats["pixel_hits"] += 1
+            ocr_result_cache.set(file_hash, doc["lines"])
+            return doc["lines"], fingerprint
         
+        if OCR_CACHE_PHASH_DISTANCE:
+            candidates = await db.ocr_cache.find(
+                {"engine": OCR_ENGINE_VERSION, "phash_bands": {"$in": phash_bands(phash)}},
+                {"_id": 0, "phash": 1, "lines": 1}
+            ).to_list(length=100)
+            distances = [(bin((candidate["phash"] ^ phash) & ((1 << 64) - 1)).count("1"), candidate) for candidate in candidates]
+            near = [entry for entry in distances if entry[0] <= OCR_CACHE_PHASH_DISTANCE]
+            if near:
+                ocr_cache_stats["near_hits"] += 1
+                lines = min(near, key=lambda entry: entry[0])[1]["lines"]
+                await store_ocr_cache(fingerprint, lines)
+                return lines, fingerprint
+    except ValueError:
+        # Undecodable image; let OCR report the error
+        pass
     except Exception as e:
-        logger.error(f"OCR error: {e}")
-        return f"OCR processing encountered an issue. Error: {str(e)}"
-
-def generate_study_plan(exam_date: str, hours_per_day: int, subjects: List[Subject]) -> List[Dict]:
-    """Generate a simple study plan"""
-    from datetime import datetime, timedelta
-    
-    plan_items = []
-    exam_dt = datetime.strptime(exam_date, "%Y-%m-%d")
-    days_until_exam = (exam_dt - datetime.now()).days
-    
-    # Simple algorithm: distribute topics across subjects
-    topics_per_subject = {
-        Subject.GS1: ["Indian Heritage", "History", "Geography", "Society"],
-        Subject.GS2: ["Governance", "Constitution", "Polity", "Social Justice"],
-        Subject.GS3: ["Economy", "Environment", "Security", "Technology"],
-        Subject.GS4: ["Ethics", "Integrity", "Case Studies", "Applications"],
-        Subject.ESSAY: ["Essay Writing", "Current Topics", "Practice"],
-        Subject.CSAT: ["Quantitative", "Reasoning", "Comprehension"],
-        Subject.OPTIONAL: ["Core Concepts", "Previous Year Questions", "Mock Tests"]
-    }
+        logger.warning(f"OCR cache lookup failed: {e}")
+    
+    ocr_cache_stats["misses"] += 1
+    return None, fingerprint
+
+async def store_ocr_cache(fingerprint: Dict[str, Any], lines: List[str]):
+    """Record OCR lines under the image's pixel hash and file hash"""
+    if not OCR_CACHE_ENABLED or "pixel_hash" not in fingerprint:
+        return
+    
+    ocr_result_cache.set(fingerprint["file_hash"], lines)
+    ocr_cache_stats["stores"] += 1
+    try:
+        await db.ocr_cache.update_one(
+            {"engine": OCR_ENGINE_VERSION, "pixel_hash": fingerprint["pixel_hash"]},
+            {
+                "$setOnInsert": {
+                    "lines": lines,
+                    "phash": to_int64(fingerprint["phash"]),
+                    "phash_bands": phash_bands(fingerprint["phash"]),
+                    "created_at": datetime.utcnow()
+                },
+                "$addToSet": {"file_hashes": fingerprint["file_hash"]}
+            },
+            upsert=True
+        )
+    except Exception as e:
+        logger.warning(f"OCR cache write failed: {e}")
+
+async def purge_stale_ocr_cache():
+    """Drop cache entries written by other OCR engine versions"""
+    try:
+        result = await db.ocr_cache.delete_many({"engine": {"$ne": OCR_ENGINE_VERSION}})
+        if result.deleted_count:
+            logger.info(f"Removed {result.deleted_count} OCR cache entries from older engine versions")
+    except Exception as e:
+        logger.warning(f"OCR cache purge failed: {e}")
+
+# Model Lifecycle
+class ModelState(str, Enum):
+    NOT_LOADED = "not_loaded"
+    LOADING = "loading"
+    READY = "ready"
+    UNLOADED = "unloaded"
+    FAILED = "failed"
+
+class ModelManager:
+    """Loads the OCR, LLM and embedding models in the background, tracks readiness and unloads idle models"""
+    
+    def __init__(self):
+        self.models: Dict[str, Dict[str, Any]] = {
+            name: {
+                "state": ModelState.NOT_LOADED,
+                "error": None,
+                "loaded_at": None,
+                "last_used_at": None,
+                "warmup_ms": None,
+                "in_flight": 0,
+                "failures": 0,
+                "retry_at": None
+            }
+            for name in ("llm", "embed", "ocr")
+        }
+        self._settled = {name: asyncio.Event() for name in self.models}
+        self._ready_listeners: Dict[str, List[Callable[[], Awaitable[None]]]] = {name: [] for name in self.models}
+        self._tasks: List[asyncio.Task] = []
+    
+    def is_available(self, name: str) -> bool:
+        # Unloaded models are reloaded lazily by the next call; only loading/failed models are unavailable
+        return self.models[name]["state"] in (ModelState.READY, ModelState.UNLOADED)
+    
+    def is_ready(self) -> bool:
+        return all(m["state"] not in (ModelState.NOT_LOADED, ModelState.LOADING) for m in self.models.values())
+    
+    def mark_used(self, name: str):
+        model = self.models[name]
+        model["last_used_at"] = datetime.utcnow()
+        if model["state"] == ModelState.UNLOADED:
+            model["state"] = ModelState.READY
+    
+    @contextlib.contextmanager
+    def using(self, name: str):
+        """Track an in-flight call so the idle monitor never unloads a model mid-request"""
+        model = self.models[name]
+        model["in_flight"] += 1
+        try:
+            yield
+        finally:
+            model["in_flight"] -= 1
+            self.mark_used(name)
+    
+    def on_ready(self, name: str, listener: Callable[[], Awaitable[None]]):
+        """Run listener each time a model becomes ready after a failed load"""
+        self._ready_listeners[name].append(listener)
     
-    current_date = datetime.now().date()
-    for i in range(min(14, days_until_exam)):  # Plan for next 2 weeks
-        date_str = (current_date + timedelta(days=i)).isoformat()
-        subject = subjects[i % len(subjects)]
-        topics = topics_per_subject.get(subject, ["General Study"])
-        topic = topics[i % len(topics)]
+    def _set_state(self, name: str, state: ModelState, error: Optional[str] = None):
+        model = self.models[name]
+        recovered = state == ModelState.READY and model["failures"] > 0
+        model["state"] = state
+        model["error"] = error
+        if state == ModelState.READY:
+            model["loaded_at"] = datetime.utcnow()
+            model["failures"] = 0
+            model["retry_at"] = None
+        elif state == ModelState.FAILED:
+            # Exponential backoff from the monitor interval, capped at MODEL_RETRY_MAX_SECONDS
+            delay = min(MODEL_MONITOR_INTERVAL_SECONDS * 2 ** model["failures"], MODEL_RETRY_MAX_SECONDS)
+            model["failures"] += 1
+            model["retry_at"] = datetime.utcnow() + timedelta(seconds=delay)
+        if state in (ModelState.NOT_LOADED, ModelState.LOADING):
+            self._settled[name].clear()
+        else:
+            self._settled[name].set()
+        if recovered:
+            for listener in self._ready_listeners[name]:
+                self._tasks.append(asyncio.create_task(listener()))
+    
+    async def wait_until_available(self, name: str, timeout: Optional[float] = None) -> bool:
+        """Wait for a model to finish loading; background jobs use this instead of placeholder results"""
+        try:
+            await asyncio.wait_for(self._settled[name].wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return False
+        return self.is_available(name)
+    
+    async def load_llm(self):
+        """Make sure the LLM is pulled, then load it into memory with a one-token warm-up generation"""
+        self._set_state("llm", ModelState.LOADING)
+        try:
+            try:
+                await async_ollama_client.show(OLLAMA_MODEL)
+            except ollama.ResponseError:
+                logger.info(f"Pulling {OLLAMA_MODEL} model...")
+                await async_ollama_client.pull(OLLAMA_MODEL)
+            started = time.perf_counter()
+            await async_ollama_client.generate(
+                model=OLLAMA_MODEL,
+                prompt="Hello",
+                options={'num_predict': 1},
+                keep_alive=LLM_KEEP_ALIVE_SECONDS
+            )
+            self.models["llm"]["warmup_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            self._set_state("llm", ModelState.READY)
+            logger.info(f"{OLLAMA_MODEL} ready (warm-up {self.models['llm']['warmup_ms']} ms)")
+        except Exception as e:
+            logger.warning(f"Ollama not available: {e}")
+            self._set_state("llm", ModelState.FAILED, str(e))
+    
+    async def load_embed(self):
+        """Make sure the embedding model is pulled, then load it with a one-input warm-up"""
+        self._set_state("embed", ModelState.LOADING)
+        try:
+            try:
+                await async_ollama_client.show(OLLAMA_EMBED_MODEL)
+            except ollama.ResponseError:
+                logger.info(f"Pulling {OLLAMA_EMBED_MODEL} model...")
+                await async_ollama_client.pull(OLLAMA_EMBED_MODEL)
+            started = time.perf_counter()
+            await async_ollama_client.embed(model=OLLAMA_EMBED_MODEL, input="warm-up", keep_alive=LLM_KEEP_ALIVE_SECONDS)
+            self.models["embed"]["warmup_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            self._set_state("embed", ModelState.READY)
+            logger.info(f"{OLLAMA_EMBED_MODEL} ready (warm-up {self.models['embed']['warmup_ms']} ms)")
+        except Exception as e:
+            logger.warning(f"Embedding model not available: {e}")
+            self._set_state("embed", ModelState.FAILED, str(e))
+    
+    async def load_ocr(self):
+        """Start the OCR pool workers, each loading PaddleOCR and running a warm-up pass"""
+        global ocr_executor
+        if not OCR_AVAILABLE:
+            self._set_state("ocr", ModelState.FAILED, "paddleocr is not installed")
+            return
+        self._set_state("ocr", ModelState.LOADING)
+        try:
+            started = time.perf_counter()
+            loop = asyncio.get_running_loop()
+            if self.models["ocr"]["failures"] and ocr_executor is not None:
+                # A failed warm-up can leave the pool broken; retry with fresh workers
+                ocr_executor.shutdown(wait=False, cancel_futures=True)
+                ocr_executor = None
+            executor = get_ocr_executor()
+            await asyncio.gather(*[
+                loop.run_in_executor(executor, ocr_worker.warm_up)
+                for _ in range(OCR_MAX_WORKERS)
+            ])
+            self.models["ocr"]["warmup_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            self._set_state("ocr", ModelState.READY)
+            logger.info(f"PaddleOCR ready (warm-up {self.models['ocr']['warmup_ms']} ms)")
+        except Exception as e:
+            logger.warning(f"PaddleOCR not available: {e}")
+            self._set_state("ocr", ModelState.FAILED, str(e))
+    
+    async def memory_usage_mb(self) -> Dict[str, float]:
+        """Resident memory of each model: the Ollama runners for LLM/embeddings, the pool workers for OCR"""
+        usage = {"llm": 0.0, "embed": 0.0, "ocr": 0.0}
+        try:
+            running = await async_ollama_client.ps()
+            for name, model_name in (("llm", OLLAMA_MODEL), ("embed", OLLAMA_EMBED_MODEL)):
+                usage[name] = sum(m.size or 0 for m in running.models if m.model == model_name) / (1024 * 1024)
+        except Exception:
+            pass
+        if psutil and ocr_executor is not None:
+            for child in psutil.Process().children(recursive=True):
+                try:
+                    usage["ocr"] += child.memory_info().rss / (1024 * 1024)
+                except psutil.Error:
+                    pass
+        return usage
+    
+    async def unload(self, name: str):
+        global ocr_executor
+        if name == "llm":
+            # keep_alive=0 asks Ollama to evict the model right away; the next generate reloads it
+            await async_ollama_client.generate(model=OLLAMA_MODEL, prompt="", keep_alive=0)
+        elif name == "embed":
+            await async_ollama_client.embed(model=OLLAMA_EMBED_MODEL, input="", keep_alive=0)
+        elif ocr_executor is not None:
+            ocr_executor.shutdown(wait=False)
+            ocr_executor = None
+        self._set_state(name, ModelState.UNLOADED)
+        logger.info(f"Unloaded idle {name} model")
+    
+    async def unload_idle_models(self):
+        """Unload least recently used idle models until usage is back under MODEL_MEMORY_CAP_MB"""
+        usage = await self.memory_usage_mb()
+        total = sum(usage.values())
+        if total <= MODEL_MEMORY_CAP_MB:
+            return
         
-        plan_items.append({
-            "date": date_str,
-            "subject": subject,
-            "topic": topic,
-            "target_minutes": hours_per_day * 60 // len(subjects)
-        })
+        now = datetime.utcnow()
+        idle = [
+            name for name, model in self.models.items()
+            if model["state"] == ModelState.READY
+            and model["in_flight"] == 0
+            and (now - (model["last_used_at"] or model["loaded_at"])).total_seconds() >= MODEL_IDLE_UNLOAD_SECONDS
+        ]
+        idle.sort(key=lambda name: self.models[name]["last_used_at"] or self.models[name]["loaded_at"])
+        for name in idle:
+            if total <= MODEL_MEMORY_CAP_MB:
+                break
+            try:
+                await self.unload(name)
+                total -= usage[name]
+            except Exception as e:
+                logger.warning(f"Failed to unload {name} model: {e}")
     
-    return plan_items
+    async def monitor(self):
+        """Retry failed model loads with backoff (Ollama may start after us) and enforce the memory cap"""
+        loaders = {"llm": self.load_llm, "embed": self.load_embed, "ocr": self.load_ocr}
+        while True:
+            await asyncio.sleep(MODEL_MONITOR_INTERVAL_SECONDS)
+            try:
+                now = datetime.utcnow()
+                for name, load in loaders.items():
+                    model = self.models[name]
+                    if name == "ocr" and not OCR_AVAILABLE:
+                        continue
+                    if model["state"] == ModelState.FAILED and model["retry_at"] <= now:
+                        await load()
+                if MODEL_MEMORY_CAP_MB > 0:
+                    await self.unload_idle_models()
+            except Exception as e:
+                logger.warning(f"Model monitor error: {e}")
+    
+    def start(self):
+        self._tasks = [
+            asyncio.create_task(self.load_llm()),
+            asyncio.create_task(self.load_embed()),
+            asyncio.create_task(self.load_ocr()),
+            asyncio.create_task(self.monitor())
+        ]
+    
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+    
+    def status(self) -> Dict[str, Any]:
+        return {
+            name: {
+                "state": model["state"].value,
+                "error": model["error"],
+                "loaded_at": model["loaded_at"].isoformat() if model["loaded_at"] else None,
+                "last_used_at": model["last_used_at"].isoformat() if model["last_used_at"] else None,
+                "warmup_ms": model["warmup_ms"],
+                "in_flight": model["in_flight"]
+            }
+            for name, model in self.models.items()
+        }
+
+model_manager = ModelManager()
+
+# Study time is split across subjects by weight, then evenly across each subject's topics
+SUBJECT_WEIGHTS = {
+    Subject.GS1: 1.0,
+    Subject.GS2: 1.0,
+    Subject.GS3: 1.0,
+    Subject.GS4: 0.75,
+    Subject.ESSAY: 0.5,
+    Subject.CSAT: 0.5,
+    Subject.OPTIONAL: 1.5
+}
+
+SUBJECT_TOPICS = {
+    Subject.GS1: ["Indian Heritage", "History", "Geography", "Society"],
+    Subject.GS2: ["Governance", "Constitution", "Polity", "Social Justice"],
+    Subject.GS3: ["Economy", "Environment", "Security", "Technology"],
+    Subject.GS4: ["Ethics", "Integrity", "Case Studies", "Applications"],
+    Subject.ESSAY: ["Essay Writing", "Current Topics", "Practice"],
+    Subject.CSAT: ["Quantitative", "Reasoning", "Comprehension"],
+    Subject.OPTIONAL: ["Core Concepts", "Previous Year Questions", "Mock Tests"]
+}
+
+def plan_topic_weights(subjects: List[Subject], weak_areas: List[str]) -> tuple:
+    """(subject, topic) pairs and their weights; a weak area naming a subject or topic boosts it"""
+    weak = {area.strip().casefold() for area in weak_areas if area.strip()}
+    topics = []
+    weights = []
+    for subject in dict.fromkeys(subjects):
+        subject_topics = SUBJECT_TOPICS.get(subject, ["General Study"])
+        for topic in subject_topics:
+            weight = SUBJECT_WEIGHTS.get(subject, 1.0) / len(subject_topics)
+            if subject.value in weak or topic.casefold() in weak:
+                weight *= PLAN_WEAK_AREA_BOOST
+            topics.append((subject, topic))
+            weights.append(weight)
+    return topics, weights
+
+def generate_study_plan(exam_date: str, hours_per_day: int, subjects: List[Subject], weak_areas: Optional[List[str]] = None) -> List[Dict]:
+    """Schedule study and spaced revision for every day from today until the exam (see planner.py)"""
+    start = datetime.now().date()
+    try:
+        exam_day = date.fromisoformat(exam_date)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="exam_date must be YYYY-MM-DD")
+    num_days = min((exam_day - start).days, PLAN_MAX_DAYS)
+    
+    topics, weights = plan_topic_weights(subjects, weak_areas or [])
+    entries = planner.schedule(
+        num_days,
+        hours_per_day * 60,
+        weights,
+        session_minutes=PLAN_SESSION_MINUTES,
+        revision_minutes=PLAN_REVISION_MINUTES,
+        intervals=PLAN_REVISION_INTERVALS,
+        final_revision_days=planner.final_revision_span(num_days, PLAN_FINAL_REVISION_DAYS)
+    )
+    
+    return [
+        {
+            "date": (start + timedelta(days=day)).isoformat(),
+            "subject": topics[topic][0],
+            "topic": topics[topic][1],
+            "kind": PlanItemKind(kind),
+            "target_minutes": minutes
+        }
+        for day, topic, kind, minutes in entries
+    ]
 
 # Auth Endpoints
 @api_router.post("/auth/verify")
@@ -401,13 +1389,13 @@ async def verify_auth(request: AuthRequest):
 @api_router.get("/me")
 async def get_current_user(user_id: str = "mock_user"):
     """Get current user profile"""
-    user = await db.users.find_one({"id": user_id})
-    profile = await db.profiles.find_one({"user_id": user_id})
+    user = await db.users.find_one({"id": user_id}, {"_id": 0})
+    profile = await db.profiles.find_one({"user_id": user_id}, {"_id": 0})
     
-    return {
-        "user": serialize_doc(user),
-        "profile": serialize_doc(profile)
-    }
+    return MongoJSONResponse({
+        "user": user,
+        "profile": profile
+    })
 
 @api_router.post("/profile/setup")
 async def setup_profile(request: ProfileSetupRequest, user_id: str = "mock_user"):
@@ -425,9 +1413,53 @@ async def setup_profile(request: ProfileSetupRequest, user_id: str = "mock_user"
     return {"message": "Profile updated successfully"}
 
 # Chat Endpoints
+# Timestamps can't order a conversation: on a cache hit the reply is stored in the same millisecond as
+# the question. Each exchange instead reserves two consecutive numbers from the session's counter in
+# chat_sessions, the question taking the first and the reply the second.
+async def reserve_chat_sequence(user_id: str, session_id: str) -> int:
+    """First of two consecutive sequence numbers for a question and its reply"""
+    for attempt in range(2):
+        try:
+            session = await db.chat_sessions.find_one_and_update(
+                {"user_id": user_id, "session_id": session_id},
+                {"$inc": {"seq": 2}, "$setOnInsert": {"created_at": datetime.utcnow()}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            return session["seq"] - 1
+        except DuplicateKeyError:
+            # Two first messages raced to create the counter; the loser retries against the winner's
+            if attempt:
+                raise
+
+async def backfill_chat_sequences():
+    """Number messages stored before chat sequences existed, oldest first with questions before replies"""
+    role_order = {"user": 0, "assistant": 1}
+    sessions = await db.chat_messages.distinct("session_id", {"seq": {"$exists": False}})
+    for session_id in sessions:
+        messages = await db.chat_messages.find(
+            {"session_id": session_id}, {"_id": 0, "id": 1, "user_id": 1, "role": 1, "created_at": 1, "seq": 1}
+        ).to_list(length=None)
+        # Unnumbered messages predate every numbered one
+        messages.sort(key=lambda message: (
+            "seq" in message, message.get("seq", 0), message["created_at"], role_order.get(message["role"], 2), message["id"]
+        ))
+        for user_id in {message["user_id"] for message in messages}:
+            own = [message for message in messages if message["user_id"] == user_id]
+            await db.chat_messages.bulk_write([
+                UpdateOne({"id": message["id"]}, {"$set": {"seq": seq}}) for seq, message in enumerate(own, start=1)
+            ], ordered=False)
+            await db.chat_sessions.update_one(
+                {"user_id": user_id, "session_id": session_id},
+                {"$max": {"seq": len(own)}, "$setOnInsert": {"created_at": datetime.utcnow()}},
+                upsert=True
+            )
+    logger.info(f"Numbered the messages of {len(sessions)} chat sessions")
+
 @api_router.post("/chat/message")
 async def send_chat_message(request: ChatRequest, user_id: str = "mock_user"):
     """Send a chat message and get AI response"""
+    seq = await reserve_chat_sequence(user_id, request.session_id)
     # Store user message
     user_message_data = {
         "id": str(uuid.uuid4()),
@@ -437,20 +1469,19 @@ async def send_chat_message(request: ChatRequest, user_id: str = "mock_user"):
         "content": request.message,
         "mode": request.mode.value,
         "context": request.context or {},
+        "seq": seq,
         "created_at": datetime.utcnow()
     }
     await db.chat_messages.insert_one(user_message_data)
     
     # Generate AI response based on mode
-    context = ""
+    context = get_chat_system_context(request.mode)
     if request.mode == ChatMode.RAG:
-        context = "You are a UPSC preparation assistant. Use the provided context to answer questions."
-    elif request.mode == ChatMode.PLANNER:
-        context = "You are a study planning assistant for UPSC preparation. Help create and manage study schedules."
-    else:
-        context = "You are a helpful UPSC preparation assistant. Provide accurate, detailed information about UPSC exams, current affairs, and study strategies."
+        context = build_rag_context(context, await retrieve_resource_chunks(user_id, request.message))
     
-    ai_response = get_ollama_response(request.message, context)
+    ai_response = await get_ollama_response(
+        request.message, context, use_cache=request.mode not in LLM_UNCACHED_CHAT_MODES
+    )
     
     # Store AI response
     ai_message_data = {
@@ -461,6 +1492,7 @@ async def send_chat_message(request: ChatRequest, user_id: str = "mock_user"):
         "content": ai_response,
         "mode": request.mode.value,
         "context": request.context or {},
+        "seq": seq + 1,
         "created_at": datetime.utcnow()
     }
     await db.chat_messages.insert_one(ai_message_data)
@@ -470,147 +1502,1703 @@ async def send_chat_message(request: ChatRequest, user_id: str = "mock_user"):
         "message_id": ai_message_data["id"]
     }
 
-@api_router.get("/chat/history/{session_id}")
-async def get_chat_history(session_id: str, user_id: str = "mock_user"):
-    """Get chat history for a session"""
-    messages_cursor = db.chat_messages.find({
-        "user_id": user_id,
-        "session_id": session_id
-    }).sort("created_at", 1)
-    
-    messages = await messages_cursor.to_list(length=1000)
-    
-    return {"messages": serialize_doc(messages)}
-
-# Resource Endpoints
-@api_router.post("/resources")
-async def create_resource(request: ResourceCreateRequest, user_id: str = "mock_user"):
-    """Create a new resource"""
-    resource_data = {
+@api_router.post("/chat/message/stream")
+async def stream_chat_message(request: ChatRequest, user_id: str = "mock_user"):
+    """Send a chat message and stream the AI response as Server-Sent Events"""
+    seq = await reserve_chat_sequence(user_id, request.session_id)
+    user_message_data = {
         "id": str(uuid.uuid4()),
         "user_id": user_id,
-        "folder_id": request.folder_id,
-        "kind": request.kind.value,
-        "title": request.title,
-        "content": request.content,
-        "url": request.url,
-        "meta": {},
-        "status": ResourceStatus.UPLOADED.value,
+        "session_id": request.session_id,
+        "role": "user",
+        "content": request.message,
+        "mode": request.mode.value,
+        "context": request.context or {},
+        "seq": seq,
         "created_at": datetime.utcnow()
     }
+    await db.chat_messages.insert_one(user_message_data)
     
-    await db.resources.insert_one(resource_data)
+    context = get_chat_system_context(request.mode)
+    if request.mode == ChatMode.RAG:
+        context = build_rag_context(context, await retrieve_resource_chunks(user_id, request.message))
+    message_id = str(uuid.uuid4())
     
-    # Mock processing - set status to indexed after 2 seconds
-    asyncio.create_task(mock_process_resource(resource_data["id"]))
+    def build_ai_message(content: str, truncated: bool = False) -> Dict[str, Any]:
+        ai_message_data = {
+            "id": message_id,
+            "user_id": user_id,
+            "session_id": request.session_id,
+            "role": "assistant",
+            "content": content,
+            "mode": request.mode.value,
+            "context": request.context or {},
+            "seq": seq + 1,
+            "created_at": datetime.utcnow()
+        }
+        if truncated:
+            ai_message_data["truncated"] = True
+        return ai_message_data
     
-    return serialize_doc(resource_data)
-
-async def mock_process_resource(resource_id: str):
-    """Mock resource processing"""
-    await asyncio.sleep(2)
-    await db.resources.update_one(
-        {"id": resource_id},
-        {"$set": {"status": ResourceStatus.PARSED.value}}
+    async def event_stream():
+        tokens = []
+        completed = False
+        try:
+            yield f"event: start\ndata: {json.dumps({'message_id': message_id})}\n\n"
+            async for token in stream_ollama_response(
+                request.message, context, use_cache=request.mode not in LLM_UNCACHED_CHAT_MODES
+            ):
+                tokens.append(token)
+                yield f"data: {json.dumps({'token': token})}\n\n"
+            completed = True
+            await db.chat_messages.insert_one(build_ai_message("".join(tokens)))
+            yield f"event: done\ndata: {json.dumps({'message_id': message_id})}\n\n"
+        finally:
+            if not completed and tokens:
+                # Client disconnected mid-stream; keep the partial answer without awaiting in a cancelled task
+                asyncio.create_task(db.chat_messages.insert_one(build_ai_message("".join(tokens), truncated=True)))
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
     )
-    await asyncio.sleep(3)
-    await db.resources.update_one(
-        {"id": resource_id},
-        {"$set": {"status": ResourceStatus.INDEXED.value}}
+
+@api_router.get("/chat/history/{session_id}")
+async def get_chat_history(session_id: str, after: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE, user_id: str = "mock_user"):
+    """Get chat history for a session, oldest first, one page at a time"""
+    messages, next_cursor = await paginate(
+        db.chat_messages,
+        {"user_id": user_id, "session_id": session_id},
+        after, limit, sort_key="seq"
     )
+    
+    return MongoJSONResponse({"messages": messages, "next_cursor": next_cursor})
 
-@api_router.get("/resources")
-async def get_resources(user_id: str = "mock_user"):
-    """Get user resources"""
-    resources_cursor = db.resources.find({"user_id": user_id}).sort("created_at", -1)
-    resources = await resources_cursor.to_list(length=1000)
-    return {"resources": serialize_doc(resources)}
+# Blob Storage
+BLOB_SIGNATURES = (
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"GIF8", "image/gif"),
+    (b"%PDF-", "application/pdf"),
+)
 
-# Study Plan Endpoints
-@api_router.post("/planner/generate")
-async def generate_plan(request: PlanGenerateRequest, user_id: str = "mock_user"):
-    """Generate a study plan"""
-    # Create study plan
-    plan_data = {
-        "id": str(uuid.uuid4()),
-        "user_id": user_id,
-        "name": f"UPSC Study Plan - {datetime.now().strftime('%B %Y')}",
-        "start_date": datetime.now().date().isoformat(),
-        "end_date": request.exam_date,
-        "created_at": datetime.utcnow()
-    }
-    await db.study_plans.insert_one(plan_data)
+def sniff_content_type(data: bytes, default: str = "application/octet-stream") -> str:
+    """Guess a MIME type from the leading bytes of a payload"""
+    for signature, content_type in BLOB_SIGNATURES:
+        if data.startswith(signature):
+            return content_type
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return default
+
+def decode_upload(data: str) -> tuple:
+    """Decode a base64 or data-URL upload into (bytes, content type); raises 400 on bad input"""
+    declared = None
+    if data.startswith("data:") and ";" in data.split(",", 1)[0]:
+        declared = data[5:data.index(";")] or None
+    try:
+        payload = decode_base64_payload(data)
+    except (ValueError, TypeError):
+        payload = b""
+    if not payload:
+        raise HTTPException(status_code=400, detail="Content is not valid base64")
+    return payload, sniff_content_type(payload, declared or "application/octet-stream")
+
+class BlobStore:
+    """Content-addressed files on local disk, deduplicated by SHA-256 and reference counted in `blobs`"""
     
-    # Generate plan items
-    plan_items_data = generate_study_plan(request.exam_date, request.hours_per_day, request.subjects)
+    def __init__(self, root: Path, lock_stripes: int = 64):
+        self.root = root
+        # Serializes publishing and deleting a digest's file with its refcount change; striped by digest
+        self._locks = [asyncio.Lock() for _ in range(lock_stripes)]
     
-    for item_data in plan_items_data:
-        plan_item_data = {
-            "id": str(uuid.uuid4()),
-            "plan_id": plan_data["id"],
-            "user_id": user_id,
-            "date": item_data["date"],
-            "subject": item_data["subject"].value,
-            "topic": item_data["topic"],
-            "target_minutes": item_data["target_minutes"],
-            "actual_minutes": 0,
-            "status": PlanItemStatus.PENDING.value,
-            "created_at": datetime.utcnow()
-        }
-        await db.plan_items.insert_one(plan_item_data)
+    def _lock(self, sha256: str) -> asyncio.Lock:
+        return self._locks[int(sha256[:8], 16) % len(self._locks)]
     
-    return {"plan_id": plan_data["id"], "message": "Study plan generated successfully"}
-
-@api_router.get("/planner/items")
-async def get_plan_items(date: Optional[str] = None, user_id: str = "mock_user"):
-    """Get plan items for a date or all items"""
-    query = {"user_id": user_id}
-    if date:
-        query["date"] = date
+    def path(self, sha256: str) -> Path:
+        if not re.fullmatch(r"[0-9a-f]{64}", sha256):
+            raise ValueError(f"Invalid blob id: {sha256}")
+        return self.root / sha256[:2] / sha256[2:4] / sha256
     
-    items_cursor = db.plan_items.find(query).sort("created_at", 1)
-    items = await items_cursor.to_list(length=1000)
-    return {"items": serialize_doc(items)}
-
-@api_router.post("/planner/log")
-async def log_study_progress(request: StudyLogRequest, user_id: str = "mock_user"):
-    """Log study progress"""
-    await db.plan_items.update_one(
-        {"id": request.plan_item_id, "user_id": user_id},
-        {"$set": {
-            "actual_minutes": request.minutes,
-            "status": request.status.value
-        }}
-    )
+    def exists(self, sha256: str) -> bool:
+        return self.path(sha256).is_file()
     
-    # Update profile stats
-    if request.status == PlanItemStatus.DONE:
-        await db.profiles.update_one(
-            {"user_id": user_id},
-            {"$inc": {"total_study_minutes": request.minutes}}
-        )
+    async def put(self, data: bytes, content_type: str) -> Dict[str, Any]:
+        """Store bytes once per digest and add a reference; returns the blob reference for documents"""
+        async def single_chunk():
+            yield data
+        return await self.put_stream(single_chunk(), content_type)
+    
+    async def put_stream(self, chunks: AsyncIterator[bytes], content_type: Optional[str] = None, max_bytes: Optional[int] = None) -> Dict[str, Any]:
+        """Write chunks to a temp file while hashing them, then move it into place; sniffs the type if not given"""
+        self.root.mkdir(parents=True, exist_ok=True)
+        temp_path = self.root / f"upload-{uuid.uuid4().hex}.tmp"
+        digest = hashlib.sha256()
+        size = 0
+        head = b""
+        try:
+            async with aiofiles.open(temp_path, "wb") as f:
+                async for chunk in chunks:
+                    size += len(chunk)
+                    if max_bytes is not None and size > max_bytes:
+                        raise HTTPException(status_code=413, detail=f"Upload exceeds {max_bytes} bytes")
+                    if len(head) < 16:
+                        head += chunk[:16]
+                    # hashlib releases the GIL on large buffers
+                    await asyncio.to_thread(digest.update, chunk)
+                    await f.write(chunk)
+            if size == 0:
+                raise HTTPException(status_code=400, detail="Upload is empty")
+            sha256 = digest.hexdigest()
+            if content_type is None or content_type == "application/octet-stream":
+                content_type = sniff_content_type(head)
+            # Without the lock, release() could unlink an existing file between our check and our $inc
+            async with self._lock(sha256):
+                path = self.path(sha256)
+                if not path.is_file():
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    # Rename so readers never see a partial blob
+                    os.replace(temp_path, path)
+                await db.blobs.update_one(
+                    {"sha256": sha256},
+                    {
+                        "$inc": {"refs": 1},
+                        "$setOnInsert": {"size": size, "content_type": content_type, "created_at": datetime.utcnow()}
+                    },
+                    upsert=True
+                )
+        finally:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(temp_path)
+        return {"sha256": sha256, "size": size, "content_type": content_type}
+    
+    async def read(self, sha256: str) -> bytes:
+        async with aiofiles.open(self.path(sha256), "rb") as f:
+            return await f.read()
     
-    return {"message": "Progress logged successfully"}
+    async def iter_range(self, sha256: str, start: int, end: int) -> AsyncIterator[bytes]:
+        """Yield bytes start..end (inclusive) in BLOB_READ_CHUNK_BYTES pieces"""
+        remaining = end - start + 1
+        async with aiofiles.open(self.path(sha256), "rb") as f:
+            await f.seek(start)
+            while remaining > 0:
+                data = await f.read(min(BLOB_READ_CHUNK_BYTES, remaining))
+                if not data:
+                    break
+                remaining -= len(data)
+                yield data
+    
+    async def release(self, sha256: str):
+        """Drop one reference and delete the file once nothing points at it"""
+        async with self._lock(sha256):
+            blob = await db.blobs.find_one_and_update(
+                {"sha256": sha256}, {"$inc": {"refs": -1}}, return_document=ReturnDocument.AFTER
+            )
+            if blob and blob["refs"] <= 0:
+                result = await db.blobs.delete_one({"sha256": sha256, "refs": {"$lte": 0}})
+                if result.deleted_count:
+                    with contextlib.suppress(FileNotFoundError):
+                        os.remove(self.path(sha256))
 
-# MCQ Endpoints
-@api_router.post("/mcq/generate")
-async def generate_mcqs(request: MCQGenerateRequest, user_id: str = "mock_user"):
-    """Generate MCQ questions"""
-    # Mock MCQ generation
+blob_store = BlobStore(BLOB_DIR)
+
+class MultipartPart:
+    """One part of a streamed multipart/form-data body; its data must be read before the next part arrives"""
+    
+    def __init__(self, headers: Dict[str, str], chunks: AsyncIterator[bytes]):
+        _, options = parse_options_header(headers.get("content-disposition", ""))
+        self.name = options.get(b"name", b"").decode("utf-8", "replace")
+        filename = options.get(b"filename")
+        self.filename = filename.decode("utf-8", "replace") if filename is not None else None
+        self.content_type = headers.get("content-type")
+        self.chunks = chunks
+    
+    async def read_text(self) -> str:
+        data = bytearray()
+        async for chunk in self.chunks:
+            data += chunk
+            if len(data) > UPLOAD_FIELD_MAX_BYTES:
+                raise HTTPException(status_code=413, detail=f"Form field {self.name} exceeds {UPLOAD_FIELD_MAX_BYTES} bytes")
+        return data.decode("utf-8", "replace")
+
+async def iter_multipart(request: Request) -> AsyncIterator[MultipartPart]:
+    """Parse a multipart/form-data body as it arrives, yielding each part with its data still unread
+
+    Unlike UploadFile, which Starlette spools to a temporary file before the endpoint runs, this lets
+    file parts go straight into the blob store in a single copy.
+    """
+    content_type, options = parse_options_header(request.headers.get("content-type", ""))
+    if content_type != b"multipart/form-data" or not options.get(b"boundary"):
+        raise HTTPException(status_code=400, detail="Expected a multipart/form-data body")
+    
+    events: List[tuple] = []
+    headers: Dict[str, str] = {}
+    header_field, header_value = bytearray(), bytearray()
+    
+    def on_header_end():
+        headers[header_field.decode("latin-1").lower()] = header_value.decode("latin-1")
+        header_field.clear()
+        header_value.clear()
+    
+    parser = MultipartParser(options[b"boundary"], {
+        "on_part_begin": headers.clear,
+        "on_header_field": lambda data, start, end: header_field.extend(data[start:end]),
+        "on_header_value": lambda data, start, end: header_value.extend(data[start:end]),
+        "on_header_end": on_header_end,
+        "on_headers_finished": lambda: events.append(("part", dict(headers))),
+        "on_part_data": lambda data, start, end: events.append(("data", data[start:end])),
+        "on_part_end": lambda: events.append(("end", None)),
+    })
+    
+    async def parse_events() -> AsyncIterator[tuple]:
+        async for body in request.stream():
+            parser.write(body)
+            pending = events[:]
+            events.clear()
+            for event in pending:
+                yield event
+        parser.finalize()
+        for event in events:
+            yield event
+    
+    stream = parse_events()
+    
+    async def part_data() -> AsyncIterator[bytes]:
+        async for kind, value in stream:
+            if kind == "end":
+                return
+            yield value
+    
+    async for kind, value in stream:
+        if kind == "part":
+            part = MultipartPart(value, part_data())
+            yield part
+            # Skip whatever the endpoint left unread
+            async for _ in part.chunks:
+                pass
+
+async def read_multipart_upload(request: Request, file_field: str, max_bytes: int, max_files: int) -> tuple:
+    """(text fields, blob refs) of a multipart upload; file_field parts are stored as they stream in
+
+    Callers release the returned blobs if the upload turns out to be invalid.
+    """
+    fields: Dict[str, str] = {}
+    blobs: List[Dict[str, Any]] = []
+    try:
+        async for part in iter_multipart(request):
+            if part.filename is None:
+                fields[part.name] = await part.read_text()
+            elif part.name == file_field:
+                if len(blobs) == max_files:
+                    raise HTTPException(status_code=400, detail=f"At most {max_files} {file_field} parts are allowed")
+                blobs.append(await blob_store.put_stream(part.chunks, part.content_type, max_bytes=max_bytes))
+    except Exception:
+        await release_blobs(blobs)
+        raise
+    return fields, blobs
+
+async def release_blobs(blobs: List[Dict[str, Any]]):
+    for blob in blobs:
+        await blob_store.release(blob["sha256"])
+
+class UploadSizeLimitMiddleware:
+    """Reject upload bodies over their route's limit before they are parsed or spooled to disk"""
+    
+    def __init__(self, app, limits: Dict[str, int]):
+        self.app = app
+        self.limits = limits
+    
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope["path"]) if scope["type"] == "http" and scope["method"] == "POST" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+        
+        content_length = dict(scope["headers"]).get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > limit:
+            response = JSONResponse(status_code=413, content={"detail": f"Upload exceeds {limit} bytes"})
+            await response(scope, receive, send)
+            return
+        
+        received = 0
+        
+        async def limited_receive():
+            # Chunked bodies carry no Content-Length; count bytes as they arrive instead
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise HTTPException(status_code=413, detail=f"Upload exceeds {limit} bytes")
+            return message
+        
+        await self.app(scope, limited_receive, send)
+
+app.add_middleware(UploadSizeLimitMiddleware, limits={
+    "/api/resources/upload": RESOURCE_UPLOAD_MAX_BYTES,
+    "/api/evaluation/answer/upload": ANSWER_UPLOAD_MAX_BYTES * ANSWER_MAX_PAGES,
+})
+
+def parse_range_header(range_header: Optional[str], size: int) -> Optional[tuple]:
+    """Inclusive (start, end) for a single 'bytes=' range, or None to send the whole blob"""
+    if not range_header or not range_header.startswith("bytes=") or "," in range_header:
+        # Absent, non-byte or multi-range requests get the full body, which RFC 9110 allows
+        return None
+    first, _, last = range_header[6:].strip().partition("-")
+    try:
+        if not first:
+            length = int(last)
+            if length <= 0:
+                raise ValueError
+            start, end = max(size - length, 0), size - 1
+        else:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+    except ValueError:
+        start, end = size, -1
+    if start >= size or start > end:
+        raise HTTPException(
+            status_code=416, detail="Requested range not satisfiable", headers={"Content-Range": f"bytes */{size}"}
+        )
+    return start, end
+
+async def blob_response(blob: Optional[Dict[str, Any]], request: Request) -> Response:
+    """Serve a blob reference with Range, ETag and long-lived caching; blobs never change"""
+    if not blob or not blob_store.exists(blob["sha256"]):
+        raise HTTPException(status_code=404, detail="Content not found")
+    
+    etag = f'"{blob["sha256"]}"'
+    headers = {"Accept-Ranges": "bytes", "ETag": etag, "Cache-Control": "private, max-age=31536000, immutable"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    
+    size = blob["size"]
+    byte_range = parse_range_header(request.headers.get("range"), size)
+    status_code = 200
+    start, end = 0, size - 1
+    if byte_range is not None:
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        blob_store.iter_range(blob["sha256"], start, end),
+        status_code=status_code,
+        media_type=blob["content_type"],
+        headers=headers
+    )
+
+async def migrate_inline_blobs():
+    """Move base64 payloads still stored inline on resources and evaluations into the blob store"""
+    binary_kinds = [ResourceKind.IMAGE.value, ResourceKind.PDF.value]
+    moved = 0
+    async for resource in db.resources.find(
+        {"kind": {"$in": binary_kinds}, "content": {"$nin": [None, ""]}, "blob": None}, {"_id": 0, "id": 1, "content": 1}
+    ):
+        try:
+            data, content_type = decode_upload(resource["content"])
+        except HTTPException:
+            logger.warning(f"Skipping resource {resource['id']}: content is not valid base64")
+            continue
+        blob = await blob_store.put(data, content_type)
+        await db.resources.update_one({"id": resource["id"]}, {"$set": {"blob": blob, "content": None}})
+        moved += 1
+    async for evaluation in db.evaluations.find(
+        {"answer_image": {"$exists": True}}, {"_id": 0, "id": 1, "answer_image": 1}
+    ):
+        try:
+            data, content_type = decode_upload(evaluation["answer_image"])
+        except HTTPException:
+            logger.warning(f"Skipping evaluation {evaluation['id']}: answer image is not valid base64")
+            continue
+        blob = await blob_store.put(data, content_type)
+        await db.evaluations.update_one(
+            {"id": evaluation["id"]}, {"$set": {"answer_blobs": [blob]}, "$unset": {"answer_image": ""}}
+        )
+        moved += 1
+    logger.info(f"Moved {moved} inline payloads into the blob store")
+
+# Vector Retrieval
+async def embed_texts(texts: List[str]) -> np.ndarray:
+    """Embed texts with the local embedding model, EMBED_BATCH_SIZE inputs per request"""
+    vectors = []
+    for start in range(0, len(texts), EMBED_BATCH_SIZE):
+        with model_manager.using("embed"):
+            response = await async_ollama_client.embed(
+                model=OLLAMA_EMBED_MODEL,
+                input=texts[start:start + EMBED_BATCH_SIZE],
+                keep_alive=LLM_KEEP_ALIVE_SECONDS
+            )
+        vectors.extend(response['embeddings'])
+    return np.asarray(vectors, dtype=np.float32)
+
+class VectorStore:
+    """Per-user on-disk vector indexes, keeping the most recently used ones open"""
+    
+    def __init__(self, root: Path, max_open: int):
+        self.root = root
+        self._indexes = LRUCache(max_open, ttl_seconds=float("inf"))
+        self._locks: Dict[str, asyncio.Lock] = {}
+    
+    def _path(self, user_id: str) -> Path:
+        # Hash user ids so they can never escape the index directory
+        return self.root / hashlib.sha256(user_id.encode("utf-8")).hexdigest()
+    
+    async def _open(self, user_id: str) -> VectorIndex:
+        """Cached index for a user, loading it from disk on a miss; callers hold the user's lock"""
+        index = self._indexes.get(user_id)
+        if index is None:
+            # Loading under the lock means an index evicted mid-write is only reopened once that write is on disk
+            index = await asyncio.to_thread(VectorIndex, self._path(user_id), nprobe=VECTOR_INDEX_NPROBE)
+            self._indexes.set(user_id, index)
+        return index
+    
+    async def _get(self, user_id: str) -> VectorIndex:
+        async with self._lock(user_id):
+            return await self._open(user_id)
+    
+    def _lock(self, user_id: str) -> asyncio.Lock:
+        return self._locks.setdefault(user_id, asyncio.Lock())
+    
+    async def add(self, user_id: str, chunk_ids: List[str], resource_ids: List[str], vectors: np.ndarray):
+        async with self._lock(user_id):
+            index = await self._open(user_id)
+            await asyncio.to_thread(index.add, chunk_ids, resource_ids, vectors)
+    
+    async def remove_resource(self, user_id: str, resource_id: str):
+        async with self._lock(user_id):
+            index = await self._open(user_id)
+            await asyncio.to_thread(index.remove_resource, resource_id)
+    
+    async def search(self, user_id: str, vector: np.ndarray, k: int) -> List[tuple]:
+        # Searches read an immutable snapshot, so only opening the index needs the lock
+        index = await self._get(user_id)
+        return await asyncio.to_thread(index.search, vector, k)
+
+vector_store = VectorStore(VECTOR_INDEX_DIR, VECTOR_INDEX_MAX_OPEN)
+
+async def retrieve_resource_chunks(user_id: str, query: str, k: int = RAG_TOP_K) -> List[Dict[str, Any]]:
+    """Top-k library chunks for a query, most similar first"""
+    if not model_manager.is_available("embed"):
+        return []
+    try:
+        query_vector = (await embed_texts([query]))[0]
+        hits = await vector_store.search(user_id, query_vector, k)
+    except Exception as e:
+        logger.error(f"Vector retrieval error: {e}")
+        return []
+    if not hits:
+        return []
+    
+    chunk_ids = [chunk_id for chunk_id, _, _ in hits]
+    resource_ids = list({resource_id for _, resource_id, _ in hits})
+    chunks, resources = await asyncio.gather(
+        db.resource_chunks.find({"id": {"$in": chunk_ids}}, {"_id": 0, "id": 1, "text": 1}).to_list(length=None),
+        db.resources.find({"id": {"$in": resource_ids}}, {"_id": 0, "id": 1, "title": 1}).to_list(length=None)
+    )
+    text_by_chunk = {chunk["id"]: chunk["text"] for chunk in chunks}
+    title_by_resource = {resource["id"]: resource["title"] for resource in resources}
+    return [
+        {"resource_id": resource_id, "title": title_by_resource.get(resource_id, ""), "text": text_by_chunk[chunk_id], "score": score}
+        for chunk_id, resource_id, score in hits
+        if chunk_id in text_by_chunk
+    ]
+
+def build_rag_context(context: str, chunks: List[Dict[str, Any]]) -> str:
+    """Append retrieved library chunks to a system context"""
+    if not chunks:
+        return context
+    lines = [context, "", "Context from the student's library:"]
+    for number, chunk in enumerate(chunks, 1):
+        lines.append(f"[{number}] {chunk['title']}: {chunk['text']}")
+    return "\n".join(lines)
+
+# Lexical Search
+# search_postings holds one BM25 posting per (term, chunk) with the term frequency and chunk length;
+# search_stats holds each user's chunk and token totals for IDF and average chunk length.
+# Queries read each term's postings highest tf first, capped at SEARCH_MAX_POSTINGS_PER_TERM.
+SEARCH_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were which with".split()
+)
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word tokens without stopwords; keeps numbers so article and section numbers match"""
+    return [token for token in re.findall(r"\w+", text.lower()) if token not in SEARCH_STOPWORDS]
+
+def build_chunk_postings(user_id: str, chunk_docs: List[Dict[str, Any]]) -> tuple:
+    """(postings, total tokens) for chunks, tokenizing each once; fills in token_count on the chunk docs
+
+    CPU-bound on large documents, so callers run it in a thread.
+    """
+    postings = []
+    tokens = 0
+    for chunk in chunk_docs:
+        counts: Dict[str, int] = {}
+        for token in tokenize(chunk["text"]):
+            counts[token] = counts.get(token, 0) + 1
+        chunk["token_count"] = sum(counts.values())
+        tokens += chunk["token_count"]
+        postings.extend(
+            {
+                "user_id": user_id,
+                "term": term,
+                "chunk_id": chunk["id"],
+                "resource_id": chunk["resource_id"],
+                "tf": tf,
+                "dl": chunk["token_count"]
+            }
+            for term, tf in counts.items()
+        )
+    return postings, tokens
+
+async def store_chunk_postings(user_id: str, postings: List[Dict[str, Any]], chunks: int, tokens: int):
+    """Insert postings built by build_chunk_postings and add their chunks to the user's totals"""
+    if postings:
+        await db.search_postings.insert_many(postings, ordered=False)
+    if chunks:
+        await db.search_stats.update_one(
+            {"user_id": user_id},
+            {"$inc": {"chunks": chunks, "tokens": tokens}},
+            upsert=True
+        )
+
+async def add_chunk_terms(user_id: str, chunk_docs: List[Dict[str, Any]]):
+    """Insert postings for freshly stored chunks and add them to the user's totals"""
+    postings, tokens = await asyncio.to_thread(build_chunk_postings, user_id, chunk_docs)
+    await store_chunk_postings(user_id, postings, len(chunk_docs), tokens)
+
+async def remove_resource_terms(user_id: str, resource_id: str):
+    """Drop a resource's postings and subtract its chunks from the user's totals; call before deleting its chunks"""
+    totals = await db.resource_chunks.aggregate([
+        {"$match": {"resource_id": resource_id}},
+        {"$group": {"_id": None, "chunks": {"$sum": 1}, "tokens": {"$sum": "$token_count"}}}
+    ]).to_list(length=1)
+    await db.search_postings.delete_many({"resource_id": resource_id})
+    if totals and totals[0]["chunks"]:
+        await db.search_stats.update_one(
+            {"user_id": user_id},
+            {"$inc": {"chunks": -totals[0]["chunks"], "tokens": -totals[0]["tokens"]}}
+        )
+
+def build_snippet(text: str, terms: set, width: int = SEARCH_SNIPPET_WORDS) -> str:
+    """The window of `width` words containing the most query terms"""
+    words = text.split()
+    if len(words) <= width:
+        return text
+    hits = [1 if terms.intersection(tokenize(word)) else 0 for word in words]
+    best_start, best_hits = 0, sum(hits[:width])
+    window_hits = best_hits
+    for start in range(1, len(words) - width + 1):
+        window_hits += hits[start + width - 1] - hits[start - 1]
+        if window_hits > best_hits:
+            best_start, best_hits = start, window_hits
+    # Centre the window on its matches instead of leaving them at the edge
+    positions = [i for i in range(best_start, best_start + width) if hits[i]]
+    if positions:
+        centre = (positions[0] + positions[-1]) // 2
+        best_start = max(0, min(centre - width // 2, len(words) - width))
+    snippet = " ".join(words[best_start:best_start + width])
+    prefix = "..." if best_start > 0 else ""
+    suffix = "..." if best_start + width < len(words) else ""
+    return f"{prefix}{snippet}{suffix}"
+
+async def search_library(user_id: str, query: str, limit: int) -> List[Dict[str, Any]]:
+    """Rank a user's resources by the BM25 score of their best chunk"""
+    terms = set(tokenize(query))
+    stats = await db.search_stats.find_one({"user_id": user_id}, {"_id": 0})
+    if not terms or not stats or stats["chunks"] <= 0:
+        return []
+    
+    async def term_postings(term: str) -> tuple:
+        # Highest tf (then shortest chunk) first, straight off the index, so a common term costs at most
+        # SEARCH_MAX_POSTINGS_PER_TERM documents; only a capped term pays for an exact count for its IDF
+        postings = await db.search_postings.find(
+            {"user_id": user_id, "term": term},
+            {"_id": 0, "term": 1, "chunk_id": 1, "resource_id": 1, "tf": 1, "dl": 1}
+        ).sort([("tf", DESCENDING), ("dl", ASCENDING)]).limit(SEARCH_MAX_POSTINGS_PER_TERM).to_list(length=None)
+        df = len(postings)
+        if df >= SEARCH_MAX_POSTINGS_PER_TERM:
+            df = await db.search_postings.count_documents({"user_id": user_id, "term": term})
+        return postings, df
+    
+    results = await asyncio.gather(*(term_postings(term) for term in terms))
+    postings = [posting for term_list, _ in results for posting in term_list]
+    doc_freq = {term: df for term, (_, df) in zip(terms, results) if df}
+    n_chunks = stats["chunks"]
+    avg_len = max(stats["tokens"] / n_chunks, 1.0)
+    idf = {term: math.log(1 + (n_chunks - df + 0.5) / (df + 0.5)) for term, df in doc_freq.items()}
+    
+    chunk_scores: Dict[str, float] = {}
+    chunk_resources: Dict[str, str] = {}
+    for posting in postings:
+        tf = posting["tf"]
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * posting["dl"] / avg_len)
+        score = idf[posting["term"]] * tf * (BM25_K1 + 1) / (tf + norm)
+        chunk_scores[posting["chunk_id"]] = chunk_scores.get(posting["chunk_id"], 0.0) + score
+        chunk_resources[posting["chunk_id"]] = posting["resource_id"]
+    
+    # Best chunk per resource, so one long document can't fill every slot
+    best: Dict[str, tuple] = {}
+    for chunk_id, score in chunk_scores.items():
+        resource_id = chunk_resources[chunk_id]
+        if resource_id not in best or score > best[resource_id][0]:
+            best[resource_id] = (score, chunk_id)
+    top = heapq.nlargest(limit, best.items(), key=lambda item: item[1][0])
+    if not top:
+        return []
+    
+    chunks, resources = await asyncio.gather(
+        db.resource_chunks.find(
+            {"id": {"$in": [chunk_id for _, (_, chunk_id) in top]}}, {"_id": 0, "id": 1, "text": 1}
+        ).to_list(length=None),
+        db.resources.find(
+            {"id": {"$in": [resource_id for resource_id, _ in top]}}, {"_id": 0, "id": 1, "title": 1, "kind": 1}
+        ).to_list(length=None)
+    )
+    text_by_chunk = {chunk["id"]: chunk["text"] for chunk in chunks}
+    resource_by_id = {resource["id"]: resource for resource in resources}
+    return [
+        {
+            "resource_id": resource_id,
+            "title": resource_by_id[resource_id]["title"],
+            "kind": resource_by_id[resource_id]["kind"],
+            "chunk_id": chunk_id,
+            "snippet": build_snippet(text_by_chunk[chunk_id], terms),
+            "score": round(score, 4)
+        }
+        for resource_id, (score, chunk_id) in top
+        if resource_id in resource_by_id and chunk_id in text_by_chunk
+    ]
+
+async def rebuild_search_index(user_id: str):
+    """Recompute a user's postings and totals from resource_chunks"""
+    await db.search_postings.delete_many({"user_id": user_id})
+    await db.search_stats.delete_one({"user_id": user_id})
+    batch = []
+    
+    async def flush(batch: List[Dict[str, Any]]):
+        missing = [chunk["id"] for chunk in batch if "token_count" not in chunk]
+        await add_chunk_terms(user_id, batch)
+        for chunk in batch:
+            if chunk["id"] in missing:
+                await db.resource_chunks.update_one({"id": chunk["id"]}, {"$set": {"token_count": chunk["token_count"]}})
+    
+    async for chunk in db.resource_chunks.find({"user_id": user_id}, {"_id": 0}):
+        batch.append(chunk)
+        if len(batch) >= 500:
+            await flush(batch)
+            batch = []
+    await flush(batch)
+
+async def rebuild_all_search_indexes(user_ids: Optional[List[str]] = None):
+    """Rebuild the lexical index for the given users, or for every user with chunks"""
+    if not user_ids:
+        user_ids = await db.resource_chunks.distinct("user_id")
+    for user_id in user_ids:
+        await rebuild_search_index(user_id)
+        logger.info(f"Rebuilt search index for {user_id}")
+
+# Resource Ingestion
+# pdfium is not thread-safe, so all PDF work goes through one dedicated thread
+pdf_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pdf")
+
+def iter_pdf_pages(pdf: Union[bytes, Path]) -> Iterator[tuple]:
+    """Yield (text, rendered PNG) per PDF page; pages without a text layer are rendered so they can be OCR'd
+
+    Pages are rendered one at a time as the caller advances, so at most one PNG is held in memory.
+    pdfium is not thread-safe: advance and close the generator on pdf_executor only.
+    """
+    pdf = pdfium.PdfDocument(pdf)
+    try:
+        for index in range(len(pdf)):
+            page = pdf[index]
+            try:
+                textpage = page.get_textpage()
+                text = textpage.get_text_bounded()
+                textpage.close()
+                if text.strip():
+                    rendered = None
+                else:
+                    buffer = io.BytesIO()
+                    page.render(scale=2).to_pil().save(buffer, format="PNG")
+                    text, rendered = "", buffer.getvalue()
+            finally:
+                page.close()
+            yield text, rendered
+    finally:
+        pdf.close()
+
+async def ocr_for_pipeline(image: Union[bytes, Path]) -> str:
+    """OCR for background ingestion: waits for the model and retries while the pool is busy"""
+    return (await ocr_pages_for_pipeline([image]))[0]
+
+async def ocr_pages_for_pipeline(
+    images: List[Union[bytes, Path]], on_pages_done: Optional[Callable[[int], Awaitable[None]]] = None
+) -> List[str]:
+    """OCR several pages for a background job, in page order
+
+    Cached pages are looked up first. The rest are split into one contiguous batch per pool worker, and
+    each batch is a single predict call. on_pages_done is awaited with the number of pages each step finished.
+    """
+    texts: List[Optional[str]] = [None] * len(images)
+    fingerprints: Dict[int, Any] = {}
+    for index, image in enumerate(images):
+        lines, fingerprint = await lookup_ocr_cache(image)
+        if lines is not None:
+            texts[index] = "\n".join(lines)
+        else:
+            fingerprints[index] = fingerprint
+    if on_pages_done and len(fingerprints) < len(images):
+        await on_pages_done(len(images) - len(fingerprints))
+    if not fingerprints:
+        return texts
+    if not await model_manager.wait_until_available("ocr"):
+        raise ModelUnavailableError("ocr")
+    
+    async def run_batch(batch: List[int]):
+        for attempt in range(RESOURCE_OCR_RETRIES):
+            try:
+                pages = await run_ocr_batch([images[index] for index in batch])
+                break
+            except OCRBusyError:
+                # Interactive requests go first; back off instead of competing for queue slots
+                await asyncio.sleep(2 ** attempt)
+        else:
+            raise RuntimeError("OCR pool stayed saturated")
+        for index, lines in zip(batch, pages):
+            await store_ocr_cache(fingerprints[index], lines)
+            texts[index] = "\n".join(lines)
+        if on_pages_done:
+            await on_pages_done(len(batch))
+    
+    pending = list(fingerprints)
+    batch_size = math.ceil(len(pending) / OCR_MAX_WORKERS)
+    await asyncio.gather(*(run_batch(pending[start:start + batch_size]) for start in range(0, len(pending), batch_size)))
+    return texts
+
+def resource_payload(resource: Dict[str, Any]) -> Union[bytes, Path, None]:
+    """Binary payload of an image or PDF resource: its blob file, or bytes from a legacy inline base64 field"""
+    if resource.get("blob"):
+        return blob_store.path(resource["blob"]["sha256"])
+    content = resource.get("content")
+    return decode_base64_payload(content) if content else None
+
+async def extract_resource_text(resource: Dict[str, Any]) -> tuple:
+    """Extract raw text for a resource; returns (text, extra meta)"""
+    kind = resource["kind"]
+    
+    if kind in (ResourceKind.NOTE.value, ResourceKind.AI_GENERATED.value):
+        return resource.get("content") or "", {}
+    
+    if kind == ResourceKind.IMAGE.value:
+        payload = resource_payload(resource)
+        if not payload:
+            return "", {}
+        return await ocr_for_pipeline(payload), {}
+    
+    if kind == ResourceKind.PDF.value:
+        payload = resource_payload(resource)
+        if not payload:
+            return "", {}
+        if pdfium is None:
+            raise RuntimeError("pypdfium2 is not installed")
+        loop = asyncio.get_running_loop()
+        pages = iter_pdf_pages(payload)
+        texts = []
+        ocr_pages = 0
+        try:
+            # Render one page, OCR it and drop the image before rendering the next
+            while (page := await loop.run_in_executor(pdf_executor, next, pages, None)) is not None:
+                text, rendered = page
+                if rendered is not None:
+                    ocr_pages += 1
+                    text = await ocr_for_pipeline(rendered)
+                texts.append(text)
+        finally:
+            await loop.run_in_executor(pdf_executor, pages.close)
+        return "\n\n".join(texts), {"pages": len(texts), "ocr_pages": ocr_pages}
+    
+    # Links and videos are not fetched; their title and URL are all we can index
+    return "\n".join(part for part in (resource.get("title"), resource.get("url")) if part), {}
+
+def normalize_text(text: str) -> str:
+    """Unicode-normalize text, drop control characters and collapse runs of whitespace"""
+    text = unicodedata.normalize("NFKC", text)
+    text = re.sub(r"[^\S\n]+", " ", text)
+    text = re.sub(r"[\x00-\x08\x0b-\x1f\x7f]", "", text)
+    text = re.sub(r" *\n *", "\n", text)
+    text = re.sub(r"\n{3,}", "\n\n", text)
+    return text.strip()
+
+def chunk_text(text: str, chunk_words: int = CHUNK_WORDS, overlap_words: int = CHUNK_OVERLAP_WORDS) -> List[str]:
+    """Split text into overlapping windows of words"""
+    words = text.split()
+    if not words:
+        return []
+    step = max(chunk_words - overlap_words, 1)
+    chunks = []
+    for start in range(0, len(words), step):
+        chunks.append(" ".join(words[start:start + chunk_words]))
+        if start + chunk_words >= len(words):
+            break
+    return chunks
+
+async def index_resource_chunks(resource: Dict[str, Any], chunks: List[str]) -> Dict[str, Any]:
+    """Replace the stored chunks of a resource, their postings and their vectors; returns extra meta"""
+    now = datetime.utcnow()
+    chunk_docs = [
+        {
+            "id": str(uuid.uuid4()),
+            "resource_id": resource["id"],
+            "user_id": resource["user_id"],
+            "seq": seq,
+            "text": chunk,
+            "created_at": now
+        }
+        for seq, chunk in enumerate(chunks)
+    ]
+    # Tokenizing is the slow part on big documents; it also sets each chunk's token_count
+    postings, tokens = await asyncio.to_thread(build_chunk_postings, resource["user_id"], chunk_docs)
+    await remove_resource_terms(resource["user_id"], resource["id"])
+    await db.resource_chunks.delete_many({"resource_id": resource["id"]})
+    if chunk_docs:
+        await db.resource_chunks.insert_many(chunk_docs)
+        await store_chunk_postings(resource["user_id"], postings, len(chunk_docs), tokens)
+    
+    if (resource.get("meta") or {}).get("vector_indexed"):
+        await vector_store.remove_resource(resource["user_id"], resource["id"])
+    if not chunk_docs:
+        return {"vector_indexed": False}
+    if not await model_manager.wait_until_available("embed"):
+        logger.warning(f"Embedding model unavailable; resource {resource['id']} is not in the vector index")
+        return {"vector_indexed": False}
+    
+    vectors = await embed_texts([doc["text"] for doc in chunk_docs])
+    await vector_store.add(
+        resource["user_id"],
+        [doc["id"] for doc in chunk_docs],
+        [resource["id"]] * len(chunk_docs),
+        vectors
+    )
+    return {"vector_indexed": True}
+
+class ResourcePipeline:
+    """Bounded pool of workers running uploaded resources through extract -> normalize -> chunk -> index"""
+    
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self._tasks: List[asyncio.Task] = []
+    
+    def submit(self, resource_id: str):
+        self.queue.put_nowait(resource_id)
+    
+    async def requeue_waiting_for(self, model: str):
+        """Re-run resources that failed because model was unavailable"""
+        waiting = await db.resources.find(
+            {"status": ResourceStatus.FAILED.value, "meta.waiting_for_model": model}, {"_id": 0, "id": 1}
+        ).to_list(length=None)
+        for resource in waiting:
+            await db.resources.update_one(
+                {"id": resource["id"], "status": ResourceStatus.FAILED.value},
+                {"$set": {"status": ResourceStatus.UPLOADED.value},
+                 "$unset": {"meta.error": "", "meta.waiting_for_model": ""}}
+            )
+            self.submit(resource["id"])
+        if waiting:
+            logger.info(f"Re-queued {len(waiting)} resources that were waiting for the {model} model")
+    
+    async def start(self):
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        model_manager.on_ready("ocr", lambda: self.requeue_waiting_for("ocr"))
+        # Pick up resources a restart interrupted at any stage, and those that only lacked OCR last time;
+        # process() redoes every stage, and index_resource_chunks replaces whatever was written before
+        pending = await db.resources.find(
+            {"status": {"$in": [ResourceStatus.UPLOADED.value, ResourceStatus.PARSED.value]}}, {"_id": 0, "id": 1}
+        ).to_list(length=None)
+        for resource in pending:
+            self.submit(resource["id"])
+        await self.requeue_waiting_for("ocr")
+    
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+    
+    async def _worker(self):
+        while True:
+            resource_id = await self.queue.get()
+            try:
+                await self.process(resource_id)
+            except Exception as e:
+                logger.error(f"Resource pipeline error for {resource_id}: {e}")
+            finally:
+                self.queue.task_done()
+    
+    async def process(self, resource_id: str):
+        resource = await db.resources.find_one({"id": resource_id}, {"_id": 0})
+        if not resource:
+            return
+        
+        timings = {}
+        
+        def timed(stage: str, started: float):
+            timings[stage] = round((time.perf_counter() - started) * 1000, 1)
+        
+        try:
+            started = time.perf_counter()
+            text, extract_meta = await extract_resource_text(resource)
+            timed("extract", started)
+            
+            # Normalizing and chunking a long document takes a noticeable slice of CPU; keep it off the event loop
+            started = time.perf_counter()
+            text = await asyncio.to_thread(normalize_text, text)
+            timed("normalize", started)
+            
+            started = time.perf_counter()
+            chunks = await asyncio.to_thread(chunk_text, text)
+            timed("chunk", started)
+            
+            await db.resources.update_one(
+                {"id": resource_id},
+                {"$set": {
+                    "status": ResourceStatus.PARSED.value,
+                    "meta.chars": len(text),
+                    "meta.chunks": len(chunks),
+                    "meta.timings_ms": timings,
+                    **{f"meta.{key}": value for key, value in extract_meta.items()}
+                }}
+            )
+            
+            started = time.perf_counter()
+            index_meta = await index_resource_chunks(resource, chunks)
+            timed("index", started)
+            
+            result = await db.resources.update_one(
+                {"id": resource_id},
+                {"$set": {
+                    "status": ResourceStatus.INDEXED.value,
+                    "meta.timings_ms": timings,
+                    **{f"meta.{key}": value for key, value in index_meta.items()}
+                }}
+            )
+            if result.matched_count == 0:
+                # Deleted while we were indexing; drop what we just wrote
+                await remove_resource_terms(resource["user_id"], resource_id)
+                await db.resource_chunks.delete_many({"resource_id": resource_id})
+                if index_meta.get("vector_indexed"):
+                    await vector_store.remove_resource(resource["user_id"], resource_id)
+        except Exception as e:
+            logger.error(f"Failed to process resource {resource_id}: {e}")
+            failure = {"status": ResourceStatus.FAILED.value, "meta.error": str(e), "meta.timings_ms": timings}
+            if isinstance(e, ModelUnavailableError):
+                # Re-queued by requeue_waiting_for once the model loads
+                failure["meta.waiting_for_model"] = e.model
+            await db.resources.update_one({"id": resource_id}, {"$set": failure})
+
+resource_pipeline = ResourcePipeline(RESOURCE_WORKERS)
+
+# Resource Endpoints
+@api_router.post("/resources")
+async def create_resource(request: ResourceCreateRequest, user_id: str = "mock_user"):
+    """Create a new resource"""
+    content, blob = request.content, None
+    if content and request.kind in (ResourceKind.IMAGE, ResourceKind.PDF):
+        # Binary uploads go to the blob store so resource documents stay small
+        data, content_type = decode_upload(content)
+        blob = await blob_store.put(data, content_type)
+        content = None
+    
+    return await insert_resource(user_id, request.kind, request.title, request.folder_id, content=content, blob=blob, url=request.url)
+
+@api_router.post("/resources/upload")
+async def upload_resource(request: Request, user_id: str = "mock_user"):
+    """Create an image or PDF resource from a multipart upload (file, title, kind and optional folder_id
+    fields), streamed straight into the blob store"""
+    fields, blobs = await read_multipart_upload(request, "file", RESOURCE_UPLOAD_MAX_BYTES, max_files=1)
+    try:
+        if not blobs or not fields.get("title") or "kind" not in fields:
+            raise HTTPException(status_code=400, detail="file, title and kind are required")
+        if fields["kind"] not in (ResourceKind.IMAGE.value, ResourceKind.PDF.value):
+            raise HTTPException(status_code=400, detail="Only image and PDF resources can be uploaded as files")
+    except HTTPException:
+        await release_blobs(blobs)
+        raise
+    return await insert_resource(user_id, ResourceKind(fields["kind"]), fields["title"], fields.get("folder_id"), blob=blobs[0])
+
+async def insert_resource(
+    user_id: str,
+    kind: ResourceKind,
+    title: str,
+    folder_id: Optional[str],
+    content: Optional[str] = None,
+    blob: Optional[Dict[str, Any]] = None,
+    url: Optional[str] = None
+) -> Dict[str, Any]:
+    """Store a new resource and queue it for ingestion"""
+    resource_data = {
+        "id": str(uuid.uuid4()),
+        "user_id": user_id,
+        "folder_id": folder_id,
+        "kind": kind.value,
+        "title": title,
+        "content": content,
+        "blob": blob,
+        "url": url,
+        "meta": {},
+        "status": ResourceStatus.UPLOADED.value,
+        "created_at": datetime.utcnow()
+    }
+    
+    await db.resources.insert_one(resource_data)
+    
+    resource_pipeline.submit(resource_data["id"])
+    
+    return MongoJSONResponse(resource_data)
+
+@api_router.get("/resources")
+async def get_resources(after: Optional[str] = None, limit: int = DEFAULT_PAGE_SIZE, user_id: str = "mock_user"):
+    """Get user resources, newest first, one page at a time"""
+    resources, next_cursor = await paginate(db.resources, {"user_id": user_id}, after, limit, direction=DESCENDING)
+    return MongoJSONResponse({"resources": resources, "next_cursor": next_cursor})
+
+@api_router.get("/resources/search")
+async def search_resources(q: str, limit: int = 20, user_id: str = "mock_user"):
+    """Full-text search over resource text and OCR output, ranked by BM25"""
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    return {"query": q, "results": await search_library(user_id, q, limit)}
+
+@api_router.delete("/resources/{resource_id}")
+async def delete_resource(resource_id: str, user_id: str = "mock_user"):
+    """Delete a resource together with its chunks and index entries"""
+    resource = await db.resources.find_one_and_delete(
+        {"id": resource_id, "user_id": user_id}, {"_id": 0, "meta": 1, "blob": 1}
+    )
+    if not resource:
+        raise HTTPException(status_code=404, detail="Resource not found")
+    
+    await remove_resource_terms(user_id, resource_id)
+    await db.resource_chunks.delete_many({"resource_id": resource_id})
+    if (resource.get("meta") or {}).get("vector_indexed"):
+        await vector_store.remove_resource(user_id, resource_id)
+    if resource.get("blob"):
+        await blob_store.release(resource["blob"]["sha256"])
+    return {"deleted": True}
+
+@api_router.post("/resources/{resource_id}/retry")
+async def retry_resource(resource_id: str, user_id: str = "mock_user"):
+    """Run a failed resource through the pipeline again"""
+    resource = await db.resources.find_one_and_update(
+        {"id": resource_id, "user_id": user_id, "status": ResourceStatus.FAILED.value},
+        {"$set": {"status": ResourceStatus.UPLOADED.value},
+         "$unset": {"meta.error": "", "meta.waiting_for_model": ""}},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+    if not resource:
+        if await db.resources.count_documents({"id": resource_id, "user_id": user_id}, limit=1):
+            raise HTTPException(status_code=409, detail="Only failed resources can be retried")
+        raise HTTPException(status_code=404, detail="Resource not found")
+    resource_pipeline.submit(resource_id)
+    return MongoJSONResponse(resource)
+
+@api_router.get("/resources/{resource_id}/content")
+async def download_resource_content(resource_id: str, request: Request, user_id: str = "mock_user"):
+    """Stream the stored image or PDF of a resource; supports Range requests"""
+    resource = await db.resources.find_one({"id": resource_id, "user_id": user_id}, {"_id": 0, "blob": 1})
+    if not resource:
+        raise HTTPException(status_code=404, detail="Resource not found")
+    return await blob_response(resource.get("blob"), request)
+
+# Analytics Rollups
+# analytics_rollups holds per-user ("user"/"all"), per-day ("day"/<plan date>) and per-subject
+# ("subject"/<subject>) counters of plan items: total, completed and completed minutes.
+# Every write to plan_items applies its delta here so the dashboard never scans plan_items.
+def build_rollup_ops(user_id: str, deltas: List[tuple], now: datetime) -> list:
+    """Turn (date, subject, {counter: delta}) entries into $inc upserts on the three rollup scopes"""
+    incs: Dict[tuple, Dict[str, int]] = {}
+    for date, subject, delta in deltas:
+        for scope, key in (("user", "all"), ("day", date), ("subject", subject)):
+            acc = incs.setdefault((scope, key), {})
+            for counter, value in delta.items():
+                acc[counter] = acc.get(counter, 0) + value
+    
+    ops = []
+    for (scope, key), inc in incs.items():
+        inc = {counter: value for counter, value in inc.items() if value}
+        if inc:
+            ops.append(UpdateOne(
+                {"user_id": user_id, "scope": scope, "key": key},
+                {"$inc": inc, "$set": {"updated_at": now}},
+                upsert=True
+            ))
+    return ops
+
+async def apply_rollup_deltas(user_id: str, deltas: List[tuple], session=None):
+    ops = build_rollup_ops(user_id, deltas, datetime.utcnow())
+    if ops:
+        await db.analytics_rollups.bulk_write(ops, ordered=False, session=session)
+
+def plan_item_log_delta(before: Dict[str, Any], status: PlanItemStatus, minutes: int) -> Dict[str, int]:
+    """Counter changes caused by re-logging a plan item, including re-logs and status reversals"""
+    was_done = before.get("status") == PlanItemStatus.DONE.value
+    is_done = status == PlanItemStatus.DONE
+    return {
+        "completed": int(is_done) - int(was_done),
+        "minutes": (minutes if is_done else 0) - (before.get("actual_minutes", 0) if was_done else 0)
+    }
+
+def build_rollup_pipeline(user_id: str) -> List[Dict[str, Any]]:
+    """Aggregation recomputing every rollup scope for a user from plan_items"""
+    is_done = {"$eq": ["$status", PlanItemStatus.DONE.value]}
+    # Like profiles.total_study_minutes, only completed items count towards studied minutes
+    counters = {
+        "total": {"$sum": 1},
+        "completed": {"$sum": {"$cond": [is_done, 1, 0]}},
+        "minutes": {"$sum": {"$cond": [is_done, "$actual_minutes", 0]}}
+    }
+    return [
+        {"$match": {"user_id": user_id}},
+        {"$project": {"_id": 0, "status": 1, "subject": 1, "date": 1, "actual_minutes": 1}},
+        {"$facet": {
+            "user": [{"$group": {"_id": "all", **counters}}],
+            "day": [{"$group": {"_id": "$date", **counters}}],
+            "subject": [{"$group": {"_id": "$subject", **counters}}]
+        }}
+    ]
+
+async def rebuild_analytics_rollups(user_id: str):
+    """Recompute a user's rollups from scratch"""
+    facets = await db.plan_items.aggregate(build_rollup_pipeline(user_id)).to_list(length=1)
+    facets = facets[0] if facets else {}
+    if not facets.get("user"):
+        # Always keep a "user" rollup, zeros included, so the dashboard can tell rollups have been built
+        facets["user"] = [{"_id": "all", "total": 0, "completed": 0, "minutes": 0}]
+    now = datetime.utcnow()
+    
+    ops = []
+    keep = []
+    for scope in ("user", "day", "subject"):
+        for row in facets.get(scope, []):
+            key = row["_id"] or "unknown"
+            keep.append({"scope": scope, "key": key})
+            ops.append(ReplaceOne(
+                {"user_id": user_id, "scope": scope, "key": key},
+                {"user_id": user_id, "scope": scope, "key": key, "total": row["total"],
+                 "completed": row["completed"], "minutes": row["minutes"], "updated_at": now},
+                upsert=True
+            ))
+    stale_filter = {"user_id": user_id}
+    if keep:
+        stale_filter["$nor"] = keep
+    ops.append(DeleteMany(stale_filter))
+    
+    async with mongo_transaction() as session:
+        await db.analytics_rollups.bulk_write(ops, ordered=True, session=session)
+
+async def rebuild_all_analytics_rollups(user_ids: Optional[List[str]] = None):
+    """Rebuild rollups for the given users, or for every user with plan items or rollups"""
+    if not user_ids:
+        user_ids = set(await db.plan_items.distinct("user_id")) | set(await db.analytics_rollups.distinct("user_id"))
+    for user_id in user_ids:
+        await rebuild_analytics_rollups(user_id)
+        logger.info(f"Rebuilt analytics rollups for {user_id}")
+
+# Study Plan Endpoints
+def build_plan_item_doc(plan_id: str, user_id: str, item_data: Dict[str, Any], created_at: datetime) -> Dict[str, Any]:
+    """Build a plan_items document from a generated plan entry"""
+    return {
+        "id": str(uuid.uuid4()),
+        "plan_id": plan_id,
+        "user_id": user_id,
+        "date": item_data["date"],
+        "subject": item_data["subject"].value,
+        "topic": item_data["topic"],
+        "kind": item_data["kind"].value,
+        "target_minutes": item_data["target_minutes"],
+        "actual_minutes": 0,
+        "status": PlanItemStatus.PENDING.value,
+        "created_at": created_at
+    }
+
+def build_plan_regeneration_ops(plan_id: str, user_id: str, plan_items_data: List[Dict], existing_items: List[Dict], now: datetime) -> tuple:
+    """Bulk operations that replace a plan's pending items with a freshly generated set.
+    
+    Items are matched on (date, subject, topic, kind): pending matches are updated in place
+    only if their target changed, slots already done or skipped are left alone, new slots
+    are upserted and pending items that are no longer scheduled are deleted. Items stored
+    before plans had revision slots count as study items. Also returns the matching rollup deltas.
+    """
+    existing_by_slot = {
+        (item["date"], item["subject"], item["topic"], item.get("kind", PlanItemKind.STUDY.value)): item
+        for item in existing_items
+    }
+    kept_ids = set()
+    ops = []
+    rollup_deltas = []
+    for item_data in plan_items_data:
+        slot = (item_data["date"], item_data["subject"].value, item_data["topic"], item_data["kind"].value)
+        existing = existing_by_slot.get(slot)
+        if existing and existing["status"] != PlanItemStatus.PENDING.value:
+            continue
+        if existing:
+            kept_ids.add(existing["id"])
+            if existing.get("target_minutes") != item_data["target_minutes"]:
+                ops.append(UpdateOne(
+                    {"id": existing["id"], "user_id": user_id, "status": PlanItemStatus.PENDING.value},
+                    {"$set": {"target_minutes": item_data["target_minutes"]}}
+                ))
+            continue
+        rollup_deltas.append((slot[0], slot[1], {"total": 1}))
+        doc = build_plan_item_doc(plan_id, user_id, item_data, now)
+        ops.append(UpdateOne(
+            {"plan_id": plan_id, "user_id": user_id, "date": doc["date"], "subject": doc["subject"],
+             "topic": doc["topic"], "kind": doc["kind"], "status": PlanItemStatus.PENDING.value},
+            {"$set": {"target_minutes": doc["target_minutes"]},
+             "$setOnInsert": {k: v for k, v in doc.items() if k != "target_minutes"}},
+            upsert=True
+        ))
+    stale_items = [
+        item for item in existing_items
+        if item["status"] == PlanItemStatus.PENDING.value and item["id"] not in kept_ids
+    ]
+    if stale_items:
+        ops.append(DeleteMany({"id": {"$in": [item["id"] for item in stale_items]}, "user_id": user_id}))
+        rollup_deltas.extend((item["date"], item["subject"], {"total": -1}) for item in stale_items)
+    return ops, rollup_deltas
+
+def plan_item_carry(item: Dict[str, Any], status: PlanItemStatus, minutes: int) -> int:
+    """Minutes a logged item pushes onto later days: its target if skipped, the shortfall or
+    (negative) surplus if done, nothing while pending"""
+    target = item.get("target_minutes", 0)
+    if status == PlanItemStatus.SKIPPED:
+        return target
+    if status == PlanItemStatus.DONE:
+        carry = max(target - minutes, -target)
+        return carry if abs(carry) >= PLAN_MIN_CARRY_MINUTES else 0
+    return 0
+
+def build_replan_ops(item: Dict[str, Any], carry: int, window_items: List[Dict[str, Any]],
+                     capacity: int, after: str, user_id: str, now: datetime) -> tuple:
+    """Bulk operations moving carry minutes of item's topic onto the days after `after`.
+    
+    Extra minutes go first to the same topic's pending items while their day has spare capacity,
+    then to new items on the earliest days with room; whatever still doesn't fit goes to the
+    first later day. Returned minutes are taken off the same topic's upcoming items, earliest first,
+    deleting those that reach zero. Only the items touched are written. Also returns rollup deltas.
+    """
+    same_topic = sorted(
+        (other for other in window_items
+         if other["status"] == PlanItemStatus.PENDING.value
+         and (other["subject"], other["topic"], other.get("kind", PlanItemKind.STUDY.value))
+         == (item["subject"], item["topic"], item.get("kind", PlanItemKind.STUDY.value))),
+        key=lambda other: other["date"]
+    )
+    day_load: Dict[str, int] = {}
+    for other in window_items:
+        day_load[other["date"]] = day_load.get(other["date"], 0) + other["target_minutes"]
+    
+    changes: Dict[str, int] = {}
+    remaining = carry
+    if remaining > 0:
+        for other in same_topic:
+            added = min(remaining, max(capacity - day_load[other["date"]], 0))
+            if added > 0:
+                changes[other["id"]] = added
+                day_load[other["date"]] += added
+                remaining -= added
+        new_items = []
+        start = date.fromisoformat(after)
+        for offset in range(1, PLAN_REPLAN_WINDOW_DAYS + 1):
+            if remaining <= 0:
+                break
+            day = (start + timedelta(days=offset)).isoformat()
+            spare = capacity - day_load.get(day, 0)
+            if spare >= min(remaining, PLAN_MIN_CARRY_MINUTES) and day not in {other["date"] for other in same_topic}:
+                new_items.append((day, min(remaining, spare)))
+                day_load[day] = day_load.get(day, 0) + min(remaining, spare)
+                remaining -= min(remaining, spare)
+        if remaining > 0:
+            # The window is full: overbook the first later day rather than drop the minutes
+            if same_topic:
+                changes[same_topic[0]["id"]] = changes.get(same_topic[0]["id"], 0) + remaining
+            else:
+                new_items.append(((start + timedelta(days=1)).isoformat(), remaining))
+    else:
+        new_items = []
+        for other in same_topic:
+            if remaining >= 0:
+                break
+            removed = max(remaining, -other["target_minutes"])
+            changes[other["id"]] = removed
+            remaining -= removed
+    
+    ops = []
+    rollup_deltas = []
+    deleted_ids = []
+    by_id = {other["id"]: other for other in same_topic}
+    for item_id, change in changes.items():
+        other = by_id[item_id]
+        if other["target_minutes"] + change <= 0:
+            deleted_ids.append(item_id)
+            rollup_deltas.append((other["date"], other["subject"], {"total": -1}))
+        else:
+            ops.append(UpdateOne(
+                {"id": item_id, "user_id": user_id, "status": PlanItemStatus.PENDING.value},
+                {"$inc": {"target_minutes": change}}
+            ))
+    if deleted_ids:
+        ops.append(DeleteMany({"id": {"$in": deleted_ids}, "user_id": user_id, "status": PlanItemStatus.PENDING.value}))
+    for day, minutes in new_items:
+        doc = build_plan_item_doc(item["plan_id"], user_id, {
+            "date": day,
+            "subject": Subject(item["subject"]),
+            "topic": item["topic"],
+            "kind": PlanItemKind(item.get("kind", PlanItemKind.STUDY.value)),
+            "target_minutes": minutes
+        }, now)
+        ops.append(InsertOne(doc))
+        rollup_deltas.append((day, doc["subject"], {"total": 1}))
+    return ops, rollup_deltas
+
+async def replan_after_log(user_id: str, item: Dict[str, Any], carry_delta: int) -> Dict[str, int]:
+    """Move a log's change in carried minutes onto the plan's next PLAN_REPLAN_WINDOW_DAYS days"""
+    today = datetime.now().date().isoformat()
+    after = max(today, item["date"])
+    window_end = (date.fromisoformat(after) + timedelta(days=PLAN_REPLAN_WINDOW_DAYS)).isoformat()
+    window_items = await db.plan_items.find(
+        {"plan_id": item["plan_id"], "date": {"$gt": after, "$lte": window_end}},
+        {"_id": 0, "id": 1, "date": 1, "subject": 1, "topic": 1, "kind": 1, "status": 1, "target_minutes": 1}
+    ).to_list(length=None)
+    plan = await db.study_plans.find_one({"id": item["plan_id"], "user_id": user_id}, {"_id": 0, "hours_per_day": 1})
+    if plan and plan.get("hours_per_day"):
+        capacity = plan["hours_per_day"] * 60
+    else:
+        # Plans created before hours_per_day was stored: assume the busiest day is the daily budget
+        loads: Dict[str, int] = {}
+        for other in window_items:
+            loads[other["date"]] = loads.get(other["date"], 0) + other["target_minutes"]
+        capacity = max(loads.values(), default=0)
+    
+    ops, rollup_deltas = build_replan_ops(item, carry_delta, window_items, capacity, after, user_id, datetime.utcnow())
+    if ops:
+        async with mongo_transaction() as session:
+            await db.plan_items.bulk_write(ops, ordered=False, session=session)
+            await apply_rollup_deltas(user_id, rollup_deltas, session=session)
+    return {"rescheduled_minutes": carry_delta, "items_changed": len(ops)}
+
+@api_router.post("/planner/generate")
+async def generate_plan(request: PlanGenerateRequest, user_id: str = "mock_user"):
+    """Generate a study plan, or regenerate the pending items of an existing one"""
+    now = datetime.utcnow()
+    plan_items_data = generate_study_plan(request.exam_date, request.hours_per_day, request.subjects, request.weak_areas)
+    
+    if request.plan_id:
+        plan = await db.study_plans.find_one({"id": request.plan_id, "user_id": user_id}, {"_id": 0, "id": 1})
+        if not plan:
+            raise HTTPException(status_code=404, detail="Study plan not found")
+        
+        async with mongo_transaction() as session:
+            await db.study_plans.update_one(
+                {"id": request.plan_id, "user_id": user_id},
+                {"$set": {"end_date": request.exam_date, "hours_per_day": request.hours_per_day}},
+                session=session
+            )
+            existing_items = await db.plan_items.find(
+                {"plan_id": request.plan_id, "date": {"$gte": datetime.now().date().isoformat()}},
+                {"_id": 0, "id": 1, "date": 1, "subject": 1, "topic": 1, "kind": 1, "status": 1, "target_minutes": 1},
+                session=session
+            ).to_list(length=None)
+            ops, rollup_deltas = build_plan_regeneration_ops(request.plan_id, user_id, plan_items_data, existing_items, now)
+            if ops:
+                await db.plan_items.bulk_write(ops, ordered=False, session=session)
+            await apply_rollup_deltas(user_id, rollup_deltas, session=session)
+        
+        return {"plan_id": request.plan_id, "message": "Study plan regenerated successfully"}
+    
+    # Create study plan
+    plan_data = {
+        "id": str(uuid.uuid4()),
+        "user_id": user_id,
+        "name": f"UPSC Study Plan - {datetime.now().strftime('%B %Y')}",
+        "start_date": datetime.now().date().isoformat(),
+        "end_date": request.exam_date,
+        "hours_per_day": request.hours_per_day,
+        "created_at": now
+    }
+    plan_item_docs = [build_plan_item_doc(plan_data["id"], user_id, item_data, now) for item_data in plan_items_data]
+    
+    # One round trip for all items, committed together with the plan when transactions are available
+    async with mongo_transaction() as session:
+        await db.study_plans.insert_one(plan_data, session=session)
+        if plan_item_docs:
+            await db.plan_items.insert_many(plan_item_docs, session=session)
+            await apply_rollup_deltas(
+                user_id,
+                [(doc["date"], doc["subject"], {"total": 1}) for doc in plan_item_docs],
+                session=session
+            )
+    
+    return {"plan_id": plan_data["id"], "message": "Study plan generated successfully"}
+
+@api_router.get("/planner/items")
+async def get_plan_items(date: Optional[str] = None, from_date: Optional[str] = Query(None, alias="from"),
+                         to_date: Optional[str] = Query(None, alias="to"), after: Optional[str] = None,
+                         limit: int = DEFAULT_PAGE_SIZE, user_id: str = "mock_user"):
+    """Get plan items for a date, an inclusive from/to date range, or all items, one page at a time"""
+    query: Dict[str, Any] = {"user_id": user_id}
+    if date:
+        query["date"] = date
+    elif from_date or to_date:
+        query["date"] = {
+            **({"$gte": from_date} if from_date else {}),
+            **({"$lte": to_date} if to_date else {})
+        }
+    
+    # Ordered by day; created_at is shared by every item of a generated plan, so it can't order them
+    items, next_cursor = await paginate(db.plan_items, query, after, limit, sort_key="date")
+    return MongoJSONResponse({"items": items, "next_cursor": next_cursor})
+
+@api_router.post("/planner/log")
+async def log_study_progress(request: StudyLogRequest, user_id: str = "mock_user"):
+    """Log study progress and move any shortfall or surplus onto the coming days"""
+    item = await db.plan_items.find_one(
+        {"id": request.plan_item_id, "user_id": user_id},
+        {"_id": 0, "plan_id": 1, "date": 1, "subject": 1, "topic": 1, "kind": 1,
+         "status": 1, "target_minutes": 1, "actual_minutes": 1, "carried_minutes": 1}
+    )
+    if not item:
+        return {"message": "Progress logged successfully"}
+    
+    carry = plan_item_carry(item, request.status, request.minutes)
+    # Guard on the state we read so concurrent logs of the same item can't both reschedule
+    result = await db.plan_items.update_one(
+        {"id": request.plan_item_id, "user_id": user_id, "status": item["status"],
+         "actual_minutes": item.get("actual_minutes"), "carried_minutes": item.get("carried_minutes")},
+        {"$set": {
+            "actual_minutes": request.minutes,
+            "status": request.status.value,
+            "carried_minutes": carry
+        }}
+    )
+    if result.matched_count == 0:
+        raise HTTPException(status_code=409, detail="Plan item was updated concurrently, please retry")
+    
+    # Apply only the change against the previous log so re-logs and reversals don't double count
+    delta = plan_item_log_delta(item, request.status, request.minutes)
+    await apply_rollup_deltas(user_id, [(item["date"], item["subject"], delta)])
+    
+    # Update profile stats
+    if delta["minutes"]:
+        await db.profiles.update_one(
+            {"user_id": user_id},
+            {"$inc": {"total_study_minutes": delta["minutes"]}}
+        )
+    
+    replan = {"rescheduled_minutes": 0, "items_changed": 0}
+    if carry != item.get("carried_minutes", 0):
+        replan = await replan_after_log(user_id, item, carry - item.get("carried_minutes", 0))
+    
+    return {"message": "Progress logged successfully", **replan}
+
+# MCQ Bank
+# mcq_bank holds generated questions per (subject, topic) pool; mcq_served holds, per user and pool, the
+# ids already served in the current cycle. Requests sample unseen questions, and background workers grow
+# a pool whenever a user's unseen count falls below MCQ_POOL_LOW_WATER, up to MCQ_POOL_MAX questions, so
+# requests never wait on the LLM. A request on a pool nobody has filled yet gets placeholder questions while
+# the first batch is generated in the background.
+def mcq_pool_key(subject: Subject, topic: Optional[str]) -> str:
+    return f"{subject.value}:{' '.join((topic or '').split()).casefold()}"
+
+def placeholder_mcqs(subject: Subject, topic: Optional[str], count: int) -> List[Dict[str, Any]]:
+    """Template questions served when the LLM is unavailable and the pool is empty; never stored in the bank"""
     questions = []
-    for i in range(request.count):
+    for i in range(count):
         questions.append({
             "id": str(uuid.uuid4()),
-            "stem": f"Sample MCQ question {i+1} for {request.subject.value.upper()}: What is the key concept in {request.topic or 'this subject'}?",
+            "stem": f"Sample MCQ question {i+1} for {subject.value.upper()}: What is the key concept in {topic or 'this subject'}?",
             "options": [
-                f"Option A: First concept related to {request.topic or 'the topic'}", 
-                f"Option B: Second concept related to {request.topic or 'the topic'}", 
-                f"Option C: Third concept related to {request.topic or 'the topic'}", 
-                f"Option D: Fourth concept related to {request.topic or 'the topic'}"
+                f"Option A: First concept related to {topic or 'the topic'}", 
+                f"Option B: Second concept related to {topic or 'the topic'}", 
+                f"Option C: Third concept related to {topic or 'the topic'}", 
+                f"Option D: Fourth concept related to {topic or 'the topic'}"
             ],
             "answer_index": i % 4,
-            "explanation": f"The correct answer explains the fundamental principle of {request.topic or 'this UPSC topic'} in the context of {request.subject.value.upper()}."
+            "explanation": f"The correct answer explains the fundamental principle of {topic or 'this UPSC topic'} in the context of {subject.value.upper()}."
         })
+    return questions
+
+def parse_mcq_response(response: str) -> List[Dict[str, Any]]:
+    """Valid questions from an LLM reply holding a JSON array; malformed items are dropped"""
+    start, end = response.find("["), response.rfind("]")
+    if start == -1 or end <= start:
+        return []
+    try:
+        items = json.loads(response[start:end + 1])
+    except json.JSONDecodeError:
+        return []
+    questions = []
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict):
+            continue
+        options = item.get("options")
+        answer_index = item.get("answer_index")
+        if (
+            isinstance(item.get("stem"), str) and item["stem"].strip()
+            and isinstance(options, list) and len(options) == 4 and all(isinstance(option, str) for option in options)
+            and isinstance(answer_index, int) and 0 <= answer_index < 4
+        ):
+            questions.append({
+                "stem": item["stem"].strip(),
+                "options": [option.strip() for option in options],
+                "answer_index": answer_index,
+                "explanation": str(item.get("explanation") or "").strip()
+            })
+    return questions
+
+async def generate_mcq_batch(subject: Subject, topic: Optional[str], count: int) -> List[Dict[str, Any]]:
+    """Generate questions with the LLM in MCQ_GENERATION_CHUNK-sized calls and add them to the bank"""
+    pool_key = mcq_pool_key(subject, topic)
+    stored = []
+    for _ in range(math.ceil(count / MCQ_GENERATION_CHUNK)):
+        prompt = (
+            f"Write {MCQ_GENERATION_CHUNK} distinct UPSC prelims multiple-choice questions for {subject.value.upper()}"
+            f"{f' on {topic}' if topic else ''}. Reply with only a JSON array of objects with keys "
+            '"stem", "options" (exactly 4 strings), "answer_index" (0-3) and "explanation".'
+        )
+        # Uncached: every call should produce new questions
+        response = await get_ollama_response(prompt, use_cache=False, options={"num_predict": 300 * MCQ_GENERATION_CHUNK})
+        questions = parse_mcq_response(response)
+        if not questions:
+            logger.warning(f"MCQ generation for {pool_key} returned no usable questions")
+            break
+        now = datetime.utcnow()
+        docs = [
+            {"id": str(uuid.uuid4()), "pool_key": pool_key, "subject": subject.value, "topic": topic,
+             "model": OLLAMA_MODEL, "created_at": now, **question}
+            for question in questions
+        ]
+        await db.mcq_bank.insert_many(docs)
+        stored.extend(docs)
+        if len(stored) >= count:
+            break
+    return stored
+
+class MCQPoolFiller:
+    """Background workers that grow MCQ pools while interactive LLM traffic is idle"""
+    
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self._pending: set = set()
+        self._tasks: List[asyncio.Task] = []
+    
+    def request(self, subject: Subject, topic: Optional[str], count: int):
+        """Queue a refill unless one is already pending for the pool"""
+        pool_key = mcq_pool_key(subject, topic)
+        if pool_key in self._pending:
+            return
+        self._pending.add(pool_key)
+        self.queue.put_nowait((pool_key, subject, topic, count))
+    
+    async def start(self):
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        if MCQ_PREFILL_ON_STARTUP:
+            for subject in Subject:
+                if await db.mcq_bank.count_documents({"pool_key": mcq_pool_key(subject, None)}) < MCQ_POOL_TARGET:
+                    self.request(subject, None, MCQ_POOL_TARGET)
+    
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+    
+    async def _wait_for_idle_llm(self):
+        if not await model_manager.wait_until_available("llm"):
+            raise RuntimeError("LLM is not available")
+        # Yield to chat, evaluation and other user-facing generations
+        while model_manager.models["llm"]["in_flight"] > 0:
+            await asyncio.sleep(1)
+    
+    async def _worker(self):
+        while True:
+            pool_key, subject, topic, count = await self.queue.get()
+            try:
+                await self._wait_for_idle_llm()
+                count = min(count, MCQ_POOL_MAX - await db.mcq_bank.count_documents({"pool_key": pool_key}))
+                if count <= 0:
+                    continue
+                generated = await generate_mcq_batch(subject, topic, count)
+                logger.info(f"Added {len(generated)} questions to MCQ pool {pool_key}")
+            except Exception as e:
+                logger.error(f"MCQ pool refill error for {pool_key}: {e}")
+            finally:
+                self._pending.discard(pool_key)
+                self.queue.task_done()
+
+mcq_pool_filler = MCQPoolFiller(MCQ_REFILL_WORKERS)
+
+async def sample_mcqs(user_id: str, subject: Subject, topic: Optional[str], count: int,
+                      generate_cold: bool = False) -> List[Dict[str, Any]]:
+    """Draw questions this user hasn't seen from the pool, starting a new cycle once they've seen them all
+
+    A pool with too few questions is refilled in the background. Only background callers pass
+    generate_cold, which generates the missing questions of a never-served pool inline instead.
+    """
+    pool_key = mcq_pool_key(subject, topic)
+    projection = {"_id": 0, "id": 1, "stem": 1, "options": 1, "answer_index": 1, "explanation": 1}
+    served_doc = await db.mcq_served.find_one({"user_id": user_id, "pool_key": pool_key}, {"_id": 0, "served_ids": 1})
+    served_ids = (served_doc or {}).get("served_ids", [])
+    
+    questions = await db.mcq_bank.aggregate([
+        {"$match": {"pool_key": pool_key, "id": {"$nin": served_ids}}},
+        {"$sample": {"size": count}},
+        {"$project": projection}
+    ]).to_list(length=count)
+    
+    reset_cycle = False
+    if len(questions) < count and served_ids:
+        # Pool exhausted for this user: start over, avoiding the questions just drawn
+        reset_cycle = True
+        drawn = [question["id"] for question in questions]
+        questions += await db.mcq_bank.aggregate([
+            {"$match": {"pool_key": pool_key, "id": {"$nin": drawn}}},
+            {"$sample": {"size": count - len(questions)}},
+            {"$project": projection}
+        ]).to_list(length=count)
+    
+    if generate_cold and len(questions) < count and not served_ids:
+        # Cold start for a batch job: nobody has practised this pool yet, so generate the first questions inline
+        generated = await generate_mcq_batch(subject, topic, count - len(questions))
+        questions += [{key: doc[key] for key in projection if key != "_id"} for doc in generated[:count - len(questions)]]
+    
+    if questions:
+        served_update = (
+            {"$set": {"served_ids": [question["id"] for question in questions]}} if reset_cycle
+            else {"$addToSet": {"served_ids": {"$each": [question["id"] for question in questions]}}}
+        )
+        await db.mcq_served.update_one(
+            {"user_id": user_id, "pool_key": pool_key},
+            {**served_update, "$setOnInsert": {"created_at": datetime.utcnow()}},
+            upsert=True
+        )
+    
+    pool_size = await db.mcq_bank.count_documents({"pool_key": pool_key})
+    unseen = pool_size - (len(questions) if reset_cycle else len(served_ids) + len(questions))
+    if unseen < MCQ_POOL_LOW_WATER and pool_size < MCQ_POOL_MAX:
+        mcq_pool_filler.request(subject, topic, min(max(MCQ_REFILL_BATCH, MCQ_POOL_TARGET - pool_size), MCQ_POOL_MAX - pool_size))
+    return questions
+
+# MCQ Endpoints
+@api_router.post("/mcq/generate")
+async def generate_mcqs(request: MCQGenerateRequest, user_id: str = "mock_user"):
+    """Serve an MCQ set from the pre-generated bank"""
+    count = max(1, min(request.count, MCQ_MAX_PER_REQUEST))
+    questions = await sample_mcqs(user_id, request.subject, request.topic, count)
+    if not questions:
+        # Nothing banked yet; the refill sample_mcqs queued will fill the pool
+        questions = placeholder_mcqs(request.subject, request.topic, count)
     
     mcq_set_data = {
         "id": str(uuid.uuid4()),
@@ -623,7 +3211,7 @@ async def generate_mcqs(request: MCQGenerateRequest, user_id: str = "mock_user")
     
     await db.mcq_sets.insert_one(mcq_set_data)
     
-    return serialize_doc(mcq_set_data)
+    return MongoJSONResponse(mcq_set_data)
 
 # Flashcard Endpoints
 @api_router.post("/flashcards/generate")
@@ -641,6 +3229,8 @@ async def generate_flashcards(request: FlashcardGenerateRequest, user_id: str =
             "ease": 2.5,
             "interval_days": 1,
             "reps": 0,
+            "lapses": 0,
+            "last_reviewed_at": None,
             "next_review_at": datetime.utcnow(),
             "created_at": datetime.utcnow()
         }
@@ -648,31 +3238,355 @@ async def generate_flashcards(request: FlashcardGenerateRequest, user_id: str =
     
     await db.flashcards.insert_many(flashcards_data)
     
-    return {"flashcards": serialize_doc(flashcards_data), "count": len(flashcards_data)}
+    return MongoJSONResponse({"flashcards": flashcards_data, "count": len(flashcards_data)})
+
+def sm2_schedule(card: Dict[str, Any], grade: int, reviewed_at: datetime) -> Dict[str, Any]:
+    """Apply one SM-2 review to a card's schedule fields and return the new values"""
+    ease = card.get("ease", 2.5)
+    interval_days = card.get("interval_days", 1)
+    reps = card.get("reps", 0)
+    lapses = card.get("lapses", 0)
+    
+    if grade < 3:
+        # Forgotten: relearn from a one-day interval
+        reps = 0
+        interval_days = 1
+        lapses += 1
+    else:
+        if reps == 0:
+            interval_days = 1
+        elif reps == 1:
+            interval_days = 6
+        else:
+            interval_days = max(round(interval_days * ease), interval_days + 1)
+        reps += 1
+    ease = max(FLASHCARD_MIN_EASE, ease + 0.1 - (5 - grade) * (0.08 + (5 - grade) * 0.02))
+    
+    return {
+        "ease": round(ease, 4),
+        "interval_days": interval_days,
+        "reps": reps,
+        "lapses": lapses,
+        "last_reviewed_at": reviewed_at,
+        "next_review_at": reviewed_at + timedelta(days=interval_days)
+    }
 
 @api_router.get("/flashcards/review")
-async def get_flashcards_for_review(user_id: str = "mock_user"):
-    """Get flashcards due for review"""
+async def get_flashcards_for_review(limit: int = 20, user_id: str = "mock_user"):
+    """Get flashcards due for review, most overdue first"""
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    now = datetime.utcnow()
+    flashcards = await db.flashcards.find(
+        {"user_id": user_id, "next_review_at": {"$lte": now}},
+        {"_id": 0}
+    ).sort("next_review_at", ASCENDING).limit(limit).to_list(length=limit)
+    
+    return MongoJSONResponse({"flashcards": flashcards})
+
+@api_router.post("/flashcards/review")
+async def submit_flashcard_reviews(request: FlashcardReviewRequest, user_id: str = "mock_user"):
+    """Apply a review session's grades: one read of the cards, one bulk_write of their new schedules"""
+    if len(request.reviews) > FLASHCARD_MAX_REVIEWS_PER_REQUEST:
+        raise HTTPException(status_code=400, detail=f"At most {FLASHCARD_MAX_REVIEWS_PER_REQUEST} reviews per request")
+    
+    now = datetime.utcnow()
+    now = now.replace(microsecond=now.microsecond // 1000 * 1000)
+    
+    def review_time(review: FlashcardReview) -> datetime:
+        # Stored datetimes are naive UTC; clocks running ahead can't schedule from the future
+        if review.reviewed_at is None:
+            return now
+        reviewed_at = review.reviewed_at
+        if reviewed_at.tzinfo is not None:
+            reviewed_at = reviewed_at.astimezone(timezone.utc).replace(tzinfo=None)
+        # MongoDB keeps millisecond precision; truncate so a retried review compares equal to the stored one
+        return min(reviewed_at.replace(microsecond=reviewed_at.microsecond // 1000 * 1000), now)
+    
+    # A card graded more than once in a session (relearning) gets its grades applied in review order
+    reviews = sorted(request.reviews, key=review_time)
+    card_ids = list({review.flashcard_id for review in reviews})
+    cards = await db.flashcards.find(
+        {"id": {"$in": card_ids}, "user_id": user_id},
+        {"_id": 0, "id": 1, "ease": 1, "interval_days": 1, "reps": 1, "lapses": 1, "last_reviewed_at": 1}
+    ).to_list(length=None)
+    cards_by_id = {card["id"]: card for card in cards}
+    
+    schedules: Dict[str, Dict[str, Any]] = {}
+    skipped = []
+    for review in reviews:
+        card = cards_by_id.get(review.flashcard_id)
+        reviewed_at = review_time(review)
+        state = schedules.get(review.flashcard_id, card)
+        last_reviewed_at = state.get("last_reviewed_at") if state else None
+        if card is None or (last_reviewed_at and reviewed_at <= last_reviewed_at):
+            # Unknown card, or a review already applied by an earlier (retried) submission
+            skipped.append(review.flashcard_id)
+            continue
+        schedules[review.flashcard_id] = sm2_schedule(state, review.grade, reviewed_at)
+    
+    updated = 0
+    conflicts = []
+    if schedules:
+        result = await db.flashcards.bulk_write([
+            UpdateOne(
+                # Guard on the state we read so a concurrent session can't be overwritten with stale data
+                {"id": card_id, "user_id": user_id, "last_reviewed_at": cards_by_id[card_id].get("last_reviewed_at")},
+                {"$set": schedule}
+            )
+            for card_id, schedule in schedules.items()
+        ], ordered=False)
+        updated = result.modified_count
+        if result.matched_count < len(schedules):
+            # bulk_write doesn't say which updates missed; a card whose stored review isn't ours lost the race
+            applied = await db.flashcards.find(
+                {"id": {"$in": list(schedules)}, "user_id": user_id,
+                 "$or": [{"id": card_id, "last_reviewed_at": schedule["last_reviewed_at"]} for card_id, schedule in schedules.items()]},
+                {"_id": 0, "id": 1}
+            ).to_list(length=None)
+            applied_ids = {card["id"] for card in applied}
+            conflicts = [card_id for card_id in schedules if card_id not in applied_ids]
+            for card_id in conflicts:
+                del schedules[card_id]
+    
+    return MongoJSONResponse({
+        "updated": updated,
+        "skipped": skipped,
+        # Cards another session reviewed in the meantime; fetch them again before re-grading
+        "conflicts": conflicts,
+        "flashcards": [{"id": card_id, **schedule} for card_id, schedule in schedules.items()]
+    })
+
+# Daily Dose
+# A nightly batch materializes each active user's dose for the next day into daily_doses: DOSE_MCQ_COUNT
+# questions drawn from the MCQ bank for the subjects and topics on that day's plan (or their profile
+# subjects), plus one current-affairs note and one essay topic shared by everyone for the date.
+# /dose/today is then a single lookup on the (user_id, date) index.
+DOSE_CURRENT_AFFAIRS_CATEGORIES = ["Polity", "Economy", "Environment", "International Relations", "Science & Technology", "Society"]
+DOSE_ESSAY_TOPICS = [
+    "Digital India: Transforming Governance and Empowering Citizens",
+    "Climate justice is the defining challenge of our generation",
+    "Cooperative federalism: myth or reality",
+    "Education is the most powerful weapon to change the world",
+    "Technology as the great equalizer of opportunity",
+]
+
+def parse_json_object(response: str) -> Dict[str, Any]:
+    """The JSON object embedded in an LLM reply, or {} if there is none"""
+    start, end = response.find("{"), response.rfind("}")
+    if start == -1 or end <= start:
+        return {}
+    try:
+        parsed = json.loads(response[start:end + 1])
+    except json.JSONDecodeError:
+        return {}
+    return parsed if isinstance(parsed, dict) else {}
+
+def dose_sources(plan_items: List[Dict[str, Any]], profile: Optional[Dict[str, Any]], count: int) -> List[tuple]:
+    """(subject, topic) pools to draw each of the day's questions from, spread round-robin"""
+    pools = list(dict.fromkeys((Subject(item["subject"]), item["topic"]) for item in plan_items))
+    if not pools:
+        pools = [(subject, None) for subject in (Subject.GS1, Subject.GS2, Subject.GS3, Subject.GS4)]
+        if profile and profile.get("optional_subject"):
+            pools.append((Subject.OPTIONAL, profile["optional_subject"]))
+    return [pools[i % len(pools)] for i in range(count)]
+
+async def build_shared_dose_items(dose_date: str) -> Optional[List[Dict[str, Any]]]:
+    """The current-affairs note and essay topic for a date, generated once and shared by every user's dose
+
+    Returns None while the LLM is unavailable, so doses are not stored with the static fallbacks.
+    """
+    if not model_manager.is_available("llm"):
+        return None
+    day = date.fromisoformat(dose_date).toordinal()
+    category = DOSE_CURRENT_AFFAIRS_CATEGORIES[day % len(DOSE_CURRENT_AFFAIRS_CATEGORIES)]
+    current_affairs = {"title": f"{category} Brief", "summary": f"Revise a recent development in {category} and link it to the GS syllabus."}
+    essay = {"topic": DOSE_ESSAY_TOPICS[day % len(DOSE_ESSAY_TOPICS)], "hints": []}
+    
+    # The fallbacks above only cover a reply that isn't the JSON we asked for
+    parsed = parse_json_object(await get_ollama_response(
+        f"Write a short UPSC current-affairs revision note on an important recent development in {category} in India. "
+        'Reply with only a JSON object with keys "title" and "summary" (at most 80 words).',
+        use_cache=False
+    ))
+    if isinstance(parsed.get("title"), str) and isinstance(parsed.get("summary"), str):
+        current_affairs = {"title": parsed["title"].strip(), "summary": parsed["summary"].strip()}
+    
+    parsed = parse_json_object(await get_ollama_response(
+        f"Suggest one thought-provoking UPSC essay topic for {dose_date}. "
+        'Reply with only a JSON object with keys "topic" and "hints" (4-5 short strings).',
+        use_cache=False
+    ))
+    if isinstance(parsed.get("topic"), str) and isinstance(parsed.get("hints"), list):
+        essay = {"topic": parsed["topic"].strip(), "hints": [str(hint).strip() for hint in parsed["hints"]][:5]}
+    
+    return [
+        {"id": str(uuid.uuid4()), "type": "current_affairs", "date": dose_date, "category": category, **current_affairs},
+        {"id": str(uuid.uuid4()), "type": "essay_topic", "word_limit": 250, **essay},
+    ]
+
+async def build_user_dose(user_id: str, dose_date: str, shared_items: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """A user's dose for a date, or None when a question pool is empty and the LLM can't fill it"""
+    plan_items = await db.plan_items.find(
+        {"user_id": user_id, "date": dose_date},
+        {"_id": 0, "subject": 1, "topic": 1}
+    ).to_list(length=None)
+    profile = await db.profiles.find_one({"user_id": user_id}, {"_id": 0, "optional_subject": 1})
+    
+    per_pool: Dict[tuple, int] = {}
+    for pool in dose_sources(plan_items, profile, DOSE_MCQ_COUNT):
+        per_pool[pool] = per_pool.get(pool, 0) + 1
+    items = []
+    for (subject, topic), count in per_pool.items():
+        questions = await sample_mcqs(user_id, subject, topic, count, generate_cold=True)
+        if not questions:
+            # Placeholder questions are not stored; the dose is rebuilt once the LLM is back
+            return None
+        items.extend({"type": "mcq", "subject": subject.value, "topic": topic, **question} for question in questions)
+    
     now = datetime.utcnow()
-    flashcards_cursor = db.flashcards.find({
+    return {
+        "id": str(uuid.uuid4()),
         "user_id": user_id,
-        "next_review_at": {"$lte": now}
-    }).limit(20)
+        "date": dose_date,
+        "items": items + shared_items,
+        "created_at": now,
+        "expires_at": datetime.combine(date.fromisoformat(dose_date), datetime.min.time()) + timedelta(days=DOSE_RETENTION_DAYS)
+    }
+
+async def find_active_users(dose_date: str) -> List[str]:
+    """Users who logged study in the last DOSE_ACTIVE_DAYS days or set up their profile in that window"""
+    today = date.fromisoformat(dose_date) - timedelta(days=1)
+    since = today - timedelta(days=DOSE_ACTIVE_DAYS)
+    logged = await db.plan_items.distinct("user_id", {
+        "date": {"$gte": since.isoformat(), "$lte": today.isoformat()},
+        "status": {"$in": [PlanItemStatus.DONE.value, PlanItemStatus.SKIPPED.value]}
+    })
+    new_profiles = await db.profiles.distinct("user_id", {"updated_at": {"$gte": datetime.combine(since, datetime.min.time())}})
+    return sorted(set(logged) | set(new_profiles))
+
+async def build_daily_doses(dose_date: Optional[str] = None) -> int:
+    """Materialize dose_date's bundle (default tomorrow) for every active user that doesn't have one yet"""
+    dose_date = dose_date or (datetime.now().date() + timedelta(days=1)).isoformat()
+    user_ids = await find_active_users(dose_date)
+    built = set(await db.daily_doses.distinct("user_id", {"date": dose_date, "user_id": {"$in": user_ids}}))
+    pending = [user_id for user_id in user_ids if user_id not in built]
+    if not pending:
+        return 0
     
-    flashcards = await flashcards_cursor.to_list(length=20)
+    shared_items = await build_shared_dose_items(dose_date)
+    if shared_items is None:
+        logger.warning(f"LLM unavailable; daily doses for {dose_date} will be built once it is ready")
+        return 0
+    semaphore = asyncio.Semaphore(DOSE_BUILD_CONCURRENCY)
     
-    return {"flashcards": serialize_doc(flashcards)}
+    async def build(user_id: str) -> Optional[Dict[str, Any]]:
+        async with semaphore:
+            try:
+                return await build_user_dose(user_id, dose_date, shared_items)
+            except Exception as e:
+                logger.error(f"Daily dose build failed for {user_id} on {dose_date}: {e}")
+                return None
+    
+    doses = [dose for dose in await asyncio.gather(*(build(user_id) for user_id in pending)) if dose]
+    if doses:
+        # $setOnInsert keeps a dose that a concurrent run already stored, so users never see it change
+        await db.daily_doses.bulk_write([
+            UpdateOne({"user_id": dose["user_id"], "date": dose_date}, {"$setOnInsert": dose}, upsert=True)
+            for dose in doses
+        ], ordered=False)
+    logger.info(f"Built {len(doses)} daily doses for {dose_date}")
+    return len(doses)
 
-# Answer Evaluation Endpoints
-@api_router.post("/evaluation/answer")
-async def evaluate_answer(request: EvaluationRequest, user_id: str = "mock_user"):
-    """Evaluate a mains answer"""
-    # Extract text from image using OCR
-    ocr_text = extract_text_from_image(request.answer_image)
+class DailyDoseScheduler:
+    """Runs build_daily_doses for the next day at DOSE_BUILD_HOUR, catching up on today's doses at startup"""
+    
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+    
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+        model_manager.on_ready("llm", self.catch_up)
+    
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+    
+    async def catch_up(self):
+        """Build today's doses, and tomorrow's if the nightly run has already passed"""
+        try:
+            now = datetime.now()
+            await build_daily_doses(now.date().isoformat())
+            if now.hour >= DOSE_BUILD_HOUR:
+                await build_daily_doses()
+        except Exception as e:
+            logger.error(f"Daily dose catch-up error: {e}")
+    
+    @staticmethod
+    def seconds_until_next_run(now: datetime) -> float:
+        next_run = now.replace(hour=DOSE_BUILD_HOUR, minute=0, second=0, microsecond=0)
+        if next_run <= now:
+            next_run += timedelta(days=1)
+        return (next_run - now).total_seconds()
     
-    # Generate evaluation using AI
+    async def _run(self):
+        # Covers a server that was down when last night's batch should have run. Doses the LLM can't
+        # build yet are skipped and picked up by catch_up when the model recovers.
+        await model_manager.wait_until_available("llm")
+        await self.catch_up()
+        while True:
+            await asyncio.sleep(self.seconds_until_next_run(datetime.now()))
+            try:
+                await build_daily_doses()
+            except Exception as e:
+                logger.error(f"Daily dose batch error: {e}")
+
+daily_dose_scheduler = DailyDoseScheduler()
+
+async def build_daily_doses_once(dose_date: Optional[str] = None) -> bool:
+    """One-off dose build for the CLI: load the LLM first, since no ModelManager runs in this process"""
+    await model_manager.load_llm()
+    if not model_manager.is_available("llm"):
+        logger.error(f"LLM unavailable; no daily doses built: {model_manager.models['llm']['error']}")
+        return False
+    await build_daily_doses(dose_date)
+    return True
+
+# Daily Dose Endpoints
+@api_router.get("/dose/today")
+async def get_today_dose(user_id: str = "mock_user"):
+    """Get today's precomputed dose"""
+    dose = await db.daily_doses.find_one(
+        {"user_id": user_id, "date": datetime.now().date().isoformat()},
+        {"_id": 0, "expires_at": 0}
+    )
+    if not dose:
+        raise HTTPException(status_code=404, detail="Today's dose is not ready yet")
+    return MongoJSONResponse(dose)
+
+# Answer Evaluation Jobs
+# Evaluations are created as queued jobs and advance queued -> ocr -> evaluating -> completed/failed.
+# Each submission carries an idempotency key (the Idempotency-Key header, or a hash of the question and
+# page contents), so a client retrying after a dropped connection gets the original job back.
+EVALUATION_TERMINAL_STATUSES = {EvaluationStatus.COMPLETED.value, EvaluationStatus.FAILED.value}
+EVALUATION_PROGRESS_PROJECTION = {"_id": 0, "id": 1, "status": 1, "progress": 1, "error": 1}
+
+def check_answer_page_count(count: int):
+    if count == 0:
+        raise HTTPException(status_code=400, detail="An answer needs at least one page")
+    if count > ANSWER_MAX_PAGES:
+        raise HTTPException(status_code=400, detail=f"An answer can have at most {ANSWER_MAX_PAGES} pages")
+
+def stitch_answer_pages(pages: List[str]) -> str:
+    """Join per-page OCR text in page order, marking page breaks for multi-page answers"""
+    if len(pages) == 1:
+        return pages[0]
+    return "\n\n".join(f"[Page {number}]\n{text}" for number, text in enumerate(pages, 1))
+
+async def grade_answer(question: str, ocr_text: str) -> tuple:
+    """Ask the LLM to evaluate an answer; returns (suggestions, rubric)"""
     evaluation_prompt = f"""
-    Question: {request.question}
+    Question: {question}
     
     Answer Text: {ocr_text}
     
@@ -686,7 +3600,9 @@ async def evaluate_answer(request: EvaluationRequest, user_id: str = "mock_user"
     Provide specific suggestions for improvement.
     """
     
-    ai_evaluation = get_ollama_response(evaluation_prompt)
+    ai_evaluation = await get_ollama_response(evaluation_prompt)
+    if ai_evaluation in (LLM_UNAVAILABLE_MESSAGE, LLM_TIMEOUT_MESSAGE, LLM_ERROR_MESSAGE):
+        raise RuntimeError(ai_evaluation)
     
     # Parse AI response to extract scores (mock parsing for now)
     rubric = {
@@ -696,64 +3612,319 @@ async def evaluate_answer(request: EvaluationRequest, user_id: str = "mock_user"
         "language": 7,
         "conclusion": 6
     }
-    total_score = sum(rubric.values())
+    return ai_evaluation, rubric
+
+def evaluation_idempotency_key(question: str, answer_blobs: List[Dict[str, Any]], header: Optional[str]) -> str:
+    if header:
+        return f"header:{header}"
+    digest = hashlib.sha256(question.encode("utf-8"))
+    for blob in answer_blobs:
+        digest.update(blob["sha256"].encode("ascii"))
+    return f"content:{digest.hexdigest()}"
+
+class EvaluationPipeline:
+    """Bounded pool of workers running evaluation jobs through OCR -> LLM grading"""
+    
+    def __init__(self, workers: int):
+        self.workers = workers
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self._tasks: List[asyncio.Task] = []
+        self._changes: Dict[str, asyncio.Event] = {}
+        self._waiters: Dict[str, int] = {}
+    
+    def submit(self, evaluation_id: str):
+        self.queue.put_nowait(evaluation_id)
+    
+    async def start(self):
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        # Pick up jobs interrupted by a restart; every stage is safe to repeat
+        pending = await db.evaluations.find(
+            {"status": {"$in": [EvaluationStatus.QUEUED.value, EvaluationStatus.OCR.value, EvaluationStatus.EVALUATING.value]}},
+            {"_id": 0, "id": 1}
+        ).to_list(length=None)
+        for evaluation in pending:
+            self.submit(evaluation["id"])
+    
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+    
+    async def wait_for_change(self, evaluation_id: str, timeout: float):
+        """Wait until this process updates the job, or the timeout passes (another process may own it)"""
+        event = self._changes.setdefault(evaluation_id, asyncio.Event())
+        self._waiters[evaluation_id] = self._waiters.get(evaluation_id, 0) + 1
+        try:
+            await asyncio.wait_for(event.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            # Drop the entry with its last waiter; finished or unknown jobs never fire it
+            remaining = self._waiters.pop(evaluation_id) - 1
+            if remaining:
+                self._waiters[evaluation_id] = remaining
+            else:
+                self._changes.pop(evaluation_id, None)
+    
+    async def _update(self, evaluation_id: str, fields: Dict[str, Any]):
+        await db.evaluations.update_one(
+            {"id": evaluation_id, "status": {"$ne": EvaluationStatus.COMPLETED.value}},
+            {"$set": {**fields, "updated_at": datetime.utcnow()}}
+        )
+        event = self._changes.pop(evaluation_id, None)
+        if event:
+            event.set()
+    
+    async def _worker(self):
+        while True:
+            evaluation_id = await self.queue.get()
+            try:
+                await self.process(evaluation_id)
+            except Exception as e:
+                logger.error(f"Evaluation pipeline error for {evaluation_id}: {e}")
+            finally:
+                self.queue.task_done()
     
+    async def process(self, evaluation_id: str):
+        evaluation = await db.evaluations.find_one({"id": evaluation_id}, {"_id": 0})
+        if not evaluation or evaluation.get("status") in EVALUATION_TERMINAL_STATUSES:
+            return
+        
+        answer_blobs = evaluation["answer_blobs"]
+        progress = {"pages": len(answer_blobs), "pages_done": 0}
+        try:
+            await self._update(evaluation_id, {"status": EvaluationStatus.OCR.value, "progress": progress})
+            
+            async def pages_done(count: int):
+                progress["pages_done"] += count
+                await self._update(evaluation_id, {"progress": progress})
+            
+            # Uncached pages go through PaddleOCR in batched predict calls, one batch per pool worker
+            ocr_pages = [
+                text or "No text found in the image."
+                for text in await ocr_pages_for_pipeline([blob_store.path(blob["sha256"]) for blob in answer_blobs], pages_done)
+            ]
+            ocr_text = stitch_answer_pages(ocr_pages)
+            await self._update(evaluation_id, {
+                "status": EvaluationStatus.EVALUATING.value, "ocr_text": ocr_text, "ocr_pages": ocr_pages
+            })
+            
+            if not await model_manager.wait_until_available("llm"):
+                raise RuntimeError("LLM is not available")
+            suggestions, rubric = await grade_answer(evaluation["question"], ocr_text)
+            await self._update(evaluation_id, {
+                "status": EvaluationStatus.COMPLETED.value,
+                "score": sum(rubric.values()),
+                "rubric": rubric,
+                "suggestions": suggestions,
+                "completed_at": datetime.utcnow()
+            })
+        except Exception as e:
+            logger.error(f"Failed to evaluate answer {evaluation_id}: {e}")
+            await self._update(evaluation_id, {"status": EvaluationStatus.FAILED.value, "error": str(e)})
+
+evaluation_pipeline = EvaluationPipeline(EVALUATION_WORKERS)
+
+# Answer Evaluation Endpoints
+@api_router.post("/evaluation/answer", status_code=202)
+async def evaluate_answer(request: EvaluationRequest, http_request: Request, user_id: str = "mock_user"):
+    """Queue evaluation of a mains answer of one or more pages; poll the returned job for the result"""
+    pages = request.answer_images or ([request.answer_image] if request.answer_image else [])
+    check_answer_page_count(len(pages))
+    decoded = [decode_upload(page) for page in pages]
+    answer_blobs = await asyncio.gather(*(blob_store.put(data, content_type) for data, content_type in decoded))
+    return await submit_evaluation(request.question, list(answer_blobs), user_id, http_request.headers.get("idempotency-key"))
+
+@api_router.post("/evaluation/answer/upload", status_code=202)
+async def evaluate_answer_upload(http_request: Request, user_id: str = "mock_user"):
+    """Queue evaluation of a mains answer sent as a multipart upload: a question field and one files part
+    per page in order"""
+    fields, answer_blobs = await read_multipart_upload(http_request, "files", ANSWER_UPLOAD_MAX_BYTES, ANSWER_MAX_PAGES)
+    try:
+        check_answer_page_count(len(answer_blobs))
+        if not fields.get("question"):
+            raise HTTPException(status_code=400, detail="question is required")
+    except HTTPException:
+        await release_blobs(answer_blobs)
+        raise
+    return await submit_evaluation(fields["question"], answer_blobs, user_id, http_request.headers.get("idempotency-key"))
+
+async def submit_evaluation(
+    question: str, answer_blobs: List[Dict[str, Any]], user_id: str, idempotency_header: Optional[str]
+) -> Dict[str, Any]:
+    """Create a queued evaluation job, or return the existing job for a repeated submission"""
+    idempotency_key = evaluation_idempotency_key(question, answer_blobs, idempotency_header)
     evaluation_data = {
         "id": str(uuid.uuid4()),
         "user_id": user_id,
-        "question": request.question,
-        "answer_image": request.answer_image,
-        "ocr_text": ocr_text,
-        "score": total_score,
-        "rubric": rubric,
-        "suggestions": ai_evaluation,
+        "idempotency_key": idempotency_key,
+        "question": question,
+        "answer_blobs": answer_blobs,
+        "status": EvaluationStatus.QUEUED.value,
+        "progress": {"pages": len(answer_blobs), "pages_done": 0},
         "created_at": datetime.utcnow()
     }
+    try:
+        await db.evaluations.insert_one(evaluation_data)
+    except DuplicateKeyError:
+        # A retry of an earlier submission; the blobs it just stored are already referenced by that job
+        for blob in answer_blobs:
+            await blob_store.release(blob["sha256"])
+        existing = await db.evaluations.find_one_and_update(
+            {"user_id": user_id, "idempotency_key": idempotency_key, "status": EvaluationStatus.FAILED.value},
+            {"$set": {"status": EvaluationStatus.QUEUED.value}, "$unset": {"error": ""}},
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER
+        )
+        if existing:
+            evaluation_pipeline.submit(existing["id"])
+        else:
+            existing = await db.evaluations.find_one({"user_id": user_id, "idempotency_key": idempotency_key}, {"_id": 0})
+        return MongoJSONResponse(existing, status_code=202)
+    
+    evaluation_pipeline.submit(evaluation_data["id"])
+    return MongoJSONResponse(evaluation_data, status_code=202)
+
+@api_router.get("/evaluation/{evaluation_id}")
+async def get_evaluation(evaluation_id: str, user_id: str = "mock_user"):
+    """Get an evaluation job: its status and progress, and the result once completed"""
+    evaluation = await db.evaluations.find_one({"id": evaluation_id, "user_id": user_id}, {"_id": 0})
+    if not evaluation:
+        raise HTTPException(status_code=404, detail="Evaluation not found")
+    return MongoJSONResponse(evaluation)
+
+@api_router.get("/evaluation/{evaluation_id}/events")
+async def stream_evaluation_events(evaluation_id: str, user_id: str = "mock_user"):
+    """Stream an evaluation job's progress as Server-Sent Events, ending with the full result"""
+    if not await db.evaluations.find_one({"id": evaluation_id, "user_id": user_id}, {"_id": 0, "id": 1}):
+        raise HTTPException(status_code=404, detail="Evaluation not found")
     
-    await db.evaluations.insert_one(evaluation_data)
+    async def event_stream():
+        last_progress = None
+        while True:
+            progress = await db.evaluations.find_one({"id": evaluation_id}, EVALUATION_PROGRESS_PROJECTION)
+            if progress != last_progress:
+                yield f"event: progress\ndata: {dump_json(progress).decode()}\n\n"
+                last_progress = progress
+            if progress["status"] in EVALUATION_TERMINAL_STATUSES:
+                evaluation = await db.evaluations.find_one({"id": evaluation_id}, {"_id": 0})
+                yield f"event: done\ndata: {dump_json(evaluation).decode()}\n\n"
+                return
+            await evaluation_pipeline.wait_for_change(evaluation_id, EVALUATION_EVENTS_POLL_SECONDS)
     
-    return serialize_doc(evaluation_data)
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@api_router.get("/evaluation/{evaluation_id}/image")
+async def download_answer_image(evaluation_id: str, request: Request, page: int = 1, user_id: str = "mock_user"):
+    """Stream one page (1-based) of an evaluation's answer photos; supports Range requests"""
+    evaluation = await db.evaluations.find_one(
+        {"id": evaluation_id, "user_id": user_id}, {"_id": 0, "answer_blobs": 1}
+    )
+    if not evaluation:
+        raise HTTPException(status_code=404, detail="Evaluation not found")
+    answer_blobs = evaluation.get("answer_blobs") or []
+    blob = answer_blobs[page - 1] if 1 <= page <= len(answer_blobs) else None
+    return await blob_response(blob, request)
 
 # Analytics Endpoints
+async def get_dashboard_rollups(user_id: str, week_start: str, today: str) -> List[Dict[str, Any]]:
+    return await db.analytics_rollups.find(
+        {"user_id": user_id, "$or": [
+            {"scope": {"$in": ["user", "subject"]}},
+            {"scope": "day", "key": {"$gte": week_start, "$lte": today}}
+        ]},
+        {"_id": 0, "scope": 1, "key": 1, "total": 1, "completed": 1, "minutes": 1}
+    ).to_list(length=None)
+
 @api_router.get("/analytics/dashboard")
 async def get_analytics_dashboard(user_id: str = "mock_user"):
     """Get analytics dashboard data"""
-    # Get profile for basic stats
-    profile = await db.profiles.find_one({"user_id": user_id})
+    today = datetime.now().date()
+    week_days = [(today - timedelta(days=offset)).isoformat() for offset in range(6, -1, -1)]
     
-    # Get recent study logs
-    recent_items_cursor = db.plan_items.find({
-        "user_id": user_id,
-        "status": PlanItemStatus.DONE.value
-    }).sort("created_at", -1).limit(30)
-    
-    recent_items = await recent_items_cursor.to_list(length=30)
-    
-    # Calculate stats
-    total_minutes = sum(item.get("actual_minutes", 0) for item in recent_items)
-    all_items_cursor = db.plan_items.find({"user_id": user_id})
-    all_items = await all_items_cursor.to_list(length=1000)
-    completion_rate = len([item for item in all_items if item.get("status") == "done"]) / max(len(all_items), 1) * 100
-    
-    # Subject-wise breakdown
-    subject_stats = {}
-    for item in recent_items:
-        subject = item.get("subject", "unknown")
-        if subject not in subject_stats:
-            subject_stats[subject] = {"minutes": 0, "completed": 0, "total": 0}
-        subject_stats[subject]["minutes"] += item.get("actual_minutes", 0)
-        subject_stats[subject]["total"] += 1
-        if item.get("status") == "done":
-            subject_stats[subject]["completed"] += 1
+    profile, rollups = await asyncio.gather(
+        db.profiles.find_one({"user_id": user_id}, {"_id": 0, "streak_count": 1}),
+        get_dashboard_rollups(user_id, week_days[0], week_days[-1])
+    )
+    if not any(rollup["scope"] == "user" for rollup in rollups):
+        # No rollups yet (e.g. plan created before rollups existed); build them once
+        await rebuild_analytics_rollups(user_id)
+        rollups = await get_dashboard_rollups(user_id, week_days[0], week_days[-1])
+    
+    totals = next((rollup for rollup in rollups if rollup["scope"] == "user"), {})
+    completion_rate = totals.get("completed", 0) / max(totals.get("total", 0), 1) * 100
+    
+    subject_stats = {
+        rollup["key"]: {
+            "minutes": rollup.get("minutes", 0),
+            "completed": rollup.get("completed", 0),
+            "total": rollup.get("total", 0)
+        }
+        for rollup in rollups if rollup["scope"] == "subject" and rollup.get("total", 0) > 0
+    }
+    
+    minutes_by_day = {rollup["key"]: rollup.get("minutes", 0) for rollup in rollups if rollup["scope"] == "day"}
     
     return {
-        "total_study_minutes": total_minutes,
-        "streak_count": serialize_doc(profile).get("streak_count", 0) if profile else 0,
+        "total_study_minutes": totals.get("minutes", 0),
+        "streak_count": profile.get("streak_count", 0) if profile else 0,
         "completion_rate": completion_rate,
         "subject_stats": subject_stats,
-        "weekly_minutes": [total_minutes // 7] * 7  # Mock weekly data
+        "weekly_minutes": [minutes_by_day.get(day, 0) for day in week_days]
+    }
+
+# LLM Cache Endpoints
+@api_router.get("/llm/cache/stats")
+async def get_llm_cache_stats():
+    """Get LLM response cache hit/miss counters"""
+    lookups = llm_cache_stats["memory_hits"] + llm_cache_stats["mongo_hits"] + llm_cache_stats["misses"]
+    hits = llm_cache_stats["memory_hits"] + llm_cache_stats["mongo_hits"]
+    return {
+        **llm_cache_stats,
+        "enabled": LLM_CACHE_ENABLED,
+        "memory_entries": len(llm_response_cache),
+        "hit_rate": hits / lookups if lookups else 0.0
+    }
+
+@api_router.get("/ocr/cache/stats")
+async def get_ocr_cache_stats():
+    """Get OCR result cache hit/miss counters"""
+    hits = sum(ocr_cache_stats[key] for key in ("memory_hits", "file_hits", "pixel_hits", "near_hits"))
+    lookups = hits + ocr_cache_stats["misses"]
+    return {
+        **ocr_cache_stats,
+        "enabled": OCR_CACHE_ENABLED,
+        "engine": OCR_ENGINE_VERSION,
+        "memory_entries": len(ocr_result_cache),
+        "hit_rate": hits / lookups if lookups else 0.0
     }
 
+@api_router.get("/ocr/stats")
+async def get_ocr_stats():
+    """Get the OCR pre-processing configuration and mean time per step"""
+    return {
+        "preprocess_steps": ocr_worker.OCR_PREPROCESS_STEPS,
+        "target_long_edge": ocr_worker.OCR_TARGET_LONG_EDGE,
+        "steps": {
+            step: {"count": stats["count"], "mean_ms": round(stats["total_ms"] / stats["count"], 1)}
+            for step, stats in ocr_step_stats.items()
+        }
+    }
+
+# Health Endpoints
+@api_router.get("/health/ready")
+async def readiness_probe():
+    """Readiness probe with per-model load state"""
+    ready = model_manager.is_ready()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"ready": ready, "models": model_manager.status()}
+    )
+
 # Root endpoint
 @api_router.get("/")
 async def root():
@@ -761,8 +3932,8 @@ async def root():
         "message": "UPSC AI Companion API is running", 
         "version": "1.0.0",
         "features": {
-            "ollama_ai": OLLAMA_AVAILABLE,
-            "paddle_ocr": OCR_AVAILABLE,
+            "ollama_ai": model_manager.is_available("llm"),
+            "paddle_ocr": model_manager.is_available("ocr"),
             "mongodb": True
         }
     }
@@ -770,10 +3941,84 @@ async def root():
 # Include router
 app.include_router(api_router)
 
+@app.exception_handler(OCRBusyError)
+async def ocr_busy_handler(request: Request, exc: OCRBusyError):
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "5"})
+
+@app.on_event("startup")
+async def start_model_manager():
+    # Models load in the background so uvicorn binds immediately; see /api/health/ready
+    model_manager.start()
+
+@app.on_event("startup")
+async def startup_indexes():
+    await ensure_indexes()
+    if DEV_MODE:
+        unindexed_query_listener.loop = asyncio.get_running_loop()
+    await detect_transaction_support()
+    await purge_stale_ocr_cache()
+
+@app.on_event("startup")
+async def start_resource_pipeline():
+    await resource_pipeline.start()
+
+@app.on_event("startup")
+async def start_evaluation_pipeline():
+    await evaluation_pipeline.start()
+
+@app.on_event("startup")
+async def start_mcq_pool_filler():
+    await mcq_pool_filler.start()
+
+@app.on_event("startup")
+async def start_daily_dose_scheduler():
+    daily_dose_scheduler.start()
+
+@app.on_event("shutdown")
+async def stop_daily_dose_scheduler():
+    await daily_dose_scheduler.stop()
+
+@app.on_event("shutdown")
+async def stop_mcq_pool_filler():
+    await mcq_pool_filler.stop()
+
+@app.on_event("shutdown")
+async def stop_evaluation_pipeline():
+    await evaluation_pipeline.stop()
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
     client.close()
 
+@app.on_event("shutdown")
+async def stop_resource_pipeline():
+    await resource_pipeline.stop()
+    pdf_executor.shutdown(wait=False)
+
+@app.on_event("shutdown")
+async def shutdown_ocr_pool():
+    await model_manager.stop()
+    if ocr_executor is not None:
+        ocr_executor.shutdown(wait=False, cancel_futures=True)
+
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8001)
+    import sys
+    if len(sys.argv) > 1 and sys.argv[1] == "rebuild-rollups":
+        # python server.py rebuild-rollups [user_id ...]
+        asyncio.run(rebuild_all_analytics_rollups(sys.argv[2:]))
+    elif len(sys.argv) > 1 and sys.argv[1] == "backfill-chat-seq":
+        # python server.py backfill-chat-seq
+        asyncio.run(backfill_chat_sequences())
+    elif len(sys.argv) > 1 and sys.argv[1] == "migrate-blobs":
+        # python server.py migrate-blobs
+        asyncio.run(migrate_inline_blobs())
+    elif len(sys.argv) > 1 and sys.argv[1] == "build-doses":
+        # python server.py build-doses [YYYY-MM-DD]
+        if not asyncio.run(build_daily_doses_once(sys.argv[2] if len(sys.argv) > 2 else None)):
+            sys.exit(1)
+    elif len(sys.argv) > 1 and sys.argv[1] == "rebuild-search":
+        # python server.py rebuild-search [user_id ...]
+        asyncio.run(rebuild_all_search_indexes(sys.argv[2:]))
+    else:
+        import uvicorn
+        uvicorn.run(app, host="0.0.0.0", port=8001)
@@ -0,0 +1,270 @@
+"""On-disk IVF vector index over memory-mapped numpy arrays.
+
+Each index lives in its own directory:
+
+    manifest.json        current base/delta files and tombstoned chunk ids
+    base-<id>/           clustered segment: centroids, vectors sorted by list, list offsets, ids
+    delta-<id>.npz       small unclustered segment of recently added vectors
+
+Searches probe the nearest inverted lists of the base segment (memory-mapped,
+so only the probed lists are paged in) and brute-force the delta segment.
+Once the delta or the tombstones grow past a fraction of the base, everything
+is re-clustered into a new base segment. The manifest is swapped atomically,
+so a reader never sees a half-written index.
+"""
+from pathlib import Path
+from typing import List, Optional, Tuple
+import json
+import math
+import os
+import shutil
+import uuid
+import numpy as np
+
+MANIFEST = "manifest.json"
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """L2-normalize rows so inner product equals cosine similarity"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+def train_kmeans(vectors: np.ndarray, n_clusters: int, iterations: int = 8,
+                 sample_size: int = 50000, seed: int = 0) -> np.ndarray:
+    """Spherical k-means on a sample of the vectors; returns normalized centroids"""
+    rng = np.random.default_rng(seed)
+    if len(vectors) > sample_size:
+        sample = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+    else:
+        sample = vectors
+    centroids = sample[rng.choice(len(sample), n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = assign_clusters(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, sample)
+        counts = np.bincount(assignments, minlength=n_clusters)
+        empty = counts == 0
+        if empty.any():
+            # Re-seed empty clusters with random points so every list stays useful
+            sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+        centroids = normalize_rows(sums)
+    return centroids
+
+def assign_clusters(vectors: np.ndarray, centroids: np.ndarray, batch_size: int = 8192) -> np.ndarray:
+    """Index of the most similar centroid for every vector"""
+    assignments = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), batch_size):
+        batch = np.asarray(vectors[start:start + batch_size], dtype=np.float32)
+        assignments[start:start + batch_size] = np.argmax(batch @ centroids.T, axis=1)
+    return assignments
+
+class _Snapshot:
+    """Arrays of one manifest version; searches read a single snapshot so writers can swap freely"""
+
+    def __init__(self, dim: Optional[int] = None):
+        self.dim = dim
+        self.centroids: Optional[np.ndarray] = None
+        self.offsets: Optional[np.ndarray] = None
+        self.vectors: Optional[np.ndarray] = None
+        self.chunk_ids: Optional[np.ndarray] = None
+        self.resource_ids: Optional[np.ndarray] = None
+        self.delta_vectors = np.zeros((0, dim or 0), dtype=np.float32)
+        self.delta_chunk_ids = np.zeros(0, dtype="<U64")
+        self.delta_resource_ids = np.zeros(0, dtype="<U64")
+        self.deleted_chunks = frozenset()
+        # Tombstone masks by position, computed once per load so searches never compare ids
+        self.base_dead: Optional[np.ndarray] = None
+        self.delta_dead: Optional[np.ndarray] = None
+
+    @property
+    def base_count(self) -> int:
+        return 0 if self.vectors is None else len(self.vectors)
+
+class VectorIndex:
+    """Inverted-file (IVF) index of chunk embeddings stored under one directory"""
+
+    def __init__(self, path: Path, rebuild_min: int = 2048, rebuild_ratio: float = 0.1, nprobe: int = 64):
+        self.path = Path(path)
+        self.rebuild_min = rebuild_min
+        self.rebuild_ratio = rebuild_ratio
+        self.nprobe = nprobe
+        self.manifest = {"version": 0, "dim": None, "base": None, "delta": None, "deleted_chunks": []}
+        self._snapshot = _Snapshot()
+        self.load()
+
+    def __len__(self) -> int:
+        snapshot = self._snapshot
+        return snapshot.base_count + len(snapshot.delta_vectors) - len(snapshot.deleted_chunks)
+
+    def load(self):
+        manifest_path = self.path / MANIFEST
+        if not manifest_path.exists():
+            return
+        self.manifest = json.loads(manifest_path.read_text())
+        snapshot = _Snapshot(self.manifest["dim"])
+        if self.manifest["base"]:
+            base_dir = self.path / self.manifest["base"]
+            snapshot.centroids = np.load(base_dir / "centroids.npy")
+            snapshot.offsets = np.load(base_dir / "offsets.npy")
+            snapshot.vectors = np.load(base_dir / "vectors.npy", mmap_mode="r")
+            snapshot.chunk_ids = np.load(base_dir / "chunk_ids.npy", mmap_mode="r")
+            snapshot.resource_ids = np.load(base_dir / "resource_ids.npy", mmap_mode="r")
+        if self.manifest["delta"]:
+            with np.load(self.path / self.manifest["delta"]) as delta:
+                snapshot.delta_vectors = delta["vectors"]
+                snapshot.delta_chunk_ids = delta["chunk_ids"]
+                snapshot.delta_resource_ids = delta["resource_ids"]
+        snapshot.deleted_chunks = frozenset(self.manifest["deleted_chunks"])
+        if snapshot.deleted_chunks:
+            deleted = list(snapshot.deleted_chunks)
+            if snapshot.base_count:
+                snapshot.base_dead = np.isin(snapshot.chunk_ids, deleted)
+            snapshot.delta_dead = np.isin(snapshot.delta_chunk_ids, deleted)
+        self._snapshot = snapshot
+
+    def search(self, query: np.ndarray, k: int = 5, nprobe: Optional[int] = None) -> List[Tuple[str, str, float]]:
+        """Top-k (chunk_id, resource_id, cosine similarity) for a query embedding"""
+        snapshot = self._snapshot
+        query = normalize_rows(query.reshape(1, -1))[0]
+        base_count = snapshot.base_count
+        scores, positions = [], []
+
+        if base_count:
+            centroid_scores = snapshot.centroids @ query
+            nprobe = min(nprobe or self.nprobe, len(centroid_scores))
+            probes = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+            for probe in probes:
+                start, end = int(snapshot.offsets[probe]), int(snapshot.offsets[probe + 1])
+                if end > start:
+                    # Lists are contiguous on disk, so each probe is one sequential read
+                    list_scores = snapshot.vectors[start:end] @ query
+                    if snapshot.base_dead is not None:
+                        list_scores[snapshot.base_dead[start:end]] = -np.inf
+                    scores.append(list_scores)
+                    positions.append(np.arange(start, end))
+
+        if len(snapshot.delta_vectors):
+            delta_scores = snapshot.delta_vectors @ query
+            if snapshot.delta_dead is not None:
+                delta_scores[snapshot.delta_dead] = -np.inf
+            scores.append(delta_scores)
+            positions.append(np.arange(base_count, base_count + len(delta_scores)))
+
+        if not scores:
+            return []
+        scores = np.concatenate(scores)
+        positions = np.concatenate(positions)
+
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        results = []
+        for i in top:
+            if scores[i] == -np.inf:
+                break
+            position = int(positions[i])
+            if position < base_count:
+                chunk_id, resource_id = snapshot.chunk_ids[position], snapshot.resource_ids[position]
+            else:
+                chunk_id = snapshot.delta_chunk_ids[position - base_count]
+                resource_id = snapshot.delta_resource_ids[position - base_count]
+            results.append((str(chunk_id), str(resource_id), float(scores[i])))
+        return results
+
+    def add(self, chunk_ids: List[str], resource_ids: List[str], vectors: np.ndarray):
+        """Add embeddings to the delta segment, re-clustering when it has grown too large"""
+        if not len(chunk_ids):
+            return
+        snapshot = self._snapshot
+        vectors = normalize_rows(vectors)
+        dim = snapshot.dim or vectors.shape[1]
+        if vectors.shape[1] != dim:
+            raise ValueError(f"Embedding dimension {vectors.shape[1]} does not match index dimension {dim}")
+
+        delta_vectors = np.concatenate([snapshot.delta_vectors.reshape(-1, dim), vectors])
+        delta_chunk_ids = np.concatenate([snapshot.delta_chunk_ids, np.asarray(chunk_ids, dtype="<U64")])
+        delta_resource_ids = np.concatenate([snapshot.delta_resource_ids, np.asarray(resource_ids, dtype="<U64")])
+
+        if len(delta_vectors) >= max(self.rebuild_min, self.rebuild_ratio * snapshot.base_count):
+            self._rebuild(dim, delta_vectors, delta_chunk_ids, delta_resource_ids)
+        else:
+            delta_name = self._write_delta(delta_vectors, delta_chunk_ids, delta_resource_ids)
+            self._commit({**self.manifest, "dim": dim, "delta": delta_name})
+
+    def remove_resource(self, resource_id: str):
+        """Tombstone every chunk of a resource; space is reclaimed by the next re-cluster"""
+        snapshot = self._snapshot
+        removed = set()
+        if snapshot.base_count:
+            removed.update(snapshot.chunk_ids[np.asarray(snapshot.resource_ids) == resource_id].tolist())
+        if len(snapshot.delta_vectors):
+            removed.update(snapshot.delta_chunk_ids[snapshot.delta_resource_ids == resource_id].tolist())
+        removed -= snapshot.deleted_chunks
+        if not removed:
+            return
+        deleted = sorted(snapshot.deleted_chunks | removed)
+        if len(deleted) >= max(self.rebuild_min, self.rebuild_ratio * snapshot.base_count):
+            self._commit({**self.manifest, "deleted_chunks": deleted})
+            self._rebuild(snapshot.dim, snapshot.delta_vectors, snapshot.delta_chunk_ids, snapshot.delta_resource_ids)
+        else:
+            self._commit({**self.manifest, "deleted_chunks": deleted})
+
+    def _rebuild(self, dim: int, delta_vectors: np.ndarray, delta_chunk_ids: np.ndarray, delta_resource_ids: np.ndarray):
+        """Merge base and delta, drop tombstones and re-cluster into a new base segment"""
+        snapshot = self._snapshot
+        deleted = snapshot.deleted_chunks
+        parts = [(delta_vectors, delta_chunk_ids, delta_resource_ids)]
+        if snapshot.base_count:
+            parts.insert(0, (np.asarray(snapshot.vectors), np.asarray(snapshot.chunk_ids), np.asarray(snapshot.resource_ids)))
+        vectors = np.concatenate([p[0].reshape(-1, dim) for p in parts])
+        chunk_ids = np.concatenate([p[1] for p in parts]).astype("<U64")
+        resource_ids = np.concatenate([p[2] for p in parts]).astype("<U64")
+        if deleted:
+            live = ~np.isin(chunk_ids, list(deleted))
+            vectors, chunk_ids, resource_ids = vectors[live], chunk_ids[live], resource_ids[live]
+
+        if not len(vectors):
+            self._commit({**self.manifest, "dim": dim, "base": None, "delta": None, "deleted_chunks": []})
+            return
+
+        n_lists = max(1, min(int(math.sqrt(len(vectors))), len(vectors)))
+        centroids = train_kmeans(vectors, n_lists)
+        assignments = assign_clusters(vectors, centroids)
+        order = np.argsort(assignments, kind="stable")
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(assignments, minlength=n_lists))]).astype(np.int64)
+
+        base_name = f"base-{uuid.uuid4().hex}"
+        base_dir = self.path / base_name
+        base_dir.mkdir(parents=True)
+        np.save(base_dir / "centroids.npy", centroids)
+        np.save(base_dir / "offsets.npy", offsets)
+        np.save(base_dir / "vectors.npy", np.ascontiguousarray(vectors[order]))
+        np.save(base_dir / "chunk_ids.npy", chunk_ids[order])
+        np.save(base_dir / "resource_ids.npy", resource_ids[order])
+        self._commit({**self.manifest, "dim": dim, "base": base_name, "delta": None, "deleted_chunks": []})
+
+    def _write_delta(self, vectors: np.ndarray, chunk_ids: np.ndarray, resource_ids: np.ndarray) -> str:
+        self.path.mkdir(parents=True, exist_ok=True)
+        delta_name = f"delta-{uuid.uuid4().hex}.npz"
+        np.savez(self.path / delta_name, vectors=vectors, chunk_ids=chunk_ids, resource_ids=resource_ids)
+        return delta_name
+
+    def _commit(self, manifest: dict):
+        """Atomically publish a new manifest, reload, and delete files it no longer references"""
+        self.path.mkdir(parents=True, exist_ok=True)
+        previous = self.manifest
+        manifest = {**manifest, "version": previous["version"] + 1}
+        tmp_path = self.path / f"{MANIFEST}.tmp"
+        tmp_path.write_text(json.dumps(manifest))
+        os.replace(tmp_path, self.path / MANIFEST)
+        self.load()
+
+        # Open memmaps of removed files stay readable until released, so in-flight searches are unaffected
+        for key in ("base", "delta"):
+            old = previous.get(key)
+            if old and old != manifest.get(key):
+                old_path = self.path / old
+                if old_path.is_dir():
+                    shutil.rmtree(old_path, ignore_errors=True)
+                elif old_path.exists():
+                    old_path.unlink()
@@ -352,15 +352,30 @@ class UPSCBackendTester:
             response = self.session.post(f"{BACKEND_URL}/evaluation/answer?user_id={self.user_id}", 
                                        json=evaluation_request)
             
-            if response.status_code == 200:
+            if response.status_code == 202:
+                # Evaluation runs as a background job; poll it until it finishes
+                evaluation_id = response.json()["id"]
                 data = response.json()
-                if all(key in data for key in ["score", "rubric", "suggestions", "ocr_text"]):
-                    score = data["score"]
-                    self.log_test("Answer Evaluation", True, 
-                                f"Answer evaluated with score: {score}")
+                for _ in range(60):
+                    if data["status"] in ("completed", "failed"):
+                        break
+                    time.sleep(2)
+                    data = self.session.get(f"{BACKEND_URL}/evaluation/{evaluation_id}?user_id={self.user_id}").json()
+                
+                if data["status"] == "completed":
+                    if all(key in data for key in ["score", "rubric", "suggestions", "ocr_text"]):
+                        score = data["score"]
+                        self.log_test("Answer Evaluation", True, 
+                                    f"Answer evaluated with score: {score}")
+                    else:
+                        self.log_test("Answer Evaluation", False, 
+                                    "Missing required fields in evaluation response")
+                elif data["status"] == "failed":
+                    self.log_test("Answer Evaluation", False, 
+                                f"Evaluation job failed: {data.get('error')}")
                 else:
                     self.log_test("Answer Evaluation", False, 
-                                "Missing required fields in evaluation response")
+                                f"Evaluation job still {data['status']} after 120s")
             else:
                 self.log_test("Answer Evaluation", False, 
                             f"Status: {response.status_code}, Response: {response.text}")
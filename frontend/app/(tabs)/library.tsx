@@ -1,4 +1,4 @@
-import { View, Text, TouchableOpacity, ScrollView, StyleSheet, Alert } from 'react-native';
+import { View, Text, TouchableOpacity, FlatList, StyleSheet, Alert } from 'react-native';
 import { SafeAreaView } from 'react-native-safe-area-context';
 import { StatusBar } from 'expo-status-bar';
 import { useState, useEffect } from 'react';
@@ -19,19 +19,30 @@ interface Resource {
   url?: string;
 }
 
+const PAGE_SIZE = 20;
+
 export default function LibraryScreen() {
   const router = useRouter();
   const [resources, setResources] = useState<Resource[]>([]);
   const [isLoading, setIsLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
   
   useEffect(() => {
     loadResources();
   }, []);
   
+  const fetchPage = async (after: string | null) => {
+    const response = await apiClient.get('/resources', {
+      params: { limit: PAGE_SIZE, ...(after ? { after } : {}) },
+    });
+    setNextCursor(response.data.next_cursor || null);
+    return (response.data.resources || []) as Resource[];
+  };
+  
   const loadResources = async () => {
     try {
-      const response = await apiClient.get('/resources');
-      setResources(response.data.resources || []);
+      setResources(await fetchPage(null));
     } catch (error) {
       console.error('Error loading resources:', error);
       // Mock data for demo
@@ -64,6 +75,20 @@ export default function LibraryScreen() {
     }
   };
   
+  // Further pages load as the list nears its end instead of all up front
+  const loadMoreResources = async () => {
+    if (!nextCursor || isLoadingMore) return;
+    setIsLoadingMore(true);
+    try {
+      const page = await fetchPage(nextCursor);
+      setResources(prev => [...prev, ...page]);
+    } catch (error) {
+      console.error('Error loading more resources:', error);
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
+  
   const handleAddResource = () => {
     Alert.alert(
       'Add Resource',
@@ -219,127 +244,140 @@ export default function LibraryScreen() {
         </TouchableOpacity>
       </View>
       
-      <ScrollView style={styles.content} showsVerticalScrollIndicator={false}>
-        {/* Quick Stats */}
-        <Card style={styles.statsCard}>
-          <View style={styles.statsContent}>
-            <View style={styles.statItem}>
-              <Text style={styles.statValue}>{resources.length}</Text>
-              <Text style={styles.statLabel}>Resources</Text>
-            </View>
-            <View style={styles.statItem}>
-              <Text style={styles.statValue}>{resources.filter(r => r.status === 'indexed').length}</Text>
-              <Text style={styles.statLabel}>Indexed</Text>
-            </View>
-            <View style={styles.statItem}>
-              <Text style={styles.statValue}>{resources.filter(r => r.kind === 'pdf').length}</Text>
-              <Text style={styles.statLabel}>Documents</Text>
-            </View>
-            <View style={styles.statItem}>
-              <Text style={styles.statValue}>{resources.filter(r => r.kind === 'image').length}</Text>
-              <Text style={styles.statLabel}>Images</Text>
-            </View>
-          </View>
-        </Card>
-        
-        {/* Resources List */}
-        <View style={styles.section}>
-          <View style={styles.sectionHeader}>
-            <Text style={styles.sectionTitle}>Your Resources</Text>
-            <Text style={styles.sectionCount}>{resources.length} items</Text>
-          </View>
-          
-          {isLoading ? (
-            <Card style={styles.loadingCard}>
-              <Text style={styles.loadingText}>Loading resources...</Text>
+      <FlatList
+        style={styles.content}
+        showsVerticalScrollIndicator={false}
+        data={isLoading ? [] : resources}
+        keyExtractor={(resource) => resource.id}
+        onEndReached={loadMoreResources}
+        onEndReachedThreshold={0.5}
+        ListHeaderComponent={
+          <>
+            {/* Quick Stats */}
+            <Card style={styles.statsCard}>
+              <View style={styles.statsContent}>
+                <View style={styles.statItem}>
+                  <Text style={styles.statValue}>{resources.length}{nextCursor ? '+' : ''}</Text>
+                  <Text style={styles.statLabel}>Resources</Text>
+                </View>
+                <View style={styles.statItem}>
+                  <Text style={styles.statValue}>{resources.filter(r => r.status === 'indexed').length}</Text>
+                  <Text style={styles.statLabel}>Indexed</Text>
+                </View>
+                <View style={styles.statItem}>
+                  <Text style={styles.statValue}>{resources.filter(r => r.kind === 'pdf').length}</Text>
+                  <Text style={styles.statLabel}>Documents</Text>
+                </View>
+                <View style={styles.statItem}>
+                  <Text style={styles.statValue}>{resources.filter(r => r.kind === 'image').length}</Text>
+                  <Text style={styles.statLabel}>Images</Text>
+                </View>
+              </View>
             </Card>
-          ) : resources.length === 0 ? (
-            <Card style={styles.emptyCard}>
-              <View style={styles.emptyContent}>
-                <Ionicons name="library-outline" size={48} color="#9ca3af" />
-                <Text style={styles.emptyTitle}>No resources yet</Text>
-                <Text style={styles.emptySubtitle}>Add your first study material to get started</Text>
+        
+            <View style={[styles.sectionHeader, styles.listHeader]}>
+              <Text style={styles.sectionTitle}>Your Resources</Text>
+              <Text style={styles.sectionCount}>{resources.length}{nextCursor ? '+' : ''} items</Text>
+            </View>
+          </>
+        }
+        ListEmptyComponent={
+          <View style={styles.section}>
+            {isLoading ? (
+              <Card style={styles.loadingCard}>
+                <Text style={styles.loadingText}>Loading resources...</Text>
+              </Card>
+            ) : (
+              <Card style={styles.emptyCard}>
+                <View style={styles.emptyContent}>
+                  <Ionicons name="library-outline" size={48} color="#9ca3af" />
+                  <Text style={styles.emptyTitle}>No resources yet</Text>
+                  <Text style={styles.emptySubtitle}>Add your first study material to get started</Text>
                 
-                <TouchableOpacity style={styles.emptyButton} onPress={handleAddResource}>
-                  <Ionicons name="add" size={20} color="white" />
-                  <Text style={styles.emptyButtonText}>Add Resource</Text>
-                </TouchableOpacity>
+                  <TouchableOpacity style={styles.emptyButton} onPress={handleAddResource}>
+                    <Ionicons name="add" size={20} color="white" />
+                    <Text style={styles.emptyButtonText}>Add Resource</Text>
+                  </TouchableOpacity>
+                </View>
+              </Card>
+            )}
+          </View>
+        }
+        renderItem={({ item: resource }) => (
+          <Card style={styles.resourceCard}>
+            <View style={styles.resourceContent}>
+              <View style={[styles.resourceIcon, { backgroundColor: `${getResourceColor(resource.kind)}20` }]}>
+                <Ionicons 
+                  name={getResourceIcon(resource.kind) as any} 
+                  size={24} 
+                  color={getResourceColor(resource.kind)} 
+                />
               </View>
-            </Card>
-          ) : (
-            resources.map((resource) => (
-              <Card key={resource.id} style={styles.resourceCard}>
-                <View style={styles.resourceContent}>
-                  <View style={[styles.resourceIcon, { backgroundColor: `${getResourceColor(resource.kind)}20` }]}>
-                    <Ionicons 
-                      name={getResourceIcon(resource.kind) as any} 
-                      size={24} 
-                      color={getResourceColor(resource.kind)} 
-                    />
-                  </View>
                   
-                  <View style={styles.resourceInfo}>
-                    <Text style={styles.resourceTitle} numberOfLines={2}>
-                      {resource.title}
-                    </Text>
-                    <Text style={styles.resourceMeta}>
-                      {resource.kind.toUpperCase()} • {new Date(resource.created_at).toLocaleDateString()}
-                    </Text>
+              <View style={styles.resourceInfo}>
+                <Text style={styles.resourceTitle} numberOfLines={2}>
+                  {resource.title}
+                </Text>
+                <Text style={styles.resourceMeta}>
+                  {resource.kind.toUpperCase()} • {new Date(resource.created_at).toLocaleDateString()}
+                </Text>
                     
-                    <View style={styles.resourceStatus}>
-                      <View style={[styles.statusBadge, { backgroundColor: getStatusColor(resource.status) }]}>
-                        <Text style={styles.statusText}>{resource.status.toUpperCase()}</Text>
-                      </View>
-                    </View>
+                <View style={styles.resourceStatus}>
+                  <View style={[styles.statusBadge, { backgroundColor: getStatusColor(resource.status) }]}>
+                    <Text style={styles.statusText}>{resource.status.toUpperCase()}</Text>
                   </View>
-                  
-                  <TouchableOpacity style={styles.resourceActions}>
-                    <Ionicons name="ellipsis-vertical" size={20} color="#6b7280" />
-                  </TouchableOpacity>
                 </View>
+              </View>
+                  
+              <TouchableOpacity style={styles.resourceActions}>
+                <Ionicons name="ellipsis-vertical" size={20} color="#6b7280" />
+              </TouchableOpacity>
+            </View>
                 
-                {/* Quick Actions */}
-                <View style={styles.quickResourceActions}>
-                  <TouchableOpacity style={styles.quickAction}>
-                    <Ionicons name="chatbubble" size={16} color="#3b82f6" />
-                    <Text style={styles.quickActionText}>Ask AI</Text>
-                  </TouchableOpacity>
+            {/* Quick Actions */}
+            <View style={styles.quickResourceActions}>
+              <TouchableOpacity style={styles.quickAction}>
+                <Ionicons name="chatbubble" size={16} color="#3b82f6" />
+                <Text style={styles.quickActionText}>Ask AI</Text>
+              </TouchableOpacity>
                   
-                  <TouchableOpacity style={styles.quickAction}>
-                    <Ionicons name="help-circle" size={16} color="#10b981" />
-                    <Text style={styles.quickActionText}>5 MCQs</Text>
-                  </TouchableOpacity>
+              <TouchableOpacity style={styles.quickAction}>
+                <Ionicons name="help-circle" size={16} color="#10b981" />
+                <Text style={styles.quickActionText}>5 MCQs</Text>
+              </TouchableOpacity>
                   
-                  <TouchableOpacity style={styles.quickAction}>
-                    <Ionicons name="flash" size={16} color="#f59e0b" />
-                    <Text style={styles.quickActionText}>Flashcards</Text>
-                  </TouchableOpacity>
+              <TouchableOpacity style={styles.quickAction}>
+                <Ionicons name="flash" size={16} color="#f59e0b" />
+                <Text style={styles.quickActionText}>Flashcards</Text>
+              </TouchableOpacity>
                   
-                  <TouchableOpacity style={styles.quickAction}>
-                    <Ionicons name="document-text" size={16} color="#8b5cf6" />
-                    <Text style={styles.quickActionText}>Summary</Text>
-                  </TouchableOpacity>
-                </View>
-              </Card>
-            ))
-          )}
-        </View>
-        
-        {/* Resource Tips */}
-        <Card style={styles.tipsCard}>
-          <View style={styles.tipsHeader}>
-            <Ionicons name="bulb" size={20} color="#f59e0b" />
-            <Text style={styles.tipsTitle}>Pro Tips</Text>
-          </View>
+              <TouchableOpacity style={styles.quickAction}>
+                <Ionicons name="document-text" size={16} color="#8b5cf6" />
+                <Text style={styles.quickActionText}>Summary</Text>
+              </TouchableOpacity>
+            </View>
+          </Card>
+        )}
+        ListFooterComponent={
+          <>
+            {isLoadingMore && <Text style={styles.loadingText}>Loading more...</Text>}
+            {/* Resource Tips */}
+            <Card style={styles.tipsCard}>
+              <View style={styles.tipsHeader}>
+                <Ionicons name="bulb" size={20} color="#f59e0b" />
+                <Text style={styles.tipsTitle}>Pro Tips</Text>
+              </View>
           
-          <View style={styles.tipsList}>
-            <Text style={styles.tipText}>• Upload PDFs for AI-powered question answering</Text>
-            <Text style={styles.tipText}>• Add images of handwritten notes for OCR processing</Text>
-            <Text style={styles.tipText}>• YouTube links are automatically transcribed</Text>
-            <Text style={styles.tipText}>• Generate MCQs and flashcards from any resource</Text>
-          </View>
-        </Card>
-      </ScrollView>
+              <View style={styles.tipsList}>
+                <Text style={styles.tipText}>• Upload PDFs for AI-powered question answering</Text>
+                <Text style={styles.tipText}>• Add images of handwritten notes for OCR processing</Text>
+                <Text style={styles.tipText}>• YouTube links are automatically transcribed</Text>
+                <Text style={styles.tipText}>• Generate MCQs and flashcards from any resource</Text>
+              </View>
+            </Card>
+          </>
+        }
+      />
     </SafeAreaView>
   );
 }
@@ -410,6 +448,9 @@ const styles = StyleSheet.create({
     paddingHorizontal: 16,
     marginBottom: 24,
   },
+  listHeader: {
+    paddingHorizontal: 16,
+  },
   sectionHeader: {
     flexDirection: 'row',
     alignItems: 'center',
@@ -466,6 +507,7 @@ const styles = StyleSheet.create({
   },
   resourceCard: {
     padding: 16,
+    marginHorizontal: 16,
     marginBottom: 12,
   },
   resourceContent: {
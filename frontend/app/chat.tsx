@@ -5,7 +5,7 @@ import { useState, useRef, useEffect } from 'react';
 import { useRouter } from 'expo-router';
 import { Ionicons } from '@expo/vector-icons';
 import { Card } from '../src/components/ui/Card';
-import { apiClient } from '../src/services/apiClient';
+import { postEventStream } from '../src/services/apiClient';
 
 interface Message {
   id: string;
@@ -57,33 +57,53 @@ export default function ChatScreen() {
     setInputText('');
     setIsLoading(true);
     
+    // The answer bubble appears with the first token and grows as the rest stream in
+    const assistantId = (Date.now() + 1).toString();
+    let received = false;
+    const appendToken = (token: string) => {
+      if (!received) {
+        received = true;
+        const assistantMessage: Message = {
+          id: assistantId,
+          role: 'assistant',
+          content: token,
+          timestamp: new Date(),
+          mode: currentMode
+        };
+        setMessages(prev => [...prev, assistantMessage]);
+      } else {
+        setMessages(prev => prev.map(message =>
+          message.id === assistantId ? { ...message, content: message.content + token } : message
+        ));
+      }
+    };
+    
     try {
-      const response = await apiClient.post('/chat/message', {
+      await postEventStream('/chat/message/stream', {
         session_id: sessionId,
         message: userMessage.content,
         mode: currentMode,
         context: {}
+      }, (event, data) => {
+        if (event === 'message' && data.token) {
+          appendToken(data.token);
+        }
       });
-      
-      const assistantMessage: Message = {
-        id: (Date.now() + 1).toString(),
-        role: 'assistant',
-        content: response.data.response,
-        timestamp: new Date(),
-        mode: currentMode
-      };
-      
-      setMessages(prev => [...prev, assistantMessage]);
+      if (!received) {
+        throw new Error('Chat stream ended without a response');
+      }
     } catch (error) {
       console.error('Chat error:', error);
-      const errorMessage: Message = {
-        id: (Date.now() + 1).toString(),
-        role: 'assistant',
-        content: 'Sorry, I\'m having trouble connecting right now. Please try again.',
-        timestamp: new Date(),
-        mode: currentMode
-      };
-      setMessages(prev => [...prev, errorMessage]);
+      if (!received) {
+        const errorMessage: Message = {
+          id: assistantId,
+          role: 'assistant',
+          content: 'Sorry, I\'m having trouble connecting right now. Please try again.',
+          timestamp: new Date(),
+          mode: currentMode
+        };
+        setMessages(prev => [...prev, errorMessage]);
+      }
     } finally {
       setIsLoading(false);
     }
@@ -191,7 +211,7 @@ export default function ChatScreen() {
             </View>
           ))}
           
-          {isLoading && (
+          {isLoading && messages[messages.length - 1]?.role === 'user' && (
             <View style={[styles.messageContainer, styles.assistantMessage]}>
               <Card style={[styles.messageBubble, styles.assistantBubble]}>
                 <View style={styles.typingIndicator}>
@@ -6,6 +6,7 @@ import { useRouter } from 'expo-router';
 import { Ionicons } from '@expo/vector-icons';
 import { LinearGradient } from 'expo-linear-gradient';
 import { Card } from '../src/components/ui/Card';
+import { apiClient } from '../src/services/apiClient';
 
 interface DoseItem {
   id: string;
@@ -80,9 +81,50 @@ const mockDoseContent: DoseItemType[] = [
   }
 ];
 
+// Map the precomputed bundle from /dose/today onto the screen's item shapes
+const toDoseItems = (items: any[]): DoseItemType[] =>
+  items.map((item): DoseItemType => {
+    if (item.type === 'mcq') {
+      return {
+        id: item.id,
+        type: 'mcq',
+        title: `Quick MCQ - ${(item.topic || item.subject || '').toUpperCase()}`,
+        content: item.topic || '',
+        question: item.stem,
+        options: item.options,
+        correctAnswer: item.answer_index,
+        explanation: item.explanation,
+        completed: false
+      };
+    }
+    if (item.type === 'current_affairs') {
+      return {
+        id: item.id,
+        type: 'current_affairs',
+        title: item.title,
+        content: 'Recent developments',
+        date: item.date,
+        category: item.category,
+        summary: item.summary,
+        completed: false
+      };
+    }
+    return {
+      id: item.id,
+      type: 'essay_topic',
+      title: 'Essay Topic of the Day',
+      content: 'Practice writing',
+      topic: item.topic,
+      hints: item.hints,
+      wordLimit: item.word_limit,
+      completed: false
+    };
+  });
+
 export default function DoseScreen() {
   const router = useRouter();
   const [doseItems, setDoseItems] = useState<DoseItemType[]>(mockDoseContent);
+  const [todayItems, setTodayItems] = useState<DoseItemType[]>(mockDoseContent);
   const [currentItemIndex, setCurrentItemIndex] = useState(0);
   const [isCompleted, setIsCompleted] = useState(false);
   
@@ -90,6 +132,21 @@ export default function DoseScreen() {
   const completedCount = doseItems.filter(item => item.completed).length;
   const totalCount = doseItems.length;
   
+  useEffect(() => {
+    apiClient.get('/dose/today')
+      .then((response) => {
+        const items = toDoseItems(response.data.items || []);
+        if (items.length > 0) {
+          setTodayItems(items);
+          setDoseItems(items);
+        }
+      })
+      .catch((error) => {
+        // Not built yet for this user (404) or offline: keep the sample dose
+        console.log('Daily dose unavailable:', error.message);
+      });
+  }, []);
+  
   useEffect(() => {
     if (completedCount === totalCount) {
       setIsCompleted(true);
@@ -118,7 +175,7 @@ export default function DoseScreen() {
   };
   
   const handleRestart = () => {
-    setDoseItems(mockDoseContent.map(item => ({ ...item, completed: false })));
+    setDoseItems(todayItems.map(item => ({ ...item, completed: false })));
     setCurrentItemIndex(0);
     setIsCompleted(false);
   };
@@ -18,7 +18,7 @@ interface EvaluationStep {
 interface EvaluationResult {
   id: string;
   question: string;
-  answer_image: string;
+  answer_image?: string;
   ocr_text: string;
   score: number;
   rubric: {
@@ -31,6 +31,10 @@ interface EvaluationResult {
   suggestions: string;
 }
 
+// Poll the evaluation job every 2s for up to 3 minutes
+const EVALUATION_POLL_INTERVAL_MS = 2000;
+const EVALUATION_POLL_MAX_ATTEMPTS = 90;
+
 const steps: EvaluationStep[] = [
   {
     id: 'question',
@@ -141,12 +145,24 @@ export default function EvaluationScreen() {
   const evaluateAnswer = async (base64Image: string) => {
     setIsProcessing(true);
     try {
-      const response = await apiClient.post('/evaluation/answer', {
+      // The server queues the evaluation and returns a job; poll it until OCR and grading finish
+      let job = (await apiClient.post('/evaluation/answer', {
         question: question,
         answer_image: base64Image
-      });
+      })).data;
+      for (let attempt = 0; attempt < EVALUATION_POLL_MAX_ATTEMPTS; attempt++) {
+        if (job.status === 'completed' || job.status === 'failed') break;
+        await new Promise(resolve => setTimeout(resolve, EVALUATION_POLL_INTERVAL_MS));
+        job = (await apiClient.get(`/evaluation/${job.id}`)).data;
+      }
+      if (job.status === 'failed') {
+        throw new Error(job.error || 'Evaluation failed');
+      }
+      if (job.status !== 'completed') {
+        throw new Error('Evaluation is taking too long, please try again later');
+      }
       
-      setEvaluationResult(response.data);
+      setEvaluationResult(job);
       setCurrentStep('results');
     } catch (error) {
       console.error('Evaluation error:', error);
@@ -40,9 +40,9 @@ export default function MCQScreen() {
   const generateMCQSession = async () => {
     setIsLoading(true);
     try {
+      // No topic: draws from the subject-wide pool the server keeps prefilled
       const response = await apiClient.post('/mcq/generate', {
         subject: 'gs1',
-        topic: 'General Studies',
         count: 5
       });
       
@@ -1,5 +1,6 @@
 import axios from 'axios';
 import * as SecureStore from 'expo-secure-store';
+import { fetch } from 'expo/fetch';
 
 const API_BASE_URL = process.env.EXPO_PUBLIC_BACKEND_URL || 'http://localhost:8001';
 
@@ -41,3 +42,60 @@ apiClient.interceptors.response.use(
     return Promise.reject(error);
   }
 );
+
+// Follow next_cursor through every page of a keyset-paginated list endpoint
+export async function fetchAllPages<T>(path: string, key: string, params: Record<string, string> = {}): Promise<T[]> {
+  const items: T[] = [];
+  let after: string | null = null;
+  do {
+    const response: { data: Record<string, any> } = await apiClient.get(path, {
+      params: { ...params, limit: 500, ...(after ? { after } : {}) },
+    });
+    items.push(...(response.data[key] || []));
+    after = response.data.next_cursor || null;
+  } while (after);
+  return items;
+}
+
+// POST to a Server-Sent Events endpoint and hand each event to onEvent as it arrives;
+// expo/fetch is used because React Native's fetch buffers the whole response body
+export async function postEventStream(
+  path: string,
+  body: unknown,
+  onEvent: (event: string, data: any) => void,
+): Promise<void> {
+  const token = await SecureStore.getItemAsync('auth_token').catch(() => null);
+  const response = await fetch(`${API_BASE_URL}/api${path}`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      Accept: 'text/event-stream',
+      ...(token ? { Authorization: `Bearer ${token}` } : {}),
+    },
+    body: JSON.stringify(body),
+  });
+  if (!response.ok || !response.body) {
+    throw new Error(`Stream request to ${path} failed with status ${response.status}`);
+  }
+  
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  while (true) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let boundary;
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const raw = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      let event = 'message';
+      const data: string[] = [];
+      for (const line of raw.split('\n')) {
+        if (line.startsWith('event:')) event = line.slice(6).trim();
+        else if (line.startsWith('data:')) data.push(line.slice(5).trimStart());
+      }
+      if (data.length) onEvent(event, JSON.parse(data.join('\n')));
+    }
+  }
+}
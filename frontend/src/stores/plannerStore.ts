@@ -1,5 +1,5 @@
 import { create } from 'zustand';
-import { apiClient } from '../services/apiClient';
+import { apiClient, fetchAllPages } from '../services/apiClient';
 
 export type Subject = 'gs1' | 'gs2' | 'gs3' | 'gs4' | 'essay' | 'optional' | 'csat';
 export type PlanItemStatus = 'pending' | 'done' | 'skipped';
@@ -28,8 +28,8 @@ interface StudyPlan {
 
 interface PlannerState {
   plans: StudyPlan[];
-  allItems: PlanItem[];
   todayItems: PlanItem[];
+  currentWeekStart: string | null;
   currentWeekItems: PlanItem[];
   isLoading: boolean;
   
@@ -37,7 +37,6 @@ interface PlannerState {
   loadPlans: () => Promise<void>;
   loadTodayItems: () => Promise<void>;
   loadWeekItems: (startDate: string) => Promise<void>;
-  loadAllItems: () => Promise<void>;
   generatePlan: (data: any) => Promise<void>;
   updateItemProgress: (itemId: string, minutes: number, status: PlanItemStatus) => Promise<void>;
   rescheduleItem: (itemId: string, newDate: string) => Promise<void>;
@@ -45,8 +44,8 @@ interface PlannerState {
 
 export const usePlannerStore = create<PlannerState>()((set, get) => ({
   plans: [],
-  allItems: [],
   todayItems: [],
+  currentWeekStart: null,
   currentWeekItems: [],
   isLoading: false,
   
@@ -65,8 +64,8 @@ export const usePlannerStore = create<PlannerState>()((set, get) => ({
   loadTodayItems: async () => {
     try {
       const today = new Date().toISOString().split('T')[0];
-      const response = await apiClient.get(`/planner/items?date=${today}`);
-      set({ todayItems: response.data.items || [] });
+      const items = await fetchAllPages<PlanItem>('/planner/items', 'items', { date: today });
+      set({ todayItems: items });
     } catch (error) {
       console.error('Error loading today items:', error);
       // Mock data for demo
@@ -103,9 +102,15 @@ export const usePlannerStore = create<PlannerState>()((set, get) => ({
   
   loadWeekItems: async (startDate) => {
     try {
-      set({ isLoading: true });
-      const response = await apiClient.get('/planner/items');
-      set({ currentWeekItems: response.data.items || [] });
+      set({ isLoading: true, currentWeekStart: startDate });
+      // Only the seven days from startDate; the full plan can run to thousands of items
+      const endDate = new Date(startDate);
+      endDate.setDate(endDate.getDate() + 6);
+      const items = await fetchAllPages<PlanItem>('/planner/items', 'items', {
+        from: startDate,
+        to: endDate.toISOString().split('T')[0],
+      });
+      set({ currentWeekItems: items });
     } catch (error) {
       console.error('Error loading week items:', error);
       set({ currentWeekItems: [] });
@@ -114,22 +119,16 @@ export const usePlannerStore = create<PlannerState>()((set, get) => ({
     }
   },
   
-  loadAllItems: async () => {
-    try {
-      const response = await apiClient.get('/planner/items');
-      set({ allItems: response.data.items || [] });
-    } catch (error) {
-      console.error('Error loading all items:', error);
-    }
-  },
-  
   generatePlan: async (data) => {
     try {
       set({ isLoading: true });
       await apiClient.post('/planner/generate', data);
       // Reload items after generation
       await get().loadTodayItems();
-      await get().loadAllItems();
+      const weekStart = get().currentWeekStart;
+      if (weekStart) {
+        await get().loadWeekItems(weekStart);
+      }
     } catch (error) {
       console.error('Error generating plan:', error);
       throw error;
@@ -156,7 +155,6 @@ export const usePlannerStore = create<PlannerState>()((set, get) => ({
       
       set(state => ({
         todayItems: updateItems(state.todayItems),
-        allItems: updateItems(state.allItems),
         currentWeekItems: updateItems(state.currentWeekItems)
       }));
     } catch (error) {
@@ -178,7 +176,6 @@ export const usePlannerStore = create<PlannerState>()((set, get) => ({
       
       set(state => ({
         todayItems: updateItems(state.todayItems),
-        allItems: updateItems(state.allItems),
         currentWeekItems: updateItems(state.currentWeekItems)
       }));
     } catch (error) {
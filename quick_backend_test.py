@@ -6,6 +6,7 @@ Quick Backend Test - Non-AI endpoints only
 import requests
 import json
 import uuid
+import time
 from datetime import datetime, timedelta
 
 BACKEND_URL = "http://localhost:8001/api"
@@ -247,17 +248,27 @@ def quick_test():
             "question": "Test question",
             "answer_image": mock_image
         }, params={"user_id": user_id}, timeout=20)
-        if response.status_code == 200:
+        if response.status_code == 202:
+            # Evaluation runs as a background job; poll it until it finishes
             data = response.json()
-            suggestions = data.get("suggestions", "")
-            if "having trouble processing" in suggestions:
-                print("⚠️  Answer Evaluation: Backend working, but Ollama unavailable")
-                results["eval_backend"] = True
-                results["eval_ai"] = False
-            else:
+            for _ in range(30):
+                if data["status"] in ("completed", "failed"):
+                    break
+                time.sleep(2)
+                data = requests.get(f"{BACKEND_URL}/evaluation/{data['id']}", params={"user_id": user_id}, timeout=20).json()
+            if data["status"] == "completed":
                 print("✅ Answer Evaluation: Fully working with AI")
                 results["eval_backend"] = True
                 results["eval_ai"] = True
+            elif data["status"] == "failed" and "not available" in (data.get("error") or ""):
+                # Jobs fail instead of returning placeholder feedback when OCR or Ollama is down
+                print("⚠️  Answer Evaluation: Backend working, but OCR/Ollama unavailable")
+                results["eval_backend"] = True
+                results["eval_ai"] = False
+            else:
+                print(f"❌ Answer Evaluation: job {data['status']} {data.get('error') or ''}")
+                results["eval_backend"] = False
+                results["eval_ai"] = False
         else:
             print(f"❌ Answer Evaluation: Status {response.status_code}")
             results["eval_backend"] = False
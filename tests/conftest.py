@@ -0,0 +1,15 @@
+"""Shared setup: put backend/ on the path and give server.py the settings it reads at import time."""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+# server.py only builds a lazy Motor client at import, so no MongoDB is needed for these tests
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "upsc_test")
+_data_dir = tempfile.mkdtemp(prefix="upsc-tests-")
+os.environ.setdefault("VECTOR_INDEX_DIR", os.path.join(_data_dir, "vector_index"))
+os.environ.setdefault("BLOB_DIR", os.path.join(_data_dir, "blobs"))
@@ -0,0 +1,28 @@
+import pytest
+from fastapi import HTTPException
+
+import server
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=100-", (100, 999)),
+    ("bytes=-100", (900, 999)),
+    ("bytes=-5000", (0, 999)),
+    ("bytes=500-5000", (500, 999)),
+])
+def test_single_ranges(header, expected):
+    assert server.parse_range_header(header, 1000) == expected
+
+
+@pytest.mark.parametrize("header", [None, "", "items=0-10", "bytes=0-10,20-30"])
+def test_whole_body_when_no_usable_range(header):
+    assert server.parse_range_header(header, 1000) is None
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=200-100", "bytes=-0", "bytes=abc-"])
+def test_unsatisfiable_ranges(header):
+    with pytest.raises(HTTPException) as error:
+        server.parse_range_header(header, 1000)
+    assert error.value.status_code == 416
+    assert error.value.headers["Content-Range"] == "bytes */1000"
@@ -0,0 +1,48 @@
+from datetime import datetime, timedelta
+
+import server
+
+REVIEWED_AT = datetime(2026, 3, 1, 9)
+
+
+def review_sequence(grades):
+    card = {}
+    for grade in grades:
+        card = server.sm2_schedule(card, grade, REVIEWED_AT)
+    return card
+
+
+def test_first_reviews_use_the_fixed_sm2_intervals():
+    assert review_sequence([4])["interval_days"] == 1
+    assert review_sequence([4, 4])["interval_days"] == 6
+
+
+def test_later_intervals_grow_by_the_ease_factor():
+    card = review_sequence([5, 5])
+    following = server.sm2_schedule(card, 5, REVIEWED_AT)
+    assert following["interval_days"] == round(card["interval_days"] * card["ease"])
+    assert following["reps"] == 3
+
+
+def test_ease_follows_the_sm2_formula():
+    assert server.sm2_schedule({}, 5, REVIEWED_AT)["ease"] == 2.6
+    assert server.sm2_schedule({}, 4, REVIEWED_AT)["ease"] == 2.5
+    assert server.sm2_schedule({}, 3, REVIEWED_AT)["ease"] == 2.36
+
+
+def test_failed_review_relearns_from_one_day():
+    card = review_sequence([5, 5, 5, 1])
+    assert card["reps"] == 0
+    assert card["lapses"] == 1
+    assert card["interval_days"] == 1
+
+
+def test_ease_never_drops_below_the_minimum():
+    card = review_sequence([0] * 20)
+    assert card["ease"] == server.FLASHCARD_MIN_EASE
+
+
+def test_next_review_is_interval_days_after_the_review():
+    card = review_sequence([4, 4])
+    assert card["last_reviewed_at"] == REVIEWED_AT
+    assert card["next_review_at"] == REVIEWED_AT + timedelta(days=6)
@@ -0,0 +1,55 @@
+from collections import defaultdict
+
+import numpy as np
+
+import planner
+
+
+def day_totals(entries):
+    totals = defaultdict(int)
+    for day, _, _, minutes in entries:
+        totals[day] += minutes
+    return totals
+
+
+def test_schedule_stays_within_daily_capacity():
+    entries = planner.schedule(120, 240, [3, 2, 1], final_revision_days=12)
+    assert entries
+    assert max(day_totals(entries).values()) <= 240
+
+
+def test_schedule_splits_study_time_by_weight():
+    weights = [3, 2, 1]
+    entries = planner.schedule(90, 180, weights)
+    study = np.zeros(len(weights))
+    for _, topic, kind, minutes in entries:
+        if kind == planner.STUDY:
+            study[topic] += minutes
+    shares = study / study.sum()
+    assert np.allclose(shares, np.array(weights) / sum(weights), atol=0.02)
+
+
+def test_final_stretch_holds_only_revision():
+    num_days, final_days = 60, planner.final_revision_span(60, 14)
+    assert final_days == 6
+    entries = planner.schedule(num_days, 240, [1, 1], final_revision_days=final_days)
+    final = [entry for entry in entries if entry[0] >= num_days - final_days]
+    assert final
+    assert all(kind == planner.REVISION for _, _, kind, _ in final)
+    # Spare capacity before the exam is turned into revision sessions rather than left empty
+    totals = day_totals(entries)
+    assert all(totals[day] > 240 - 60 for day in range(num_days - final_days, num_days))
+
+
+def test_study_sessions_are_revised_after_each_interval():
+    entries = planner.schedule(40, 240, [1], intervals=(1, 7, 30))
+    study_days = {day for day, _, kind, _ in entries if kind == planner.STUDY}
+    revision_days = {day for day, _, kind, _ in entries if kind == planner.REVISION}
+    assert 0 in study_days and 0 not in revision_days
+    assert {1, 7, 30} <= revision_days
+
+
+def test_schedule_without_capacity_or_weights_is_empty():
+    assert planner.schedule(30, 0, [1, 2]) == []
+    assert planner.schedule(30, 120, []) == []
+    assert planner.schedule(0, 120, [1]) == []
@@ -0,0 +1,55 @@
+from datetime import datetime
+
+from pymongo import DeleteMany, InsertOne, UpdateOne
+
+import server
+
+AFTER = "2026-03-01"
+NOW = datetime(2026, 3, 1, 12)
+
+
+def logged_item(**overrides):
+    return {"id": "logged", "plan_id": "plan", "subject": "gs2", "topic": "Polity", "kind": "study", **overrides}
+
+
+def pending(item_id, day, minutes, topic="Polity"):
+    return {"id": item_id, "date": day, "subject": "gs2", "topic": topic, "kind": "study",
+            "status": "pending", "target_minutes": minutes}
+
+
+def replan(carry, window_items, capacity=120):
+    return server.build_replan_ops(logged_item(), carry, window_items, capacity, AFTER, "user", NOW)
+
+
+def test_shortfall_tops_up_same_topic_items_with_room():
+    ops, deltas = replan(45, [pending("a", "2026-03-03", 60)])
+    assert len(ops) == 1 and isinstance(ops[0], UpdateOne)
+    assert ops[0]._filter["id"] == "a"
+    assert ops[0]._doc == {"$inc": {"target_minutes": 45}}
+    assert deltas == []
+
+
+def test_shortfall_that_does_not_fit_becomes_new_items_on_the_earliest_free_days():
+    window = [pending("a", "2026-03-02", 120), pending("other", "2026-03-03", 100, topic="Economy")]
+    ops, deltas = replan(90, window)
+    inserts = [op._doc for op in ops if isinstance(op, InsertOne)]
+    # 03-02 has the topic already and is full; 03-03 has 20 spare minutes; 03-04 takes the rest
+    assert [(doc["date"], doc["target_minutes"]) for doc in inserts] == [("2026-03-03", 20), ("2026-03-04", 70)]
+    assert all(doc["topic"] == "Polity" and doc["status"] == "pending" for doc in inserts)
+    assert deltas == [("2026-03-03", "gs2", {"total": 1}), ("2026-03-04", "gs2", {"total": 1})]
+
+
+def test_surplus_is_taken_off_upcoming_items_earliest_first():
+    window = [pending("a", "2026-03-02", 60), pending("b", "2026-03-05", 60), pending("c", "2026-03-09", 60)]
+    ops, deltas = replan(-80, window)
+    deletes = [op for op in ops if isinstance(op, DeleteMany)]
+    updates = [op for op in ops if isinstance(op, UpdateOne)]
+    assert len(deletes) == 1 and deletes[0]._filter["id"] == {"$in": ["a"]}
+    assert [(op._filter["id"], op._doc["$inc"]["target_minutes"]) for op in updates] == [("b", -20)]
+    assert deltas == [("2026-03-02", "gs2", {"total": -1})]
+
+
+def test_other_topics_and_logged_items_are_left_alone():
+    window = [pending("x", "2026-03-02", 30, topic="Economy"), {**pending("y", "2026-03-03", 30), "status": "done"}]
+    ops, _ = replan(-30, window)
+    assert ops == []
@@ -0,0 +1,92 @@
+import asyncio
+import uuid
+
+import pytest
+
+import server
+
+
+def test_chunk_text_windows_overlap():
+    words = [f"w{i}" for i in range(25)]
+    chunks = server.chunk_text(" ".join(words), chunk_words=10, overlap_words=3)
+    assert [chunk.split()[0] for chunk in chunks] == ["w0", "w7", "w14", "w21"]
+    assert chunks[-1].split()[-1] == "w24"
+    # Consecutive chunks share overlap_words words
+    assert chunks[0].split()[-3:] == chunks[1].split()[:3]
+
+
+def test_chunk_text_short_and_empty_text():
+    assert server.chunk_text("one two three", chunk_words=10, overlap_words=3) == ["one two three"]
+    assert server.chunk_text("   ") == []
+
+
+def test_tokenize_drops_stopwords_and_keeps_numbers():
+    assert server.tokenize("The Article 370 of the Constitution") == ["article", "370", "constitution"]
+
+
+@pytest.fixture
+def mock_db(monkeypatch):
+    mongomock_motor = pytest.importorskip("mongomock_motor")
+    db = mongomock_motor.AsyncMongoMockClient()["upsc_test"]
+    monkeypatch.setattr(server, "db", db)
+    return db
+
+
+async def add_resource(db, title, texts):
+    resource_id = str(uuid.uuid4())
+    await db.resources.insert_one({"id": resource_id, "user_id": "user", "title": title, "kind": "note"})
+    chunks = [
+        {"id": str(uuid.uuid4()), "resource_id": resource_id, "user_id": "user", "seq": seq,
+         "text": text, "token_count": len(server.tokenize(text))}
+        for seq, text in enumerate(texts)
+    ]
+    await db.resource_chunks.insert_many([dict(chunk) for chunk in chunks])
+    await server.add_chunk_terms("user", chunks)
+    return resource_id
+
+
+def test_bm25_ranks_rarer_and_more_frequent_terms_higher(mock_db):
+    async def scenario():
+        federalism = await add_resource(mock_db, "Federalism", [
+            "cooperative federalism federalism centre state relations finance commission",
+            "inter state council and zonal councils",
+        ])
+        await add_resource(mock_db, "Economy", ["finance commission devolution of taxes to states"])
+        await add_resource(mock_db, "Rivers", ["inter state river water disputes tribunal"])
+        return federalism, await server.search_library("user", "federalism finance", limit=5)
+    
+    federalism, results = asyncio.run(scenario())
+    assert [result["title"] for result in results] == ["Federalism", "Economy"]
+    assert results[0]["resource_id"] == federalism
+    assert results[0]["score"] > results[1]["score"] > 0
+    assert "federalism" in results[0]["snippet"]
+
+
+def test_bm25_returns_one_hit_per_resource(mock_db):
+    async def scenario():
+        await add_resource(mock_db, "Polity", ["preamble sovereign", "preamble socialist secular", "preamble republic"])
+        return await server.search_library("user", "preamble", limit=5)
+    
+    results = asyncio.run(scenario())
+    assert len(results) == 1
+
+
+def test_bm25_without_matches_or_index(mock_db):
+    assert asyncio.run(server.search_library("user", "anything", limit=5)) == []
+    assert asyncio.run(server.search_library("user", "the of and", limit=5)) == []
+
+
+def test_bm25_caps_postings_per_term_and_keeps_exact_idf(mock_db, monkeypatch):
+    async def scenario():
+        await add_resource(mock_db, "Light", ["monsoon winds"])
+        heavy = await add_resource(mock_db, "Heavy", ["monsoon monsoon monsoon rainfall"])
+        await add_resource(mock_db, "Other", ["monsoon onset kerala"])
+        uncapped = await server.search_library("user", "monsoon", limit=5)
+        monkeypatch.setattr(server, "SEARCH_MAX_POSTINGS_PER_TERM", 1)
+        return heavy, uncapped, await server.search_library("user", "monsoon", limit=5)
+    
+    heavy, uncapped, capped = asyncio.run(scenario())
+    assert len(uncapped) == 3
+    # Only the highest-tf posting is read, scored with the same IDF as the full list
+    assert [result["resource_id"] for result in capped] == [heavy]
+    assert capped[0]["score"] == uncapped[0]["score"]
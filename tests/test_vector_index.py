@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from vector_index import VectorIndex
+
+
+def unit(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def random_vectors(count, dim=16, seed=0):
+    return np.random.default_rng(seed).standard_normal((count, dim)).astype(np.float32)
+
+
+def test_search_finds_exact_match_first(tmp_path):
+    index = VectorIndex(tmp_path)
+    vectors = random_vectors(20)
+    index.add([f"c{i}" for i in range(20)], ["r"] * 20, vectors)
+    chunk_id, resource_id, score = index.search(vectors[7], k=3)[0]
+    assert (chunk_id, resource_id) == ("c7", "r")
+    assert score > 0.999
+
+
+def test_index_persists_across_reopen(tmp_path):
+    vectors = random_vectors(10)
+    VectorIndex(tmp_path).add([f"c{i}" for i in range(10)], ["r"] * 10, vectors)
+    reopened = VectorIndex(tmp_path)
+    assert len(reopened) == 10
+    assert reopened.search(vectors[3], k=1)[0][0] == "c3"
+
+
+def test_remove_resource_hides_its_chunks_after_reopen(tmp_path):
+    index = VectorIndex(tmp_path)
+    vectors = random_vectors(6)
+    index.add(["a0", "a1", "a2"], ["a"] * 3, vectors[:3])
+    index.add(["b0", "b1", "b2"], ["b"] * 3, vectors[3:])
+    index.remove_resource("a")
+    assert len(index) == 3
+    reopened = VectorIndex(tmp_path)
+    hits = reopened.search(vectors[0], k=6)
+    assert {resource_id for _, resource_id, _ in hits} == {"b"}
+
+
+def test_recluster_keeps_results_and_drops_tombstones(tmp_path):
+    # A low rebuild threshold moves the delta segment into clustered base segments
+    index = VectorIndex(tmp_path, rebuild_min=8, nprobe=64)
+    vectors = random_vectors(40, seed=1)
+    for start in range(0, 40, 10):
+        index.add([f"c{i}" for i in range(start, start + 10)], [f"r{start}"] * 10, vectors[start:start + 10])
+    index.remove_resource("r0")
+    reopened = VectorIndex(tmp_path, rebuild_min=8, nprobe=64)
+    assert len(reopened) == 30
+    assert reopened.search(vectors[25], k=1)[0][0] == "c25"
+    assert all(resource_id != "r0" for _, resource_id, _ in reopened.search(vectors[0], k=10))
+    # Files of replaced segments are cleaned up
+    assert len([path for path in tmp_path.iterdir() if path.name.startswith("base-")]) == 1
+
+
+def test_dimension_mismatch_is_rejected(tmp_path):
+    index = VectorIndex(tmp_path)
+    index.add(["c0"], ["r"], unit([[1, 0, 0]]))
+    with pytest.raises(ValueError):
+        index.add(["c1"], ["r"], unit([[1, 0]]))